@@ -1,13 +1,18 @@
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from dotenv import load_dotenv
 from transformers.utils.logging import set_verbosity_error
 
 import os, logging, warnings
-from app.routes.vector import router as vector_router
+from app.routes.vector import ingest_lifespan, router as vector_router
 from app.routes.pdf import router as pdf_router
 from app.routes.chat import router as chat_router
+from app.routes.search import router as search_router
 from app.ws.ws_handler import ws_router
+from app.services.clients import lifespan
+from app.services.vector_store import cleanup_stale_dirs
 
 # Load env + logging
 load_dotenv()
@@ -19,15 +24,24 @@ log.info("ENV resolved → PORT=%s, FAISS_STORE_PATH=%s, EMBEDDING_MODEL=%s, OPE
          os.getenv("EMBEDDING_MODEL"),
          os.getenv("OPENAI_CHAT_MODEL"))
 
+# Leftovers of index writes interrupted by a crash/restart
+cleanup_stale_dirs()
+
 # Hide warnings
 warnings.filterwarnings("ignore", message="`encoder_attention_mask` is deprecated")
 set_verbosity_error()
 
-# FastAPI app
-app = FastAPI()
+# FastAPI app (lifespan owns the shared OpenAI HTTP pools; the ingest processor
+# is created inside it and torn down first)
+@asynccontextmanager
+async def app_lifespan(app):
+    async with lifespan(app), ingest_lifespan(app):
+        yield
+
+app = FastAPI(lifespan=app_lifespan)
 
 # Routers
-for r in [vector_router, pdf_router, chat_router]:
+for r in [vector_router, pdf_router, chat_router, search_router]:
     app.include_router(r, prefix="/api")
 app.include_router(ws_router)
 
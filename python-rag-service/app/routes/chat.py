@@ -1,10 +1,20 @@
+import json
+import logging
+
 from fastapi import APIRouter
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from app.services.question_answering import handle_ask_question
+from app.services.question_answering import handle_ask_question, stream_ask_question
+
+log = logging.getLogger(__name__)
 
 router = APIRouter()
 
 
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+
 class AskQuestionPayload(BaseModel):
     question: str
     documentId: str
@@ -13,3 +23,22 @@ class AskQuestionPayload(BaseModel):
 @router.post("/ask-question")
 async def ask_question(payload: AskQuestionPayload):
     return await handle_ask_question(payload.question, payload.documentId)
+
+
+@router.post("/ask-question/stream")
+async def ask_question_stream(payload: AskQuestionPayload):
+    """Server-Sent Events: `sources` first, then `token` events, then `answer` and `done`."""
+    async def events():
+        try:
+            async for event in stream_ask_question(payload.question, payload.documentId):
+                yield _sse(event["event"], event["data"])
+        except Exception as e:
+            # The response has started, so the status code can't change: end with an error event
+            log.exception("SSE stream failed doc_id=%s", payload.documentId)
+            yield _sse("error", {"status": 500, "detail": str(e)})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
@@ -20,7 +20,11 @@ async def view_pdf_route(data: PdfViewRequest):
         
         if "error" in result:
             raise HTTPException(status_code=500, detail=result["error"])
-            
+
+        for page in result.get("pages", []):
+            if "spans" in page:
+                page["spans"] = page["spans"].to_dicts()
+
         return result
         
     except Exception as e:
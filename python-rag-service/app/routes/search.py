@@ -0,0 +1,41 @@
+from functools import lru_cache
+from typing import List, Optional
+
+from fastapi import APIRouter, HTTPException
+from pydantic import BaseModel
+from starlette.concurrency import run_in_threadpool
+
+from app.services.corpus_search import CorpusSearch
+
+router = APIRouter()
+
+
+class CorpusSearchPayload(BaseModel):
+    query: str
+    k: int = 10
+    documentIds: Optional[List[str]] = None
+
+
+@lru_cache(maxsize=1)
+def _corpus_search() -> CorpusSearch:
+    return CorpusSearch()
+
+
+@router.post("/search")
+async def search_corpus(payload: CorpusSearchPayload):
+    """Top-k chunks across all indexed documents, or only across `documentIds`."""
+    if not payload.query.strip():
+        raise HTTPException(status_code=400, detail="query is required.")
+    k = max(1, min(payload.k, 100))
+
+    docs = await run_in_threadpool(_corpus_search().search, payload.query, k, payload.documentIds)
+    return {
+        "results": [
+            {
+                **doc.metadata,
+                "textMatch": doc.page_content,
+                "pageIndicator": f"Page {doc.metadata.get('pageNumber')}",
+            }
+            for doc in docs
+        ]
+    }
@@ -1,17 +1,57 @@
 import os
-from fastapi import HTTPException, APIRouter
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from fastapi import HTTPException, APIRouter, Depends, Request
+from pydantic import BaseModel, Field
 from app.services.generate_embeddings import SmartDocumentProcessor
+from app.services.ingest_queue import IngestQueue
 
 router = APIRouter()
 
+
+class EmbeddingInput(BaseModel):
+    path: str
+    id: str
+    filename: Optional[str] = None
+
+
+class BatchEmbeddingInput(BaseModel):
+    items: List[EmbeddingInput] = Field(..., min_length=1)
+
 UPLOAD_FOLDER = os.path.abspath(os.getenv("UPLOAD_FOLDER", "./uploads"))
 os.makedirs(UPLOAD_FOLDER, exist_ok=True)
 
-processor = SmartDocumentProcessor()
 
-@router.post("/generate-embeddings")
-async def generate_embeddings_route(data: EmbeddingInput):
-    user_path = os.path.normpath(data.path).lstrip('/')
+
+@asynccontextmanager
+async def ingest_lifespan(app):
+    """
+    Processor and ingest queue live inside the app lifespan (nested in the clients
+    lifespan), so they never outlive the shared HTTP clients they use. On exit the
+    queue is drained first, then the processor's worker processes are shut down.
+    """
+    processor = SmartDocumentProcessor()
+    app.state.processor = processor
+    app.state.ingest_queue = IngestQueue(processor)
+    try:
+        yield
+    finally:
+        try:
+            await app.state.ingest_queue.stop()
+        finally:
+            processor.close()
+
+
+def _processor(request: Request) -> SmartDocumentProcessor:
+    return request.app.state.processor
+
+
+def _ingest_queue(request: Request) -> IngestQueue:
+    return request.app.state.ingest_queue
+
+
+def _resolve_upload(path: str) -> str:
+    user_path = os.path.normpath(path).lstrip('/')
     safe_path = os.path.abspath(os.path.join(UPLOAD_FOLDER, user_path))
     
     if not safe_path.startswith(UPLOAD_FOLDER):
@@ -19,5 +59,40 @@ async def generate_embeddings_route(data: EmbeddingInput):
     
     if not os.path.isfile(safe_path):
         raise HTTPException(status_code=404, detail="File not found.")
-    
-    return await processor.ingest(source=safe_path, doc_id=data.id, filename=data.filename)
\ No newline at end of file
+
+    return safe_path
+
+
+@router.post("/generate-embeddings")
+async def generate_embeddings_route(data: EmbeddingInput, processor: SmartDocumentProcessor = Depends(_processor)):
+    safe_path = _resolve_upload(data.path)
+    return await processor.ingest(source=safe_path, doc_id=data.id, filename=data.filename)
+
+
+@router.post("/generate-embeddings/batch", status_code=202)
+async def generate_embeddings_batch_route(data: BatchEmbeddingInput, ingest_queue: IngestQueue = Depends(_ingest_queue)):
+    """Queue many files for ingestion; poll /ingest-jobs/{job_id} for progress."""
+    items = []
+    for entry in data.items:
+        item = {"doc_id": entry.id, "filename": entry.filename}
+        try:
+            item["source"] = _resolve_upload(entry.path)
+        except HTTPException as e:
+            item["error"] = e.detail
+        items.append(item)
+
+    job = await ingest_queue.submit(items)
+    return job.to_dict(include_items=False)
+
+
+@router.get("/ingest-jobs")
+async def list_ingest_jobs(ingest_queue: IngestQueue = Depends(_ingest_queue)):
+    return [job.to_dict(include_items=False) for job in ingest_queue.jobs()]
+
+
+@router.get("/ingest-jobs/{job_id}")
+async def get_ingest_job(job_id: str, ingest_queue: IngestQueue = Depends(_ingest_queue)):
+    job = ingest_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job.to_dict()
@@ -0,0 +1,207 @@
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Hashable, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# Helpers
+# ===============================
+
+TRAILING_PUNCT_RE = re.compile(r"[\s?!.]+$")
+
+
+def normalize_question(question: str) -> str:
+    """Case-folded, whitespace-collapsed question without trailing ?!. punctuation."""
+    return TRAILING_PUNCT_RE.sub("", " ".join((question or "").split()).casefold())
+
+# ===============================
+# Config
+# ===============================
+
+@dataclass
+class AnswerCacheConfig:
+    """
+    - enabled: ANSWER_CACHE_ENABLED=0 turns the cache off
+    - max_entries: LRU bound across all documents
+    - ttl_s: seconds an answer stays valid
+    - similarity_threshold: cosine similarity for near-duplicate questions
+      (ANSWER_CACHE_SIMILARITY). Opt-in: the default 0 serves exact matches only,
+      since a near-duplicate hit returns an answer written for another question
+    """
+    enabled: bool = os.getenv("ANSWER_CACHE_ENABLED", "1") == "1"
+    max_entries: int = int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1024"))
+    ttl_s: float = float(os.getenv("ANSWER_CACHE_TTL_S", "3600"))
+    similarity_threshold: float = float(os.getenv("ANSWER_CACHE_SIMILARITY", "0"))
+
+# ===============================
+# Cache
+# ===============================
+
+_Key = Tuple[str, Hashable, str]
+
+
+@dataclass
+class _Entry:
+    value: Any
+    expires_at: float
+    vector: Optional[np.ndarray]
+
+
+class AnswerCache:
+    """
+    TTL + LRU cache of finished answers.
+
+    - Exact key: (documentId, index version, normalized question)
+    - Near-duplicates (opt-in, similarity_threshold > 0): questions for the same
+      document and index version whose embeddings have cosine similarity >=
+      similarity_threshold
+    - invalidate(doc_id) drops every answer of a document (wired to VectorStore saves);
+      a changed index version also makes old entries unreachable.
+    """
+
+    def __init__(self, cfg: Optional[AnswerCacheConfig] = None, clock=time.monotonic):
+        self.cfg = cfg or AnswerCacheConfig()
+        self._clock = clock
+        self._entries: "OrderedDict[_Key, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @property
+    def semantic(self) -> bool:
+        return self.cfg.enabled and self.cfg.similarity_threshold > 0
+
+    # ---------------------------
+    # Lookup
+    # ---------------------------
+
+    def get(
+        self,
+        doc_id: str,
+        version: Hashable,
+        question: str,
+        vector: Optional[Sequence[float]] = None,
+        count_miss: bool = True,
+    ) -> Optional[Any]:
+        """
+        Exact match first; with a question vector, fall back to the most similar cached question.
+
+        count_miss=False: an exact probe whose miss is not counted, because the caller
+        follows up with the question vector (that call records the outcome).
+        """
+        if not self.cfg.enabled or version is None:
+            return None
+        key = (str(doc_id), version, normalize_question(question))
+        now = self._clock()
+        with self._lock:
+            entry = self._live_locked(key, now)
+            if entry is not None:
+                self.hits += 1
+                return entry.value
+            if vector is not None and self.semantic:
+                entry = self._nearest_locked(key[0], version, _unit(vector), now)
+                if entry is not None:
+                    self.semantic_hits += 1
+                    return entry.value
+            if count_miss:
+                self.misses += 1
+            return None
+
+    def put(
+        self,
+        doc_id: str,
+        version: Hashable,
+        question: str,
+        value: Any,
+        vector: Optional[Sequence[float]] = None,
+    ) -> None:
+        if not self.cfg.enabled or version is None or self.cfg.max_entries <= 0:
+            return
+        key = (str(doc_id), version, normalize_question(question))
+        entry = _Entry(
+            value=value,
+            expires_at=self._clock() + self.cfg.ttl_s,
+            vector=_unit(vector) if vector is not None else None,
+        )
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.cfg.max_entries:
+                self._entries.popitem(last=False)
+
+    def _live_locked(self, key: _Key, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _nearest_locked(self, doc_id: str, version: Hashable, vector: np.ndarray, now: float) -> Optional[_Entry]:
+        keys: List[_Key] = []
+        vectors: List[np.ndarray] = []
+        for key, entry in list(self._entries.items()):
+            if key[0] != doc_id or key[1] != version or entry.vector is None:
+                continue
+            if entry.expires_at <= now:
+                del self._entries[key]
+                continue
+            if entry.vector.shape == vector.shape:
+                keys.append(key)
+                vectors.append(entry.vector)
+        if not keys:
+            return None
+
+        sims = np.stack(vectors) @ vector
+        best = int(np.argmax(sims))
+        if sims[best] < self.cfg.similarity_threshold:
+            return None
+        self._entries.move_to_end(keys[best])
+        return self._entries[keys[best]]
+
+    # ---------------------------
+    # Invalidation
+    # ---------------------------
+
+    def invalidate(self, doc_id: str) -> None:
+        """Drop every cached answer for a document."""
+        with self._lock:
+            stale = [k for k in self._entries if k[0] == str(doc_id)]
+            for key in stale:
+                del self._entries[key]
+            if stale:
+                self.invalidations += 1
+        if stale:
+            logger.info("Answer cache: dropped %d answers for doc_id=%s", len(stale), doc_id)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+            }
+
+
+def _unit(vector: Sequence[float]) -> np.ndarray:
+    v = np.asarray(vector, dtype=np.float32).ravel()
+    norm = float(np.linalg.norm(v))
+    return v / norm if norm > 0 else v
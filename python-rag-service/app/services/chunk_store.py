@@ -0,0 +1,397 @@
+import datetime
+import json
+import logging
+import mmap
+import os
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+from langchain_community.docstore.base import Docstore
+from langchain_core.documents import Document
+
+logger = logging.getLogger(__name__)
+
+CHUNKS_FILE = "chunks.bin"
+MAGIC = b"RAGCHK01"
+ALIGN = 8
+# String metadata with at most this many distinct values is dictionary-encoded
+# (documentId, section titles, ...); the value table lives in the header.
+DICT_MAX_VALUES = 1024
+INT64_MIN, INT64_MAX = -(2 ** 63), 2 ** 63 - 1
+
+# ===============================
+# Format
+# ===============================
+#
+#   MAGIC | u64 header length | header JSON | sections (8-byte aligned)
+#
+# Sections (all little-endian, addressed by [offset, length] in the header):
+#   ids           S<w>   docstore id per FAISS position
+#   ids_sorted    S<w>   ids in byte order      } O(log n) id -> position
+#   ids_order     i8     position of each sorted id
+#   text_offsets  i8     n+1 offsets into `text`
+#   text          u1     UTF-8 page_content blob
+#   col:<key>     i8     integer metadata present on every chunk
+#   col:<key>     u4     codes into header["columns"][key]["values"]
+#   meta_offsets  i8     n+1 offsets into `meta`
+#   meta          u1     remaining metadata per chunk as compact JSON ("" = {})
+
+
+def _json_default(v: Any) -> Any:
+    """JSON fallback for metadata values: numpy scalars/arrays, dates, paths, sets."""
+    if isinstance(v, np.generic):
+        return v.item()
+    if isinstance(v, np.ndarray):
+        return v.tolist()
+    if isinstance(v, (datetime.date, datetime.time)):
+        return v.isoformat()
+    if isinstance(v, (set, frozenset)):
+        return sorted(v, key=repr)
+    if isinstance(v, Path):
+        return str(v)
+    raise TypeError(f"Metadata value of type {type(v).__name__} is not JSON serializable")
+
+
+def _dumps(value: Any) -> str:
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"), default=_json_default)
+
+
+def normalize_metadata(meta: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Metadata as it reads back from chunks.bin (JSON rules: tuples become lists,
+    numpy scalars Python numbers, dates ISO strings, keys strings), so stored and
+    incoming chunks compare equal. Packed LINE_RECTS_KEY rects are kept as bytes;
+    empty ones are dropped, as they do not come back from rects.bin either.
+    """
+    meta = dict(meta or {})
+    rects = meta.pop(LINE_RECTS_KEY, None)
+    out = json.loads(_dumps(meta)) if meta else {}
+    if rects is not None and len(rects):
+        out[LINE_RECTS_KEY] = bytes(rects)
+    return out
+
+
+def _is_int(v: Any) -> bool:
+    return isinstance(v, int) and not isinstance(v, bool) and INT64_MIN <= v <= INT64_MAX
+
+
+def _plan_columns(metas: Sequence[Dict[str, Any]]) -> Tuple[List[str], Dict[str, Dict[str, Any]]]:
+    """Key order (first seen) and the keys stored as columns, with their type."""
+    order: Dict[str, None] = {}
+    for meta in metas:
+        for key in meta:
+            order.setdefault(key, None)
+
+    columns: Dict[str, Dict[str, Any]] = {}
+    for key in order:
+        if not all(key in meta for meta in metas):
+            continue
+        values = [meta[key] for meta in metas]
+        if all(_is_int(v) for v in values):
+            columns[key] = {"type": "int"}
+        elif all(isinstance(v, str) for v in values):
+            distinct = list(dict.fromkeys(values))
+            if len(distinct) <= DICT_MAX_VALUES:
+                columns[key] = {"type": "dict", "values": distinct}
+    return list(order), columns
+
+
+def _blob(parts: Sequence[bytes]) -> Tuple[np.ndarray, bytes]:
+    offsets = np.zeros(len(parts) + 1, dtype=np.int64)
+    if parts:
+        np.cumsum([len(p) for p in parts], out=offsets[1:])
+    return offsets, b"".join(parts)
+
+
+def write_chunks(path: Union[str, Path], ids: Sequence[str], docs: Sequence[Document]) -> None:
+    """Write chunks in FAISS position order (ids[i] / docs[i] belong to vector i)."""
+    if len(ids) != len(docs):
+        raise ValueError("ids and docs must be aligned.")
+    n = len(ids)
+    metas = [dict(d.metadata or {}) for d in docs]
+    key_order, columns = _plan_columns(metas)
+
+    id_bytes = [str(i).encode("utf-8") for i in ids]
+    width = max([len(b) for b in id_bytes] + [1])
+    id_arr = np.array(id_bytes, dtype=f"S{width}") if n else np.zeros(0, dtype=f"S{width}")
+    order = np.argsort(id_arr, kind="stable").astype(np.int64)
+
+    sections: List[Tuple[str, bytes]] = [
+        ("ids", id_arr.tobytes()),
+        ("ids_sorted", id_arr[order].tobytes()),
+        ("ids_order", order.tobytes()),
+    ]
+    text_offsets, text = _blob([(d.page_content or "").encode("utf-8") for d in docs])
+    sections += [("text_offsets", text_offsets.tobytes()), ("text", text)]
+
+    for key, spec in columns.items():
+        if spec["type"] == "int":
+            col = np.array([m[key] for m in metas], dtype=np.int64)
+        else:
+            codes = {v: i for i, v in enumerate(spec["values"])}
+            col = np.array([codes[m[key]] for m in metas], dtype=np.uint32)
+        sections.append((f"col:{key}", col.tobytes()))
+
+    residual = []
+    for meta in metas:
+        rest = {k: v for k, v in meta.items() if k not in columns}
+        residual.append(_dumps(rest).encode("utf-8") if rest else b"")
+    meta_offsets, meta = _blob(residual)
+    sections += [("meta_offsets", meta_offsets.tobytes()), ("meta", meta)]
+
+    layout: Dict[str, List[int]] = {}
+    pos = 0
+    for name, data in sections:
+        layout[name] = [pos, len(data)]
+        pos += len(data) + (-len(data) % ALIGN)
+    header = json.dumps(
+        {"version": 1, "count": n, "id_width": width, "key_order": key_order, "columns": columns, "sections": layout},
+        ensure_ascii=False,
+        separators=(",", ":"),
+    ).encode("utf-8")
+    header += b" " * (-(len(MAGIC) + 8 + len(header)) % ALIGN)
+
+    with open(path, "wb") as f:
+        f.write(MAGIC)
+        f.write(np.uint64(len(header)).tobytes())
+        f.write(header)
+        for _, data in sections:
+            f.write(data)
+            f.write(b"\0" * (-len(data) % ALIGN))
+
+# ===============================
+# Reader
+# ===============================
+
+class ChunkStore:
+    """
+    Memory-mapped, read-only view of a chunks.bin file.
+
+    Opening parses only the header; ids, texts and metadata are sliced out of
+    the mapping on access, so open cost and resident memory do not grow with
+    the number of chunks that are never read.
+    """
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size == 0:
+                raise ValueError(f"Empty chunk store: {self.path}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"Not a chunk store: {self.path}")
+        header_len = int(np.frombuffer(self._mm, dtype=np.uint64, count=1, offset=len(MAGIC))[0])
+        start = len(MAGIC) + 8
+        header = json.loads(self._mm[start : start + header_len].decode("utf-8"))
+        self._base = start + header_len
+        self._count = int(header["count"])
+        self._key_order: List[str] = header["key_order"]
+        self._columns: Dict[str, Dict[str, Any]] = header["columns"]
+        self._layout: Dict[str, List[int]] = header["sections"]
+
+        width = int(header["id_width"])
+        self._ids = self._array("ids", f"S{width}")
+        self._ids_sorted = self._array("ids_sorted", f"S{width}")
+        self._ids_order = self._array("ids_order", np.int64)
+        self._text_offsets = self._array("text_offsets", np.int64)
+        self._meta_offsets = self._array("meta_offsets", np.int64)
+        self._cols = {
+            key: self._array(f"col:{key}", np.int64 if spec["type"] == "int" else np.uint32)
+            for key, spec in self._columns.items()
+        }
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> "ChunkStore":
+        return cls(path)
+
+    def _array(self, name: str, dtype) -> np.ndarray:
+        offset, length = self._layout[name]
+        dtype = np.dtype(dtype)
+        return np.frombuffer(self._mm, dtype=dtype, count=length // dtype.itemsize, offset=self._base + offset)
+
+    def _bytes(self, name: str, offsets: np.ndarray, pos: int) -> bytes:
+        start = self._base + self._layout[name][0]
+        return self._mm[start + int(offsets[pos]) : start + int(offsets[pos + 1])]
+
+    def __len__(self) -> int:
+        return self._count
+
+    # ---------------------------
+    # Access
+    # ---------------------------
+
+    def id_at(self, pos: int) -> str:
+        if not 0 <= pos < self._count:
+            raise KeyError(pos)
+        return self._ids[pos].decode("utf-8")
+
+    def position(self, store_id: str) -> Optional[int]:
+        """FAISS position of a docstore id (binary search over the sorted id column)."""
+        key = str(store_id).encode("utf-8")
+        if len(key) > self._ids_sorted.dtype.itemsize:
+            return None
+        i = int(np.searchsorted(self._ids_sorted, key))
+        if i < self._count and self._ids_sorted[i] == key:
+            return int(self._ids_order[i])
+        return None
+
+    def text(self, pos: int) -> str:
+        return self._bytes("text", self._text_offsets, pos).decode("utf-8")
+
+    def metadata(self, pos: int) -> Dict[str, Any]:
+        raw = self._bytes("meta", self._meta_offsets, pos)
+        rest = json.loads(raw.decode("utf-8")) if raw else {}
+        values: Dict[str, Any] = {}
+        for key, spec in self._columns.items():
+            v = self._cols[key][pos]
+            values[key] = int(v) if spec["type"] == "int" else spec["values"][int(v)]
+        out = {k: values[k] if k in values else rest.pop(k) for k in self._key_order if k in values or k in rest}
+        out.update(rest)
+        return out
+
+    def document(self, pos: int) -> Document:
+        return Document(page_content=self.text(pos), metadata=self.metadata(pos))
+
+    def ids(self) -> Iterator[str]:
+        for pos in range(self._count):
+            yield self.id_at(pos)
+
+    def documents(self) -> Dict[str, Document]:
+        """Every chunk, keyed by docstore id (for rewrites; readers should stay lazy)."""
+        return {self.id_at(pos): self.document(pos) for pos in range(self._count)}
+
+
+class ChunkIdMap(Mapping):
+    """FAISS position -> docstore id, read from the chunk store (index_to_docstore_id)."""
+
+    def __init__(self, chunks: ChunkStore):
+        self._chunks = chunks
+
+    def __getitem__(self, pos: int) -> str:
+        return self._chunks.id_at(int(pos))
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(range(len(self._chunks)))
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+
+class _ChunkDict(Mapping):
+    """docstore id -> Document, decoded on access."""
+
+    def __init__(self, chunks: ChunkStore):
+        self._chunks = chunks
+
+    def __getitem__(self, store_id: str) -> Document:
+        pos = self._chunks.position(store_id)
+        if pos is None:
+            raise KeyError(store_id)
+        return self._chunks.document(pos)
+
+    def __iter__(self) -> Iterator[str]:
+        return self._chunks.ids()
+
+    def __len__(self) -> int:
+        return len(self._chunks)
+
+
+class ChunkDocstore(Docstore):
+    """
+    Read-only langchain docstore over a ChunkStore.
+
+    search() follows InMemoryDocstore: the Document, or a "not found" string.
+    `_dict` is a lazy read-only mapping, for code that inspects InMemoryDocstore.
+    """
+
+    def __init__(self, chunks: ChunkStore):
+        self.chunks = chunks
+        self._dict = _ChunkDict(chunks)
+
+    def search(self, search: str) -> Union[str, Document]:
+        pos = self.chunks.position(search)
+        if pos is None:
+            return f"ID {search} not found."
+        return self.chunks.document(pos)
+
+# ===============================
+# Line rectangles
+# ===============================
+#
+#   RECTS_MAGIC | u64 n | i8 offsets (n+1, in rows) | <f4 rows (total, 4): x, y, w, h
+#
+# Highlight geometry of span-aware chunks (one rectangle per PDF line), aligned
+# with chunks.bin positions. In memory a chunk carries its rows packed under
+# metadata[LINE_RECTS_KEY]; on disk they are kept out of the chunk metadata.
+
+RECTS_FILE = "rects.bin"
+RECTS_MAGIC = b"RAGRCT01"
+LINE_RECTS_KEY = "lineRects"
+
+
+def pack_rects(rects: Any) -> bytes:
+    """(k, 4) x/y/w/h rows as little-endian float32 bytes."""
+    return np.ascontiguousarray(rects, dtype="<f4").reshape(-1, 4).tobytes()
+
+
+def unpack_rects(raw: bytes) -> np.ndarray:
+    return np.frombuffer(raw, dtype="<f4").reshape(-1, 4)
+
+
+def split_line_rects(docs: Sequence[Document]) -> Tuple[List[Document], Optional[List[bytes]]]:
+    """Docs without LINE_RECTS_KEY, and each doc's packed rects (None when no doc has any)."""
+    if not any(LINE_RECTS_KEY in (d.metadata or {}) for d in docs):
+        return list(docs), None
+    out: List[Document] = []
+    rects: List[bytes] = []
+    for d in docs:
+        meta = dict(d.metadata or {})
+        rects.append(bytes(meta.pop(LINE_RECTS_KEY, b"") or b""))
+        out.append(Document(page_content=d.page_content, metadata=meta))
+    return out, rects
+
+
+def write_rects(path: Union[str, Path], rects: Sequence[bytes]) -> None:
+    offsets = np.zeros(len(rects) + 1, dtype=np.int64)
+    if rects:
+        np.cumsum([len(r) // 16 for r in rects], out=offsets[1:])
+    with open(path, "wb") as f:
+        f.write(RECTS_MAGIC)
+        f.write(np.uint64(len(rects)).tobytes())
+        f.write(offsets.tobytes())
+        for r in rects:
+            f.write(r)
+
+
+class RectStore:
+    """Memory-mapped, read-only view of a rects.bin file."""
+
+    def __init__(self, path: Union[str, Path]):
+        self.path = str(path)
+        with open(self.path, "rb") as f:
+            if os.fstat(f.fileno()).st_size < len(RECTS_MAGIC) + 16:
+                raise ValueError(f"Not a rects file: {self.path}")
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[: len(RECTS_MAGIC)] != RECTS_MAGIC:
+            raise ValueError(f"Not a rects file: {self.path}")
+        n = int(np.frombuffer(self._mm, dtype=np.uint64, count=1, offset=len(RECTS_MAGIC))[0])
+        start = len(RECTS_MAGIC) + 8
+        self._offsets = np.frombuffer(self._mm, dtype=np.int64, count=n + 1, offset=start)
+        self._rows = start + (n + 1) * 8
+
+    @classmethod
+    def open(cls, path: Union[str, Path]) -> "RectStore":
+        return cls(path)
+
+    def __len__(self) -> int:
+        return len(self._offsets) - 1
+
+    def raw(self, pos: int) -> bytes:
+        a, b = int(self._offsets[pos]), int(self._offsets[pos + 1])
+        return self._mm[self._rows + a * 16 : self._rows + b * 16]
+
+    def rects(self, pos: int) -> np.ndarray:
+        """(k, 4) float32 rows x, y, w, h (PDF space, bottom-left origin) of chunk `pos`."""
+        return unpack_rects(self.raw(pos))
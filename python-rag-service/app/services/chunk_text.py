@@ -5,10 +5,17 @@ import os
 from dataclasses import dataclass
 from typing import Optional, List, Dict, Any, Callable, Tuple, Union
 
+import numpy as np
+
 from langchain_core.documents import Document
 from langchain.text_splitter import RecursiveCharacterTextSplitter
 from langchain_experimental.text_splitter import SemanticChunker
 from langchain_openai.embeddings import OpenAIEmbeddings
+from app.services.embedding_backends import backend_embeddings, default_embedding_model
+from app.services.chunk_store import LINE_RECTS_KEY
+from app.services.semantic_chunking import HierarchicalSemanticChunker
+from app.services.utils.spans import SpanArrays, bbox_dict
+from app.services.utils.token_counter import get_token_counter
 
 logger = logging.getLogger(__name__)
 
@@ -27,19 +34,12 @@ BOILERPLATE_WORDS_RE = re.compile(r"^(?:\s*(?:Confidential|Draft|\d+)\s*)$", re.
 # Token Counter
 # =============================================================================
 
-try:
-    import tiktoken
-    _ENCODER = tiktoken.get_encoding("cl100k_base")
+# Memoized; spans, chunks and parts are often counted more than once.
+_TOKENS = get_token_counter("cl100k_base")
 
-    def _count_tokens(s: str) -> int:
-        return len(_ENCODER.encode(s))
-except ImportError:
-    _ENCODER = None
 
-    def _count_tokens(s: str) -> int:
-        words = len(s.split())
-        chars = len(s)
-        return max(1, int((words * 1.3) + (chars * 0.2)))
+def _count_tokens(s: str) -> int:
+    return _TOKENS.count(s)
 
 # =============================================================================
 # Helpers
@@ -64,7 +64,12 @@ class SplitConfig:
     semantic_threshold_amount: int = 95
     min_chars_per_chunk: int = 80
     max_chunks: Optional[int] = None
-    rec_separators: tuple = ("\n\n", "\n", ". ", " ", "") 
+    rec_separators: tuple = ("\n\n", "\n", ". ", " ", "")
+    # "sentence": SemanticChunker (one embedding per sentence);
+    # "hierarchical": HierarchicalSemanticChunker (one per window of ~semantic_window_tokens)
+    semantic_strategy: str = os.getenv("SEMANTIC_STRATEGY", "sentence")
+    semantic_window_tokens: int = 384
+    semantic_refine_sentences: int = 0
 
 # =============================================================================
 # Main Class: TextSplitter
@@ -76,11 +81,9 @@ class TextSplitter:
     markdown heading parsing, and recursive fallback.
     """
 
-    _embeddings_cache = {}
-
     def __init__(
         self,
-        embedding_model: str = os.getenv("EMBEDDING_MODEL", "text-embedding-3-small"),
+        embedding_model: Optional[str] = None,
         legal_mode: bool = False,
         semantic_mode: bool = True,
         embeddings: Optional[OpenAIEmbeddings] = None,
@@ -93,14 +96,24 @@ class TextSplitter:
         if embeddings:
             self.embeddings = embeddings
         elif semantic_mode:
-            cache_key = embedding_model
-            if cache_key not in self._embeddings_cache:
-                logger.info(f"Creating new embeddings instance for {embedding_model}")
-                self._embeddings_cache[cache_key] = OpenAIEmbeddings(model=embedding_model)
-            self.embeddings = self._embeddings_cache[cache_key]
+            self.embeddings = backend_embeddings(
+                embedding_model or default_embedding_model("text-embedding-3-small"),
+                factory=OpenAIEmbeddings,
+            )
         else:
             self.embeddings = None
-            
+
+        self._hierarchical: Optional[HierarchicalSemanticChunker] = None
+        if self.embeddings and cfg.semantic_strategy == "hierarchical":
+            self._hierarchical = HierarchicalSemanticChunker(
+                self.embeddings,
+                count_tokens=_TOKENS.count_many,
+                breakpoint_type=cfg.semantic_breakpoint,
+                breakpoint_amount=cfg.semantic_threshold_amount,
+                window_tokens=cfg.semantic_window_tokens,
+                refine_sentences=cfg.semantic_refine_sentences,
+            )
+
         logger.info("TextSplitter initialized legal=%s semantic=%s", legal_mode, semantic_mode)
 
     def _remove_boilerplate(self, text: str) -> str:
@@ -142,9 +155,11 @@ class TextSplitter:
         heading: Optional[str], 
         chunk_type: str,         
         bbox: Optional[Dict[str, float]] = None,
+        token_count: Optional[int] = None,
     ) -> Document:
-        """Wrap raw text into LangChain Document with metadata."""
-        token_count = _count_tokens(content)
+        """Wrap raw text into LangChain Document with metadata (token_count: already known count)."""
+        if token_count is None:
+            token_count = _count_tokens(content)
         meta: Dict[str, Any] = {
             "documentId": document_id,
             "pageNumber": page_number,
@@ -179,6 +194,8 @@ class TextSplitter:
             return self._recursive_split(content), False
 
         try:
+            if self._hierarchical is not None:
+                return self._hierarchical.split_text(content), True
             sc = SemanticChunker(
                 self.embeddings,
                 breakpoint_threshold_type=self.cfg.semantic_breakpoint,
@@ -198,81 +215,79 @@ class TextSplitter:
     # =============================================================================
 
     @staticmethod
-    def _union_bbox(spans: List[Dict[str, Any]], page_number: int) -> Optional[Dict[str, float]]:
+    def _union_bbox(spans: Union[SpanArrays, List[Dict[str, Any]]], page_number: int) -> Optional[Dict[str, float]]:
         """Calculate union bounding box from multiple spans."""
-        if not spans:
+        spans = SpanArrays.coerce(spans)
+        if not len(spans):
             return None
+        return bbox_dict(spans.union_bboxes([0])[0], page_number)
 
-        valid_spans = [s for s in spans if s.get("bbox")]
-        if not valid_spans:
-            return None
-            
-        xs = [s["bbox"]["x"] for s in valid_spans]
-        ys = [s["bbox"]["y"] for s in valid_spans]
-        xe = [s["bbox"]["x"] + s["bbox"]["width"] for s in valid_spans]
-        ye = [s["bbox"]["y"] + s["bbox"]["height"] for s in valid_spans]
-        
-        x = float(min(xs))
-        y = float(min(ys))
-        width = float(max(xe) - x)
-        height = float(max(ye) - y)
-        
-        return {"x": x, "y": y, "width": width, "height": height, "page": page_number}
+    def _span_boundaries(self, counts: np.ndarray) -> np.ndarray:
+        """
+        Chunk start indices from cumulative token sums: each chunk is the longest run
+        of lines whose tokens fit rec_chunk_size; a line over the limit stands alone.
+        Loops once per chunk, not per line.
+        """
+        limit = self.cfg.rec_chunk_size
+        cum = np.concatenate([[0], np.cumsum(counts)])
+        starts: List[int] = []
+        i, n = 0, len(counts)
+        while i < n:
+            starts.append(i)
+            if counts[i] > limit:
+                i += 1
+            else:
+                i = int(np.searchsorted(cum, cum[i] + limit, side="right")) - 1
+        return np.asarray(starts, dtype=np.int64)
 
     def _chunk_by_spans(
         self,
-        spans: List[Dict[str, Any]],
+        spans: Union[SpanArrays, List[Dict[str, Any]]],
         document_id: str,
         page_number: int,
         heading: Optional[str] = None,
     ) -> List[Document]:
         chunks: List[Document] = []
-        if not spans:
+        spans = SpanArrays.coerce(spans)
+        if not len(spans):
             return chunks
 
-        cur_spans: List[Dict[str, Any]] = []
-        cur_texts: List[str] = []
-        cur_tokens = 0
+        lines = spans.lines()
+        counts = np.asarray(_TOKENS.count_many(lines), dtype=np.int64)
         limit = self.cfg.rec_chunk_size
         min_chars = self.cfg.min_chars_per_chunk
-
-        def flush():
-            nonlocal cur_spans, cur_texts, cur_tokens
-            if not cur_texts:
-                return
-            text = "\n".join(cur_texts).strip()
-            if len(text) < min_chars:
-                if chunks and chunks[-1].metadata.get("pageNumber") == page_number:
-                    merged = chunks[-1].page_content + "\n" + text
-                    if _count_tokens(merged) <= int(limit * 1.2):
-                        chunks[-1].page_content = merged
-                cur_spans, cur_texts, cur_tokens = [], [], 0
-                return
-            bbox = self._union_bbox(cur_spans, page_number)
-            chunks.append(self._wrap(text, document_id, page_number, heading, "by_spans", bbox=bbox))
-            cur_spans, cur_texts, cur_tokens = [], [], 0
-
-        for s in spans:
-            if not isinstance(s, dict):
-                continue
-            txt = (s.get("text") or "").strip()
-            if not txt:
+        newline_tokens = _TOKENS.count("\n")
+
+        # Tokens and characters of each "\n"-joined run come from the per-line
+        # sums (TokenCounter.count_joined semantics) instead of re-encoding.
+        starts = self._span_boundaries(counts)
+        stops = np.append(starts[1:], len(lines))
+        n_lines = stops - starts
+        tokens = np.add.reduceat(counts, starts) + (n_lines - 1) * newline_tokens
+        chars = np.add.reduceat(spans.char_lengths(), starts) + (n_lines - 1)
+        boxes = spans.union_bboxes(starts)
+        # Per-line rectangles for highlighting, packed (see chunk_store.pack_rects)
+        rects = np.stack([spans.x, spans.y, spans.w, spans.h], axis=1).astype("<f4")
+        has_box = ~np.isnan(spans.x)
+
+        for k, (a, b) in enumerate(zip(starts.tolist(), stops.tolist())):
+            text = "\n".join(lines[a:b])
+            n_tokens = int(tokens[k])
+            line_rects = rects[a:b][has_box[a:b]].tobytes()
+            if chars[k] < min_chars and counts[a] <= limit:
+                if chunks:
+                    merged_tokens = _TOKENS.count_joined([chunks[-1].metadata["tokenCount"], n_tokens])
+                    if merged_tokens <= int(limit * 1.2):
+                        chunks[-1].page_content = chunks[-1].page_content + "\n" + text
+                        chunks[-1].metadata["tokenCount"] = merged_tokens
+                        chunks[-1].metadata[LINE_RECTS_KEY] += line_rects
                 continue
-            t = _count_tokens(txt)
-
-            if t > limit:
-                flush()
-                chunks.append(self._wrap(txt, document_id, page_number, heading, "by_spans", bbox=s.get("bbox")))
-                continue
-
-            if cur_tokens + t > limit:
-                flush()
-
-            cur_spans.append(s)
-            cur_texts.append(txt)
-            cur_tokens += t
-
-        flush()
+            chunk = self._wrap(
+                text, document_id, page_number, heading, "by_spans",
+                bbox=bbox_dict(boxes[k], page_number), token_count=n_tokens,
+            )
+            chunk.metadata[LINE_RECTS_KEY] = line_rects
+            chunks.append(chunk)
         return chunks
 
     # =============================================================================
@@ -288,8 +303,9 @@ class TextSplitter:
         chunk_type: str
     ) -> List[Document]:
         """Chunk content and wrap with metadata."""
-        if _count_tokens(content) <= self.cfg.max_tokens_single:
-            return [self._wrap(content, document_id, page_number, heading, chunk_type)]
+        content_tokens = _count_tokens(content)
+        if content_tokens <= self.cfg.max_tokens_single:
+            return [self._wrap(content, document_id, page_number, heading, chunk_type, token_count=content_tokens)]
 
         used_semantic = False
         parts: List[str]
@@ -301,11 +317,12 @@ class TextSplitter:
             parts = self._recursive_split(content)
             final_type = "recursive"
 
-        meaningful_parts = [p for p in parts if _count_tokens(p) >= 3]
+        part_tokens = _TOKENS.count_many(parts)
 
         return [
-            self._wrap(p, document_id, page_number, heading, final_type)
-            for p in meaningful_parts
+            self._wrap(p, document_id, page_number, heading, final_type, token_count=n)
+            for p, n in zip(parts, part_tokens)
+            if n >= 3
         ]
 
     def split_text(
@@ -0,0 +1,215 @@
+import logging
+import os
+import threading
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Hashable, Optional
+
+import anyio
+import httpx
+from langchain_openai import OpenAI, OpenAIEmbeddings
+
+from app.services.embedding_scheduler import EmbeddingScheduler, EmbeddingSchedulerConfig
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# Config
+# ===============================
+
+def _h2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+@dataclass
+class ClientConfig:
+    """
+    Shared HTTP settings for every OpenAI(-compatible) client in the process:
+    - base_url: OPENAI_BASE_URL (e.g. a local stub or proxy); None = api.openai.com
+    - max_connections / max_keepalive: connection pool limits per transport
+    - keepalive_expiry_s: idle time before a pooled connection is closed
+    - timeout_s / connect_timeout_s: request and connect timeouts
+    - http2: negotiate HTTP/2 when the optional `h2` package is installed
+    - max_retries: retries done by the OpenAI SDK
+    """
+    base_url: Optional[str] = os.getenv("OPENAI_BASE_URL") or None
+    max_connections: int = int(os.getenv("OPENAI_MAX_CONNECTIONS", "64"))
+    max_keepalive: int = int(os.getenv("OPENAI_MAX_KEEPALIVE", "16"))
+    keepalive_expiry_s: float = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY_S", "30"))
+    timeout_s: float = float(os.getenv("OPENAI_TIMEOUT_S", "60"))
+    connect_timeout_s: float = float(os.getenv("OPENAI_CONNECT_TIMEOUT_S", "10"))
+    http2: bool = os.getenv("OPENAI_HTTP2", "1") == "1"
+    max_retries: int = int(os.getenv("OPENAI_MAX_RETRIES", "2"))
+
+# ===============================
+# Registry
+# ===============================
+
+class ClientRegistry:
+    """
+    Process-wide owner of the pooled HTTP transports and the LangChain clients built on them.
+
+    - One sync and one async httpx client (keep-alive, HTTP/2 if available)
+    - LLM and embedding clients are created once per configuration and reused
+    - Created lazily by get_registry(), or up front by the FastAPI lifespan
+    """
+
+    def __init__(self, cfg: Optional[ClientConfig] = None):
+        self.cfg = cfg or ClientConfig()
+        self._lock = threading.Lock()
+        self._http: Optional[httpx.Client] = None
+        self._async_http: Optional[httpx.AsyncClient] = None
+        self._clients: Dict[Hashable, Any] = {}
+        self.http2 = self.cfg.http2 and _h2_available()
+
+    # ---------------------------
+    # Transports
+    # ---------------------------
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.cfg.max_connections,
+            max_keepalive_connections=self.cfg.max_keepalive,
+            keepalive_expiry=self.cfg.keepalive_expiry_s,
+        )
+
+    def _timeout(self) -> httpx.Timeout:
+        return httpx.Timeout(self.cfg.timeout_s, connect=self.cfg.connect_timeout_s)
+
+    @property
+    def http_client(self) -> httpx.Client:
+        with self._lock:
+            if self._http is None:
+                self._http = httpx.Client(limits=self._limits(), timeout=self._timeout(), http2=self.http2)
+            return self._http
+
+    @property
+    def async_http_client(self) -> httpx.AsyncClient:
+        with self._lock:
+            if self._async_http is None:
+                self._async_http = httpx.AsyncClient(limits=self._limits(), timeout=self._timeout(), http2=self.http2)
+            return self._async_http
+
+    def openai_kwargs(self) -> Dict[str, Any]:
+        """Constructor kwargs that point a langchain_openai client at the shared pools."""
+        kwargs: Dict[str, Any] = {
+            "http_client": self.http_client,
+            "http_async_client": self.async_http_client,
+            "max_retries": self.cfg.max_retries,
+        }
+        if self.cfg.base_url:
+            kwargs["openai_api_base"] = self.cfg.base_url
+        return kwargs
+
+    # ---------------------------
+    # Clients
+    # ---------------------------
+
+    def _get_or_create(self, key: Hashable, create: Callable[[], Any]) -> Any:
+        with self._lock:
+            client = self._clients.get(key)
+        if client is not None:
+            return client
+        client = create()
+        with self._lock:
+            return self._clients.setdefault(key, client)
+
+    def llm(self, factory: Callable[..., Any] = OpenAI, **params: Any) -> Any:
+        """Shared completion client for the given parameters (temperature, max_tokens, ...)."""
+        key = ("llm", factory, tuple(sorted(params.items())))
+        return self._get_or_create(key, lambda: factory(**params, **self.openai_kwargs()))
+
+    def embeddings(self, model: str, factory: Callable[..., Any] = OpenAIEmbeddings, remote: bool = True) -> Any:
+        """Shared embeddings client for `model`; remote=False for in-process models (no HTTP settings)."""
+        key = ("embeddings", factory, model)
+        return self._get_or_create(key, lambda: factory(model=model, **(self.openai_kwargs() if remote else {})))
+
+    def scheduled_embeddings(
+        self,
+        model: str,
+        factory: Callable[..., Any] = OpenAIEmbeddings,
+        remote: bool = True,
+        **overrides: Any,
+    ) -> Any:
+        """
+        Shared embeddings client for `model` behind the process-wide EmbeddingScheduler,
+        so every caller's requests are batched and rate-limited together.
+        `overrides` replace EmbeddingSchedulerConfig fields (used on first creation).
+        The wrapped client is built with SDK retries off (the scheduler retries).
+        Returns the plain client when EMBEDDING_SCHEDULER=0.
+        """
+        cfg = EmbeddingSchedulerConfig()
+        if not cfg.enabled:
+            return self.embeddings(model, factory=factory, remote=remote)
+        cfg = replace(cfg, **overrides)
+
+        def create() -> EmbeddingScheduler:
+            # The scheduler owns retries/backoff; SDK retries on top would multiply them.
+            kwargs = {**self.openai_kwargs(), "max_retries": 0} if remote else {}
+            return EmbeddingScheduler(factory(model=model, **kwargs), cfg=cfg)
+
+        key = ("scheduled_embeddings", factory, model)
+        return self._get_or_create(key, create)
+
+    # ---------------------------
+    # Shutdown
+    # ---------------------------
+
+    def close(self) -> None:
+        with self._lock:
+            http, self._http = self._http, None
+            clients = list(self._clients.values())
+            self._clients.clear()
+        for client in clients:
+            if isinstance(client, EmbeddingScheduler):
+                client.close()
+        if http is not None:
+            http.close()
+
+    async def aclose(self) -> None:
+        """Async shutdown; the blocking part (schedulers drain their queued batches) runs in a worker thread."""
+        with self._lock:
+            async_http, self._async_http = self._async_http, None
+        if async_http is not None:
+            await async_http.aclose()
+        await anyio.to_thread.run_sync(self.close)
+
+
+_REGISTRY: Optional[ClientRegistry] = None
+_REGISTRY_LOCK = threading.Lock()
+
+
+def get_registry() -> ClientRegistry:
+    """The process-wide registry; created on first use."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        if _REGISTRY is None:
+            _REGISTRY = ClientRegistry()
+            logger.info(
+                "Client registry created (base_url=%s, http2=%s, max_connections=%d)",
+                _REGISTRY.cfg.base_url or "default", _REGISTRY.http2, _REGISTRY.cfg.max_connections,
+            )
+        return _REGISTRY
+
+
+def set_registry(registry: Optional[ClientRegistry]) -> None:
+    """Install (or with None, drop) the process-wide registry. Used by tests."""
+    global _REGISTRY
+    with _REGISTRY_LOCK:
+        _REGISTRY = registry
+
+
+@asynccontextmanager
+async def lifespan(app):
+    """FastAPI lifespan: create the shared clients at startup, close the pools at shutdown."""
+    registry = get_registry()
+    app.state.clients = registry
+    try:
+        yield
+    finally:
+        await registry.aclose()
+        set_registry(None)
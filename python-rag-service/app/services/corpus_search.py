@@ -0,0 +1,240 @@
+import heapq
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+from app.services.vector_store import CENTROID_FILE, VectorStore, add_invalidation_listener, index_centroid
+
+logger = logging.getLogger(__name__)
+
+DOC_PREFIX = "doc_"
+
+# ===============================
+# Config
+# ===============================
+
+@dataclass
+class CorpusSearchConfig:
+    """
+    - route_docs: documents whose index is actually searched per query, picked by
+      centroid similarity (CORPUS_ROUTE_DOCS); an explicit documentIds filter
+      bypasses routing
+    - per_doc_k: minimum hits taken from each searched document before the global
+      merge (each document contributes max(k, per_doc_k), so the merge is exact)
+    - workers: threads fanning a query out over document indexes (CORPUS_SEARCH_WORKERS)
+    """
+    route_docs: int = int(os.getenv("CORPUS_ROUTE_DOCS", "64"))
+    per_doc_k: int = 4
+    workers: int = int(os.getenv("CORPUS_SEARCH_WORKERS", "8"))
+
+# ===============================
+# Router
+# ===============================
+
+class CorpusRouter:
+    """
+    In-memory matrix of per-document centroids for one model directory.
+
+    - Rebuilt lazily when the directory listing changes (atomic index writes
+      rename folders, which bumps the directory mtime) or after invalidate().
+    - Unchanged documents keep their cached centroid; only new/rewritten ones
+      are read (centroid.npy, or computed once from index.faiss for indexes
+      written before centroids existed).
+    - Temp/old folders (dot-prefixed) are ignored.
+    """
+
+    def __init__(self, base_dir: Path):
+        self.base_dir = Path(base_dir)
+        self._lock = threading.Lock()
+        self._dir_mtime: Optional[int] = None
+        self._stamps: Dict[str, int] = {}
+        self._centroids: Dict[str, np.ndarray] = {}
+        self._ids: List[str] = []
+        self._matrix = np.zeros((0, 0), dtype=np.float32)
+
+    def invalidate(self, doc_id: Optional[str] = None) -> None:
+        with self._lock:
+            self._dir_mtime = None
+            if doc_id is not None:
+                self._stamps.pop(str(doc_id), None)
+
+    def document_ids(self) -> List[str]:
+        self.refresh()
+        return list(self._ids)
+
+    def refresh(self) -> None:
+        try:
+            mtime = self.base_dir.stat().st_mtime_ns
+        except FileNotFoundError:
+            mtime = -1
+        with self._lock:
+            if mtime == self._dir_mtime:
+                return
+
+            seen: Dict[str, Path] = {}
+            if mtime != -1:
+                with os.scandir(self.base_dir) as it:
+                    for entry in it:
+                        if entry.name.startswith(DOC_PREFIX) and entry.is_dir():
+                            seen[entry.name[len(DOC_PREFIX):]] = Path(entry.path)
+
+            for doc_id in list(self._centroids):
+                if doc_id not in seen:
+                    self._centroids.pop(doc_id, None)
+                    self._stamps.pop(doc_id, None)
+
+            for doc_id, folder in seen.items():
+                stamp = _folder_stamp(folder)
+                if stamp is None:
+                    continue
+                if self._stamps.get(doc_id) != stamp:
+                    centroid = _load_centroid(folder)
+                    if centroid is None:
+                        continue
+                    self._centroids[doc_id] = centroid
+                    self._stamps[doc_id] = stamp
+
+            ids = sorted(self._centroids)
+            dims = {self._centroids[d].shape[0] for d in ids}
+            if len(dims) == 1:
+                self._ids, self._matrix = ids, np.stack([self._centroids[d] for d in ids])
+            else:
+                if dims:
+                    logger.warning("Mixed embedding dimensions under %s; routing disabled", self.base_dir)
+                self._ids, self._matrix = [], np.zeros((0, 0), dtype=np.float32)
+            self._dir_mtime = mtime
+            logger.info("Corpus router refreshed: %d documents under %s", len(self._ids), self.base_dir)
+
+    def route(self, query_vector: Sequence[float], n: int) -> List[str]:
+        """The n document ids whose centroid is most similar to the query."""
+        self.refresh()
+        with self._lock:
+            ids, matrix = self._ids, self._matrix
+        if not ids or n <= 0:
+            return []
+        q = np.asarray(query_vector, dtype=np.float32).ravel()
+        norm = float(np.linalg.norm(q))
+        if norm > 0:
+            q = q / norm
+        if matrix.shape[1] != q.shape[0]:
+            return []
+        sims = matrix @ q
+        if len(ids) > n:
+            top = np.argpartition(-sims, n - 1)[:n]
+            top = top[np.argsort(-sims[top], kind="stable")]
+        else:
+            top = np.argsort(-sims, kind="stable")
+        return [ids[i] for i in top]
+
+
+def _folder_stamp(folder: Path) -> Optional[int]:
+    try:
+        return (folder / "index.faiss").stat().st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+def _load_centroid(folder: Path) -> Optional[np.ndarray]:
+    path = folder / CENTROID_FILE
+    try:
+        if path.is_file():
+            return np.load(path).astype(np.float32)
+        import faiss
+        return index_centroid(faiss.read_index(str(folder / "index.faiss")))
+    except Exception as e:
+        logger.warning("No centroid for %s: %s", folder, e)
+        return None
+
+# ===============================
+# Search
+# ===============================
+
+class CorpusSearch:
+    """
+    Search across all documents of one embedding model.
+
+    Flow:
+      1) embed the query once
+      2) pick candidate documents: the documentIds filter, or the top
+         cfg.route_docs by centroid similarity
+      3) fan out over a thread pool; each document index returns
+         max(k, cfg.per_doc_k) hits (indexes come from VectorStore's bounded
+         LRU, never all at once); a document whose index fails is logged and skipped
+      4) heap-merge to the global top-k by distance
+    """
+
+    def __init__(self, vector_store: Optional[VectorStore] = None, cfg: Optional[CorpusSearchConfig] = None):
+        self.vector_store = vector_store or VectorStore()
+        self.cfg = cfg or CorpusSearchConfig()
+        self.router = CorpusRouter(self.vector_store.model_base_dir)
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        add_invalidation_listener(self.router.invalidate)
+
+    def _executor(self) -> ThreadPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=max(1, self.cfg.workers), thread_name_prefix="corpus")
+            return self._pool
+
+    def close(self) -> None:
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
+    def search(
+        self,
+        query: str,
+        k: int = 10,
+        document_ids: Optional[Sequence[str]] = None,
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> List[Document]:
+        """
+        Top-k chunks across the corpus (or across `document_ids`).
+
+        Returned Documents are copies carrying `distance` (lower is better) in metadata.
+        """
+        if query_vector is None:
+            query_vector = self.vector_store.embed_query(query)
+
+        if document_ids:
+            candidates = list(dict.fromkeys(str(d) for d in document_ids))
+        else:
+            candidates = self.router.route(query_vector, self.cfg.route_docs)
+        if not candidates:
+            return []
+
+        per_doc = max(k, self.cfg.per_doc_k, 1)
+        pool = self._executor()
+        futures = [pool.submit(self._search_document, doc_id, query_vector, per_doc) for doc_id in candidates]
+        hits = heapq.merge(*(f.result() for f in futures), key=lambda h: h[0])
+
+        out: List[Document] = []
+        for distance, _, doc in hits:
+            out.append(Document(
+                page_content=doc.page_content,
+                metadata={**(doc.metadata or {}), "distance": round(float(distance), 6)},
+            ))
+            if len(out) >= k:
+                break
+        return out
+
+    def _search_document(self, doc_id: str, query_vector: Sequence[float], k: int) -> List[Tuple[float, str, Document]]:
+        """Sorted (distance, doc_id, Document) hits of one document; [] if its index is missing or unusable."""
+        try:
+            store = self.vector_store.load_faiss_store(doc_id, as_retriever=False)
+            pairs = store.similarity_search_with_score_by_vector(list(query_vector), k=k)
+        except FileNotFoundError:
+            return []
+        except Exception:
+            logger.exception("Corpus search skipped document %s", doc_id)
+            return []
+        return sorted(((float(score), doc_id, doc) for doc, score in pairs), key=lambda h: h[0])
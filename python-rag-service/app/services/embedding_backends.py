@@ -0,0 +1,207 @@
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_openai import OpenAIEmbeddings
+
+from app.services.clients import get_registry
+
+logger = logging.getLogger(__name__)
+
+OPENAI, LOCAL = "openai", "local"
+# Local model names carry this prefix everywhere (VectorStore.model_base_dir, the
+# embedding cache), so indexes built by different backends never mix.
+LOCAL_PREFIX = "local/"
+
+# ===============================
+# Config
+# ===============================
+
+@dataclass
+class EmbeddingBackendConfig:
+    """
+    - backend: EMBEDDING_BACKEND = "openai" | "local"
+    - local_model: sentence-transformers model name or directory (LOCAL_EMBEDDING_MODEL);
+      a directory holding model.onnx (or onnx/model.onnx) and tokenizer.json runs on onnxruntime
+    - threads: CPU threads for local inference (LOCAL_EMBEDDING_THREADS; 0 = library default)
+    - batch_size: texts per forward pass; also the scheduler's batch size, so a query
+      waits for at most one bulk forward pass
+    - max_wait_ms: how long bulk texts wait to fill a forward pass
+    - max_length: tokens per text; longer input is truncated
+    """
+    backend: str = os.getenv("EMBEDDING_BACKEND", OPENAI).lower()
+    local_model: str = os.getenv("LOCAL_EMBEDDING_MODEL", "sentence-transformers/all-MiniLM-L6-v2")
+    threads: int = int(os.getenv("LOCAL_EMBEDDING_THREADS", "0"))
+    batch_size: int = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+    max_wait_ms: float = float(os.getenv("LOCAL_EMBEDDING_MAX_WAIT_MS", "2"))
+    max_length: int = int(os.getenv("LOCAL_EMBEDDING_MAX_LENGTH", "256"))
+
+
+def is_local_model(model: str) -> bool:
+    return model.startswith(LOCAL_PREFIX)
+
+
+def default_embedding_model(
+    openai_default: str = "text-embedding-3-large",
+    cfg: Optional[EmbeddingBackendConfig] = None,
+) -> str:
+    """Model name of the configured backend: EMBEDDING_MODEL for OpenAI, "local/<model>" for local."""
+    cfg = cfg or EmbeddingBackendConfig()
+    if cfg.backend == LOCAL:
+        return LOCAL_PREFIX + cfg.local_model
+    if cfg.backend != OPENAI:
+        raise ValueError(f"Unknown EMBEDDING_BACKEND: {cfg.backend!r} (expected 'openai' or 'local')")
+    return os.getenv("EMBEDDING_MODEL", openai_default)
+
+
+def backend_embeddings(model: str, factory: Callable[..., Embeddings] = OpenAIEmbeddings) -> Embeddings:
+    """
+    Shared, scheduled embeddings for `model`: LocalEmbeddings for "local/..." names,
+    otherwise `factory` (the OpenAI client) on the pooled transports.
+    """
+    if not is_local_model(model):
+        return get_registry().scheduled_embeddings(model, factory=factory)
+    cfg = EmbeddingBackendConfig()
+    # No API budgets; one forward pass at a time, each at most batch_size texts
+    return get_registry().scheduled_embeddings(
+        model,
+        factory=LocalEmbeddings,
+        remote=False,
+        rpm=0,
+        tpm=0,
+        concurrency=1,
+        max_batch_inputs=cfg.batch_size,
+        max_wait_ms=cfg.max_wait_ms,
+    )
+
+# ===============================
+# Local inference
+# ===============================
+
+def mean_pool(hidden: np.ndarray, mask: np.ndarray, normalize: bool = True) -> np.ndarray:
+    """Attention-masked mean over tokens (sentence-transformers pooling), L2-normalized."""
+    mask = mask[..., None].astype(hidden.dtype)
+    pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+    if normalize:
+        pooled /= np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+    return pooled.astype(np.float32)
+
+
+def _onnx_file(model_dir: Path) -> Optional[Path]:
+    for candidate in (model_dir / "model.onnx", model_dir / "onnx" / "model.onnx"):
+        if candidate.is_file():
+            return candidate
+    return None
+
+
+class _OnnxEncoder:
+    """onnxruntime session + HF tokenizer for an exported sentence-transformers model."""
+
+    def __init__(self, model_dir: Path, onnx_path: Path, cfg: EmbeddingBackendConfig):
+        import onnxruntime as ort
+        from tokenizers import Tokenizer
+
+        opts = ort.SessionOptions()
+        opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        opts.inter_op_num_threads = 1
+        if cfg.threads:
+            opts.intra_op_num_threads = cfg.threads
+        self.session = ort.InferenceSession(str(onnx_path), sess_options=opts, providers=["CPUExecutionProvider"])
+        self.inputs = {i.name for i in self.session.get_inputs()}
+
+        self.tokenizer = Tokenizer.from_file(str(model_dir / "tokenizer.json"))
+        self.tokenizer.enable_truncation(max_length=cfg.max_length)
+        self.tokenizer.enable_padding()
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        encoded = self.tokenizer.encode_batch(texts)
+        ids = np.array([e.ids for e in encoded], dtype=np.int64)
+        mask = np.array([e.attention_mask for e in encoded], dtype=np.int64)
+        feeds = {"input_ids": ids, "attention_mask": mask}
+        if "token_type_ids" in self.inputs:
+            feeds["token_type_ids"] = np.zeros_like(ids)
+        hidden = self.session.run(None, feeds)[0]
+        return mean_pool(hidden, mask)
+
+
+class _SentenceTransformerEncoder:
+    def __init__(self, name: str, cfg: EmbeddingBackendConfig):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if cfg.threads:
+            torch.set_num_threads(cfg.threads)
+        self.model = SentenceTransformer(name, device="cpu")
+        self.model.max_seq_length = cfg.max_length
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        return self.model.encode(
+            texts,
+            batch_size=len(texts),
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+            show_progress_bar=False,
+        ).astype(np.float32)
+
+
+class LocalEmbeddings(Embeddings):
+    """
+    CPU embeddings from a sentence-transformers model, or its ONNX export.
+
+    - The model is loaded on first use (ONNX if the model directory has one)
+    - Texts are sorted by length before batching, so each forward pass pads
+      to similar lengths; results come back in input order
+    - Vectors are L2-normalized
+    Concurrent callers are batched by the EmbeddingScheduler in front of it
+    (see backend_embeddings); calls here run one forward pass at a time.
+    """
+
+    def __init__(self, model: str, cfg: Optional[EmbeddingBackendConfig] = None, encoder=None):
+        self.model = model if is_local_model(model) else LOCAL_PREFIX + model
+        self.cfg = cfg or EmbeddingBackendConfig()
+        self._encoder = encoder
+        self._lock = threading.Lock()
+
+    @property
+    def model_path(self) -> str:
+        return self.model[len(LOCAL_PREFIX):]
+
+    def _load(self):
+        if self._encoder is None:
+            model_dir = Path(self.model_path)
+            onnx_path = _onnx_file(model_dir) if model_dir.is_dir() else None
+            try:
+                if onnx_path is not None:
+                    self._encoder = _OnnxEncoder(model_dir, onnx_path, self.cfg)
+                else:
+                    self._encoder = _SentenceTransformerEncoder(self.model_path, self.cfg)
+            except ImportError as e:
+                raise RuntimeError(
+                    f"Local embedding backend needs {'onnxruntime and tokenizers' if onnx_path else 'sentence-transformers'}: {e}"
+                ) from e
+            logger.info("Local embeddings loaded: %s (%s)", self.model_path, "onnx" if onnx_path else "sentence-transformers")
+        return self._encoder
+
+    def _encode(self, texts: List[str]) -> np.ndarray:
+        with self._lock:
+            encoder = self._load()
+            order = np.argsort([len(t) for t in texts], kind="stable")
+            out: Optional[np.ndarray] = None
+            for start in range(0, len(texts), max(1, self.cfg.batch_size)):
+                rows = order[start : start + self.cfg.batch_size]
+                vectors = encoder.encode([texts[i] for i in rows])
+                if out is None:
+                    out = np.empty((len(texts), vectors.shape[1]), dtype=np.float32)
+                out[rows] = vectors
+            return out if out is not None else np.zeros((0, 0), dtype=np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self._encode([text])[0].tolist()
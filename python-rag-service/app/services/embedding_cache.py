@@ -0,0 +1,146 @@
+import hashlib
+import logging
+import os
+import sqlite3
+import threading
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# Helpers
+# ===============================
+
+_SQLITE_MAX_VARS = 500
+
+
+def content_hash(text: str) -> str:
+    """SHA-1 of whitespace-normalized text (same key used for chunk dedupe)."""
+    normalized = " ".join((text or "").split()).strip()
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def default_cache_path() -> str:
+    base = os.getenv("FAISS_STORE_PATH", "faiss_index")
+    return os.getenv("EMBEDDING_CACHE_PATH", os.path.join(base, "embedding_cache.sqlite3"))
+
+# ===============================
+# Cache
+# ===============================
+
+class CachedEmbeddings(Embeddings):
+    """
+    Persistent, content-addressed cache in front of an Embeddings instance.
+
+    - Key: (embedding model, SHA-1 of normalized text)
+    - Storage: single SQLite file (WAL), vectors as float32 blobs
+    - Only texts missing from the cache are sent to the wrapped embeddings;
+      duplicates within one call are embedded once.
+    - Queries are passed through uncached.
+
+    The database is opened lazily on first use.
+    """
+
+    def __init__(self, embeddings: Embeddings, model: str, path: Optional[str] = None):
+        self.embeddings = embeddings
+        self.model = model
+        self.path = path or default_cache_path()
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------------------
+    # Embeddings interface
+    # ---------------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        keys = [content_hash(t) for t in texts]
+        found = self._lookup(list(dict.fromkeys(keys)))
+
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        with self._lock:
+            self.hits += len(keys) - sum(1 for k in keys if k in missing)
+            self.misses += len(missing)
+
+        if missing:
+            fresh = self.embeddings.embed_documents(list(missing.values()))
+            new_rows = dict(zip(missing.keys(), fresh))
+            self._store(new_rows)
+            found.update(new_rows)
+            logger.info("Embedding cache: %d cached, %d embedded (model=%s)",
+                        len(keys) - len(missing), len(missing), self.model)
+
+        return [list(found[k]) for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embeddings.embed_query(text)
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses}
+
+    # ---------------------------
+    # SQLite
+    # ---------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL,"
+                " key TEXT NOT NULL,"
+                " vector BLOB NOT NULL,"
+                " PRIMARY KEY (model, key)"
+                ") WITHOUT ROWID"
+            )
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        out: Dict[str, List[float]] = {}
+        with self._lock:
+            conn = self._connect()
+            for i in range(0, len(keys), _SQLITE_MAX_VARS):
+                batch = keys[i:i + _SQLITE_MAX_VARS]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE model = ? AND key IN ({placeholders})",
+                    [self.model, *batch],
+                ).fetchall()
+                for key, blob in rows:
+                    out[key] = np.frombuffer(blob, dtype=np.float32).tolist()
+        return out
+
+    def _store(self, rows: Dict[str, List[float]]) -> None:
+        with self._lock:
+            conn = self._connect()
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, key, vector) VALUES (?, ?, ?)",
+                [
+                    (self.model, key, np.asarray(vec, dtype=np.float32).tobytes())
+                    for key, vec in rows.items()
+                ],
+            )
+            conn.commit()
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
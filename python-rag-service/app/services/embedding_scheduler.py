@@ -0,0 +1,383 @@
+import asyncio
+import itertools
+import logging
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import httpx
+import openai
+from langchain_core.embeddings import Embeddings
+
+from app.services.utils.token_counter import TokenCounter, get_token_counter
+
+logger = logging.getLogger(__name__)
+
+QUERY, BULK = 0, 1
+
+# ===============================
+# Config
+# ===============================
+
+@dataclass
+class EmbeddingSchedulerConfig:
+    """
+    - enabled: EMBEDDING_SCHEDULER=0 hands out the plain client (no coalescing, no budgets)
+    - max_batch_inputs / max_batch_tokens: upper bounds of one embeddings request
+    - max_wait_ms: how long bulk work may wait for a batch to fill; queries never wait
+    - rpm / tpm: requests and tokens per minute (EMBEDDING_RPM / EMBEDDING_TPM; 0 = unlimited)
+    - concurrency: batches in flight at once (EMBEDDING_CONCURRENCY)
+    - max_retries / backoff_s / backoff_max_s: retries of a failed batch (exponential backoff)
+    """
+    enabled: bool = os.getenv("EMBEDDING_SCHEDULER", "1") == "1"
+    max_batch_inputs: int = int(os.getenv("EMBEDDING_MAX_BATCH_INPUTS", "512"))
+    max_batch_tokens: int = int(os.getenv("EMBEDDING_MAX_BATCH_TOKENS", "250000"))
+    max_wait_ms: float = float(os.getenv("EMBEDDING_MAX_WAIT_MS", "20"))
+    rpm: int = int(os.getenv("EMBEDDING_RPM", "3000"))
+    tpm: int = int(os.getenv("EMBEDDING_TPM", "1000000"))
+    concurrency: int = int(os.getenv("EMBEDDING_CONCURRENCY", "4"))
+    max_retries: int = int(os.getenv("EMBEDDING_MAX_RETRIES", "5"))
+    backoff_s: float = 0.5
+    backoff_max_s: float = 20.0
+
+# ===============================
+# Rate budget
+# ===============================
+
+class TokenBucket:
+    """
+    Per-minute budget refilled continuously.
+
+    take() may overdraw (a batch larger than the whole budget still goes out);
+    the debt delays the following callers. Not thread-safe on its own.
+    """
+
+    def __init__(self, per_minute: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self._clock = clock
+        self._tokens = self.capacity
+        self._stamp = clock()
+
+    @property
+    def unlimited(self) -> bool:
+        return self.capacity <= 0
+
+    def _refill(self) -> None:
+        now = self._clock()
+        self._tokens = min(self.capacity, self._tokens + (now - self._stamp) * self.rate)
+        self._stamp = now
+
+    def wait_time(self, n: float) -> float:
+        """Seconds until n can be taken (0 if now)."""
+        if self.unlimited:
+            return 0.0
+        self._refill()
+        missing = min(n, self.capacity) - self._tokens
+        return max(0.0, missing / self.rate)
+
+    def take(self, n: float) -> None:
+        if not self.unlimited:
+            self._refill()
+            self._tokens -= n
+
+    def pause(self, seconds: float) -> None:
+        """Empty the bucket so nothing is sent for ~seconds (after a 429)."""
+        if not self.unlimited:
+            self._refill()
+            self._tokens = min(self._tokens, -seconds * self.rate)
+
+# ===============================
+# Scheduler
+# ===============================
+
+@dataclass
+class _Request:
+    texts: List[str]
+    tokens: List[int]
+    priority: int
+    seq: int
+    created: float
+    future: Future = field(default_factory=Future)
+    results: List[Optional[List[float]]] = field(default_factory=list)
+    remaining: int = 0
+    next: int = 0  # first text not yet handed to a batch
+
+    def __post_init__(self) -> None:
+        self.results = [None] * len(self.texts)
+        self.remaining = len(self.texts)
+
+
+@dataclass
+class _Batch:
+    items: List[Tuple[_Request, int]]
+    texts: List[str]
+    tokens: int
+    priority: int
+
+
+def _status(exc: BaseException) -> Optional[int]:
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+# Failures without an HTTP status that are worth retrying (network, timeouts)
+_TRANSIENT_ERRORS = (httpx.TransportError, openai.APIConnectionError, ConnectionError, TimeoutError)
+
+
+def _retryable(exc: BaseException) -> bool:
+    """429, 408 and 5xx responses and transport errors; anything else (bad input, bugs) fails at once."""
+    status = _status(exc)
+    if status is not None:
+        return status in (408, 429) or status >= 500
+    return isinstance(exc, _TRANSIENT_ERRORS)
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class EmbeddingScheduler(Embeddings):
+    """
+    Central, rate-limit-aware front for one embeddings client.
+
+    - Every caller (chunking, index writes, queries) submits texts; a dispatcher
+      thread coalesces pending texts into batches bounded by inputs and tokens.
+    - Query embeddings go first and are dispatched immediately; bulk work waits
+      up to max_wait_ms for a batch to fill.
+    - Requests/min and tokens/min are tracked with token buckets; a 429 pauses
+      the buckets for the server's Retry-After (or the backoff).
+    - A failed batch is retried on its own; only the requests it served fail
+      once retries are exhausted. Only 429/408/5xx and transport errors are
+      retried; other client errors and non-HTTP exceptions fail at once. The
+      wrapped client should not retry itself (ClientRegistry sets max_retries=0).
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        cfg: Optional[EmbeddingSchedulerConfig] = None,
+        counter: Optional[TokenCounter] = None,
+        clock: Callable[[], float] = time.monotonic,
+        sleep: Callable[[float], None] = time.sleep,
+    ):
+        self.embeddings = embeddings
+        self.cfg = cfg or EmbeddingSchedulerConfig()
+        self._counter = counter or get_token_counter("cl100k_base")
+        self._clock = clock
+        self._sleep = sleep
+        self._cond = threading.Condition()
+        self._pending: List[_Request] = []
+        self._seq = itertools.count()
+        self._requests_bucket = TokenBucket(self.cfg.rpm, clock)
+        self._tokens_bucket = TokenBucket(self.cfg.tpm, clock)
+        self._slots = threading.BoundedSemaphore(max(1, self.cfg.concurrency))
+        self._pool: Optional[ThreadPoolExecutor] = None
+        self._dispatcher: Optional[threading.Thread] = None
+        self._closed = False
+        self.stats: Dict[str, int] = {"requests": 0, "batches": 0, "texts": 0, "retries": 0, "failures": 0}
+
+    def __getattr__(self, name: str) -> Any:
+        # Client attributes (model, dimensions, ...) read through the scheduler
+        if name == "embeddings":
+            raise AttributeError(name)
+        return getattr(self.embeddings, name)
+
+    # ---------------------------
+    # Embeddings interface
+    # ---------------------------
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.submit(texts, BULK).result()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.submit([text], QUERY).result()[0]
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        return await asyncio.wrap_future(self.submit(texts, BULK))
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return (await asyncio.wrap_future(self.submit([text], QUERY)))[0]
+
+    # ---------------------------
+    # Submission
+    # ---------------------------
+
+    def submit(self, texts: List[str], priority: int = BULK) -> Future:
+        """Queue texts; the Future resolves to their vectors in order."""
+        texts = list(texts)
+        request = _Request(
+            texts=texts,
+            tokens=self._counter.count_many(texts) if texts else [],
+            priority=priority,
+            seq=next(self._seq),
+            created=self._clock(),
+        )
+        if not texts:
+            request.future.set_result([])
+            return request.future
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("EmbeddingScheduler is closed.")
+            self._start_locked()
+            self._pending.append(request)
+            self._pending.sort(key=lambda r: (r.priority, r.seq))
+            self.stats["requests"] += 1
+            self._cond.notify_all()
+        return request.future
+
+    def close(self) -> None:
+        """Stop after the queued work is sent."""
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+            dispatcher = self._dispatcher
+        if dispatcher is not None:
+            dispatcher.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=True)
+
+    def _start_locked(self) -> None:
+        if self._dispatcher is None:
+            self._pool = ThreadPoolExecutor(max_workers=max(1, self.cfg.concurrency), thread_name_prefix="embed")
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name="embed-dispatch", daemon=True)
+            self._dispatcher.start()
+
+    # ---------------------------
+    # Dispatch
+    # ---------------------------
+
+    def _plan_locked(self) -> Optional[_Batch]:
+        """Next batch from the pending requests (highest priority first), without consuming it."""
+        items: List[Tuple[_Request, int]] = []
+        texts: List[str] = []
+        tokens = 0
+        priority = BULK
+        for request in self._pending:
+            for i in range(request.next, len(request.texts)):
+                t = request.tokens[i]
+                if items and (len(items) >= self.cfg.max_batch_inputs or tokens + t > self.cfg.max_batch_tokens):
+                    return _Batch(items, texts, tokens, priority)
+                items.append((request, i))
+                texts.append(request.texts[i])
+                tokens += t
+                priority = min(priority, request.priority)
+        return _Batch(items, texts, tokens, priority) if items else None
+
+    def _fill_wait_locked(self, batch: _Batch) -> float:
+        """Seconds bulk work should keep waiting for the batch to fill (0 = send now)."""
+        if batch.priority == QUERY or self._closed:
+            return 0.0
+        if len(batch.items) >= self.cfg.max_batch_inputs or batch.tokens >= self.cfg.max_batch_tokens:
+            return 0.0
+        oldest = min(r.created for r in self._pending)
+        return max(0.0, oldest + self.cfg.max_wait_ms / 1000.0 - self._clock())
+
+    def _budget_wait_locked(self, tokens: int) -> float:
+        return max(self._requests_bucket.wait_time(1), self._tokens_bucket.wait_time(tokens))
+
+    def _commit_locked(self, batch: _Batch) -> None:
+        for request, i in batch.items:
+            request.next = i + 1
+        self._pending = [r for r in self._pending if r.next < len(r.texts) and not r.future.done()]
+        self._requests_bucket.take(1)
+        self._tokens_bucket.take(batch.tokens)
+        self.stats["batches"] += 1
+        self.stats["texts"] += len(batch.items)
+
+    def _dispatch_loop(self) -> None:
+        while True:
+            self._slots.acquire()
+            batch = None
+            with self._cond:
+                while batch is None:
+                    self._pending = [r for r in self._pending if not r.future.done()]
+                    if not self._pending:
+                        if self._closed:
+                            self._slots.release()
+                            return
+                        self._cond.wait()
+                        continue
+                    candidate = self._plan_locked()
+                    wait = max(self._fill_wait_locked(candidate), self._budget_wait_locked(candidate.tokens))
+                    if wait > 0:
+                        # New (query) work or budget refills re-plan the batch
+                        self._cond.wait(timeout=wait)
+                        continue
+                    self._commit_locked(candidate)
+                    batch = candidate
+            self._pool.submit(self._run_batch, batch)
+
+    # ---------------------------
+    # Execution
+    # ---------------------------
+
+    def _reserve(self, tokens: int) -> None:
+        """Block until the rate budget allows another request of `tokens` (used by retries)."""
+        while True:
+            with self._cond:
+                wait = self._budget_wait_locked(tokens)
+                if wait <= 0:
+                    self._requests_bucket.take(1)
+                    self._tokens_bucket.take(tokens)
+                    return
+            self._sleep(wait)
+
+    def _run_batch(self, batch: _Batch) -> None:
+        try:
+            attempt = 0
+            while True:
+                try:
+                    vectors = self.embeddings.embed_documents(batch.texts)
+                    break
+                except Exception as e:
+                    status = _status(e)
+                    if not _retryable(e) or attempt >= self.cfg.max_retries:
+                        self._fail(batch, e)
+                        return
+                    delay = min(self.cfg.backoff_max_s, self.cfg.backoff_s * (2 ** attempt))
+                    if status == 429:
+                        delay = max(delay, _retry_after(e) or 0.0)
+                        with self._cond:
+                            self._requests_bucket.pause(delay)
+                            self._tokens_bucket.pause(delay)
+                    attempt += 1
+                    self.stats["retries"] += 1
+                    logger.warning(
+                        "Embedding batch of %d failed (%s); retry %d/%d in %.1fs",
+                        len(batch.items), status or type(e).__name__, attempt, self.cfg.max_retries, delay,
+                    )
+                    self._sleep(delay)
+                    self._reserve(batch.tokens)
+            self._deliver(batch, vectors)
+        finally:
+            self._slots.release()
+
+    def _deliver(self, batch: _Batch, vectors: List[List[float]]) -> None:
+        with self._cond:
+            for (request, i), vector in zip(batch.items, vectors):
+                if request.future.done():
+                    continue
+                request.results[i] = vector
+                request.remaining -= 1
+                if request.remaining == 0:
+                    request.future.set_result(request.results)
+
+    def _fail(self, batch: _Batch, exc: BaseException) -> None:
+        logger.error("Embedding batch of %d texts failed: %s", len(batch.items), exc)
+        with self._cond:
+            self.stats["failures"] += 1
+            for request, _ in batch.items:
+                if not request.future.done():
+                    request.future.set_exception(exc)
+            self._cond.notify_all()
+
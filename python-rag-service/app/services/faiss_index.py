@@ -0,0 +1,236 @@
+import logging
+import math
+import mmap
+import os
+from typing import Optional, Tuple
+
+import faiss
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FLAT, HNSW, IVF, IVFPQ = "flat", "hnsw", "ivf", "ivfpq"
+
+# faiss k-means wants ~39 training points per centroid; PQ trains 256 per sub-quantizer.
+MIN_POINTS_PER_CENTROID = 39
+PQ_MIN_TRAIN = 256 * MIN_POINTS_PER_CENTROID
+
+# --------------------------------------------------------------
+# Index selection
+# --------------------------------------------------------------
+
+def ivf_nlist(n: int) -> int:
+    """Inverted lists for n vectors: ~4*sqrt(n), bounded by the k-means training minimum."""
+    return max(1, min(int(4 * math.sqrt(max(n, 1))), n // MIN_POINTS_PER_CENTROID))
+
+
+def pq_subquantizers(dim: int) -> Optional[int]:
+    """Largest usual PQ code size (bytes per vector) that divides dim; None if none fits."""
+    for m in (64, 48, 32, 16, 8):
+        if dim % m == 0 and m < dim:
+            return m
+    return None
+
+
+def resolve_index_spec(
+    n: int,
+    dim: int,
+    index_type: str = "auto",
+    flat_max_chunks: int = 20_000,
+    ivfpq_min_chunks: int = 500_000,
+    hnsw_m: int = 32,
+) -> str:
+    """
+    faiss.index_factory string for n vectors of size dim.
+
+    index_type:
+      - "auto": Flat below flat_max_chunks, HNSW below ivfpq_min_chunks, IVF-PQ above
+      - "flat" | "hnsw" | "ivf" | "ivfpq": that family, sized for n
+      - anything else is passed through as a factory string (e.g. "IVF1024,PQ32")
+    IVF/PQ specs degrade (IVF-PQ -> IVF-Flat -> Flat) when n is too small to train them.
+    """
+    kind = (index_type or "auto").strip()
+    low = kind.lower()
+    if low == "auto":
+        low = FLAT if n < flat_max_chunks else HNSW if n < ivfpq_min_chunks else IVFPQ
+
+    if low == FLAT:
+        return "Flat"
+    if low == HNSW:
+        return f"HNSW{hnsw_m}"
+    if low in (IVF, IVFPQ):
+        nlist = ivf_nlist(n)
+        if nlist < 2:
+            return "Flat"
+        m = pq_subquantizers(dim)
+        if low == IVFPQ and m is not None and n >= PQ_MIN_TRAIN:
+            return f"IVF{nlist},PQ{m}"
+        return f"IVF{nlist},Flat"
+    return kind
+
+
+def index_kind(index) -> str:
+    """FLAT / HNSW / IVF / IVFPQ family of a FAISS index ("other" for anything else)."""
+    index = faiss.downcast_index(index)
+    if isinstance(index, faiss.IndexHNSW):
+        return HNSW
+    if isinstance(index, faiss.IndexFlat):
+        return FLAT
+    try:
+        ivf = faiss.downcast_index(faiss.extract_index_ivf(index))
+    except RuntimeError:
+        return "other"
+    return IVFPQ if isinstance(ivf, faiss.IndexIVFPQ) else IVF
+
+# --------------------------------------------------------------
+# Build / tune
+# --------------------------------------------------------------
+
+def build_index(vectors: np.ndarray, spec: str, metric: int = faiss.METRIC_L2, max_train: int = 100_000):
+    """Train (if needed, on at most max_train sampled vectors) and fill an index of the given factory spec."""
+    vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+    index = faiss.index_factory(int(vectors.shape[1]), spec, metric)
+    if not index.is_trained:
+        sample = vectors
+        if len(vectors) > max_train:
+            rows = np.random.default_rng(0).choice(len(vectors), size=max_train, replace=False)
+            sample = vectors[np.sort(rows)]
+        index.train(sample)
+    if len(vectors):
+        index.add(vectors)
+    return index
+
+
+def empty_like(index):
+    """Same type and training as `index`, without vectors (keeps IVF centroids / PQ codebooks)."""
+    clone = faiss.clone_index(index)
+    clone.reset()
+    return clone
+
+
+def apply_search_params(index, nprobe: int = 16, ef_search: int = 64) -> None:
+    """Set query-time knobs: nprobe for IVF (capped at nlist), efSearch for HNSW."""
+    kind = index_kind(index)
+    if kind == HNSW:
+        faiss.downcast_index(index).hnsw.efSearch = int(ef_search)
+    elif kind in (IVF, IVFPQ):
+        ivf = faiss.extract_index_ivf(index)
+        ivf.nprobe = max(1, min(int(nprobe), int(ivf.nlist)))
+
+
+def supports_remove(index) -> bool:
+    """
+    Whether langchain's FAISS.delete is safe on this index.
+
+    Only flat indexes compact ids on remove_ids; HNSW cannot remove and IVF keeps
+    the old labels, which breaks the positional index_to_docstore_id mapping.
+    """
+    return index_kind(index) == FLAT
+
+# --------------------------------------------------------------
+# Memory-mapped loading
+# --------------------------------------------------------------
+
+# fourcc of IndexFlatL2 / IndexFlatIP / generic IndexFlat in index.faiss
+_FLAT_FOURCCS = {b"IxF2": faiss.METRIC_L2, b"IxFI": faiss.METRIC_INNER_PRODUCT, b"IxFl": None}
+
+
+class MmapFlatIndex:
+    """
+    Read-only exact search over the vectors of a flat index.faiss, mapped with numpy.
+
+    faiss.read_index copies flat vectors into the heap even with IO_FLAG_MMAP; here
+    they stay in the page cache, shared by every process that maps the same file.
+    Opening reads only the header and asks the kernel to prefetch the rest.
+    Implements the part of the faiss.Index API the stores use: d, ntotal,
+    metric_type, search, reconstruct, reconstruct_n.
+    """
+
+    is_trained = True
+
+    def __init__(self, path: str, d: int, ntotal: int, metric_type: int, offset: int, block_rows: int = 65536):
+        self.path = path
+        self.d = d
+        self.ntotal = ntotal
+        self.metric_type = metric_type
+        self.block_rows = block_rows
+        self._vectors = np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(ntotal, d)) if ntotal else np.zeros((0, d), dtype=np.float32)
+        mm = getattr(self._vectors, "_mmap", None)
+        if mm is not None and hasattr(mm, "madvise") and hasattr(mmap, "MADV_WILLNEED"):
+            mm.madvise(mmap.MADV_WILLNEED)
+
+    @classmethod
+    def open(cls, path: str) -> Optional["MmapFlatIndex"]:
+        """Map a flat index file; None when the file holds any other index type."""
+        with open(path, "rb") as f:
+            head = f.read(49)
+        if len(head) < 45 or head[:4] not in _FLAT_FOURCCS:
+            return None
+        d = int(np.frombuffer(head, dtype="<i4", count=1, offset=4)[0])
+        ntotal = int(np.frombuffer(head, dtype="<i8", count=1, offset=8)[0])
+        # fourcc, d, ntotal, 2 x dummy, is_trained (1 byte), metric_type, [metric_arg], codes size
+        metric = int(np.frombuffer(head, dtype="<i4", count=1, offset=33)[0])
+        offset = 37 + (4 if metric > 1 else 0) + 8
+        if metric not in (faiss.METRIC_L2, faiss.METRIC_INNER_PRODUCT):
+            return None
+        if os.path.getsize(path) != offset + ntotal * d * 4:
+            logger.warning("Unexpected flat index layout in %s; falling back to faiss.read_index", path)
+            return None
+        return cls(path, d, ntotal, metric, offset)
+
+    def reconstruct_n(self, i0: int, n: int) -> np.ndarray:
+        return np.array(self._vectors[i0 : i0 + n])
+
+    def reconstruct(self, i: int) -> np.ndarray:
+        return np.array(self._vectors[int(i)])
+
+    def search(self, x: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        """faiss semantics: squared L2 ascending or inner product descending; -1 pads missing hits."""
+        x = np.ascontiguousarray(x, dtype=np.float32).reshape(-1, self.d)
+        ip = self.metric_type == faiss.METRIC_INNER_PRODUCT
+        nq = len(x)
+        best_s = np.full((nq, 0), np.inf, dtype=np.float32)  # lower is better (ip negated)
+        best_i = np.zeros((nq, 0), dtype=np.int64)
+        x_norms = (x * x).sum(axis=1, keepdims=True)
+
+        for start in range(0, self.ntotal, self.block_rows):
+            block = self._vectors[start : start + self.block_rows]
+            dots = x @ block.T
+            scores = -dots if ip else x_norms - 2 * dots + (block * block).sum(axis=1)[None, :]
+            ids = np.broadcast_to(np.arange(start, start + len(block), dtype=np.int64), scores.shape)
+            best_s = np.concatenate([best_s, scores.astype(np.float32)], axis=1)
+            best_i = np.concatenate([best_i, ids], axis=1)
+            if best_s.shape[1] > k:
+                keep = np.argpartition(best_s, k - 1, axis=1)[:, :k]
+                best_s = np.take_along_axis(best_s, keep, axis=1)
+                best_i = np.take_along_axis(best_i, keep, axis=1)
+
+        order = np.argsort(best_s, axis=1, kind="stable")
+        best_s = np.take_along_axis(best_s, order, axis=1)
+        best_i = np.take_along_axis(best_i, order, axis=1)
+        if ip:
+            best_s = -best_s
+        else:
+            np.maximum(best_s, 0, out=best_s)
+
+        pad = np.finfo(np.float32).max
+        D = np.full((nq, k), -pad if ip else pad, dtype=np.float32)
+        I = np.full((nq, k), -1, dtype=np.int64)
+        found = min(k, best_s.shape[1])
+        D[:, :found], I[:, :found] = best_s[:, :found], best_i[:, :found]
+        return D, I
+
+
+def open_index(path: str, mmap_vectors: bool = False):
+    """
+    Read an index.faiss.
+
+    mmap_vectors: flat indexes are served by MmapFlatIndex; IVF inverted lists are
+    mapped by faiss (IO_FLAG_MMAP); other types are read normally. Read-only.
+    """
+    if not mmap_vectors:
+        return faiss.read_index(path)
+    flat = MmapFlatIndex.open(path)
+    if flat is not None:
+        return flat
+    return faiss.read_index(path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
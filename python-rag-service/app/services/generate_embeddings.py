@@ -1,20 +1,25 @@
-import hashlib
 import logging
+import sys
 import time
 from dataclasses import dataclass
 from typing import Union, List, Dict, Optional, Any
 
-from anyio import to_thread
-from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
+import anyio
+from anyio import CapacityLimiter, from_thread, to_thread
 from langchain_core.documents import Document
 from langchain_openai import OpenAIEmbeddings
 
 from app.services.chunk_text import TextSplitter, SplitConfig
+from app.services.embedding_backends import backend_embeddings, default_embedding_model
+from app.services.embedding_cache import CachedEmbeddings, content_hash, default_cache_path
 from app.services.pdf_viewer import PDFProcessor, PDFProcessorConfig
-from app.services.utils.ocr_fallback import extract_text_with_ocr
+from app.services.utils.ocr_fallback import OcrExecutor
 from app.services.vector_store import VectorStore
 import os
 
+if sys.version_info < (3, 11):
+    from exceptiongroup import BaseExceptionGroup
+
 logger = logging.getLogger(__name__)
 
 # ===============================
@@ -28,19 +33,31 @@ class ProcessorConfig:
     - chunk_mode: which chunking strategy to use ("semantic" | "legal" | "fast")
     - min_chars_per_chunk: discard ultra-short chunks (noise)
     - dedupe: remove exact duplicate chunks by normalized content
+    - embedding_cache_path: SQLite file for the content-addressed embedding cache
+      (None/"" disables caching)
+    - streaming: PDF ingest as an overlapped page -> chunk -> embed pipeline
+      (INGEST_STREAMING=1); pages are never all held in memory
+    - stream_page_buffer / stream_batch_buffer: bounded queue sizes between stages
+    - embed_batch_size: chunks per embedding micro-batch in streaming mode
+    - use_spans: span-aware PDF chunking (INGEST_USE_SPANS=1); chunks follow line
+      geometry and keep their line rectangles (VectorStore writes them to rects.bin).
+      Off: span (rawdict) extraction is skipped entirely
     """
     chunk_mode: str = "semantic"
     min_chars_per_chunk: int = 5
     dedupe: bool = True
-
-
-# ===============================
-# Helpers
-# ===============================
-
-def _normalize_text(s: str) -> str:
-    """Collapse whitespace for stable content hashing."""
-    return " ".join((s or "").split()).strip()
+    embedding_cache_path: Optional[str] = default_cache_path()
+    streaming: bool = os.getenv("INGEST_STREAMING", "0") == "1"
+    stream_page_buffer: int = 4
+    stream_batch_buffer: int = 2
+    embed_batch_size: int = 64
+    use_spans: bool = os.getenv("INGEST_USE_SPANS", "0") == "1"
+
+def _first_error(eg: BaseExceptionGroup) -> BaseException:
+    """First leaf exception of a (possibly nested) exception group."""
+    while isinstance(eg, BaseExceptionGroup):
+        eg = eg.exceptions[0]
+    return eg
 
 # ===============================
 # Main
@@ -52,7 +69,10 @@ class SmartDocumentProcessor:
       - PDF extraction (with OCR fallback)
       - smart chunking via TextSplitter (legal / semantic / fast[=recursive])
       - filter out ultra-short chunks and optional dedupe
-      - one-shot save into FAISS (VectorStore rebuilds per-document index)
+      - embeddings go through a persistent cache, so unchanged chunks are not re-embedded
+      - one-shot save into FAISS (VectorStore upserts the per-document index)
+      - owns the OCR and PDF extraction process pools; close() shuts them down
+        (called from the app lifespan)
     """
 
     def __init__(
@@ -61,8 +81,14 @@ class SmartDocumentProcessor:
         split_cfg: SplitConfig = SplitConfig(),
     ):
         self.cfg = cfg
-        self.embedding_model = os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
-        self.embeddings = OpenAIEmbeddings(model=self.embedding_model)
+        self.embedding_model = default_embedding_model()
+        self.embeddings = backend_embeddings(self.embedding_model, factory=OpenAIEmbeddings)
+        if cfg.embedding_cache_path:
+            self.embeddings = CachedEmbeddings(
+                self.embeddings,
+                model=self.embedding_model,
+                path=cfg.embedding_cache_path,
+            )
         self.vector_store = VectorStore(
             embedding_model=self.embedding_model,
             embeddings=self.embeddings,
@@ -89,16 +115,23 @@ class SmartDocumentProcessor:
                 cfg=split_cfg,
             )
 
+        self.ocr = OcrExecutor()
         self.pdf = PDFProcessor(
             cfg=PDFProcessorConfig(
                 use_ocr_fallback=True,
                 keep_full_page_text=True,
                 skip_empty_pages=True,
                 trim_whitespace=True,
+                keep_spans=cfg.use_spans,
             ),
-            ocr_fn=extract_text_with_ocr,
+            ocr_fn=self.ocr,
         )
 
+    def close(self) -> None:
+        """Stop the OCR and extraction worker processes (pending work is cancelled)."""
+        self.pdf.close()
+        self.ocr.shutdown()
+
     # --------------------------------------------------------------
     # Public API
     # --------------------------------------------------------------
@@ -117,16 +150,28 @@ class SmartDocumentProcessor:
             doc_id: stable document identifier
             filename (kwarg): optional filename metadata
             metadata (kwarg): optional base metadata for text ingestion
+            extract_limiter (kwarg): anyio.CapacityLimiter for the CPU-bound
+                PDF extraction/OCR step (shared across concurrent ingests)
+            embed_limiter (kwarg): anyio.CapacityLimiter for the I/O-bound
+                chunking/embedding/FAISS save step
 
         Returns:
             Dict[str, Any]: status + counters + timings (or {"status":"error", ...})
         """
         try:
             logger.info("Ingest start doc_id=%s source_type=%s", doc_id, type(source).__name__)
-            if isinstance(source, (str, bytes, bytearray)):
-                return await self._ingest_pdf(source, doc_id, filename=kwargs.get("filename"))
+            limiters = {
+                "extract_limiter": kwargs.get("extract_limiter"),
+                "embed_limiter": kwargs.get("embed_limiter"),
+            }
+            if isinstance(source, (str, bytes, bytearray)) and self.cfg.streaming:
+                return await self._ingest_pdf_streaming(source, doc_id, filename=kwargs.get("filename"), **limiters)
+            elif isinstance(source, (str, bytes, bytearray)):
+                return await self._ingest_pdf(source, doc_id, filename=kwargs.get("filename"), **limiters)
             elif isinstance(source, list):
-                return await self._ingest_texts(source, doc_id, base_metadata=kwargs.get("metadata"))
+                return await self._ingest_texts(
+                    source, doc_id, base_metadata=kwargs.get("metadata"), embed_limiter=limiters["embed_limiter"]
+                )
             else:
                 return {"status": "error", "doc_id": doc_id, "reason": "unsupported_source_type"}
         except Exception as e:
@@ -137,34 +182,27 @@ class SmartDocumentProcessor:
     # Internals
     # --------------------------------------------------------------
 
-    async def _ingest_pdf(self, pdf_source: Union[str, bytes], doc_id: str, filename: Optional[str]) -> Dict[str, Any]:
+    async def _ingest_pdf(
+        self,
+        pdf_source: Union[str, bytes],
+        doc_id: str,
+        filename: Optional[str],
+        extract_limiter: Optional[CapacityLimiter] = None,
+        embed_limiter: Optional[CapacityLimiter] = None,
+    ) -> Dict[str, Any]:
         """Extract pages from PDF, chunk them, and write a fresh FAISS index."""
         t0 = time.perf_counter()
-        extracted = await to_thread.run_sync(self.pdf.extract_pdf_pages, pdf_source, doc_id)
+        extracted = await to_thread.run_sync(
+            self.pdf.extract_pdf_pages, pdf_source, doc_id, limiter=extract_limiter
+        )
         t_extract = time.perf_counter() - t0
 
         if "error" in extracted:
             return {"status": "error", "doc_id": doc_id, "error": extracted["error"]}
 
         pages = extracted.get("pages", []) or []
-        docs: List[Document] = []
-
-        for p in pages:
-            text = p.get("content") or ""
-            if not text.strip():
-                continue
-
-            page_no = p.get("pageNumber")
-
-            split_docs = self.splitter.split_text(text=text, document_id=doc_id, page_number=page_no)
-            for d in split_docs:
-                md = dict(d.metadata or {})
-                md.setdefault("filename", filename)
-            
-                if "chunkId" not in md:
-    
-                    raise ValueError("Splitter did not assign chunkId.")
-                docs.append(Document(page_content=d.page_content, metadata=md))
+        # Semantic chunking calls the embeddings API, so it shares the embed limit.
+        docs = await to_thread.run_sync(self._split_pages, pages, doc_id, filename, limiter=embed_limiter)
 
         docs = self._filter_min_len(docs, self.cfg.min_chars_per_chunk)
         docs_unique = self._dedupe(docs) if self.cfg.dedupe else docs
@@ -172,7 +210,7 @@ class SmartDocumentProcessor:
             return {"status": "error", "doc_id": doc_id, "reason": "no_usable_chunks_after_split"}
 
         t1 = time.perf_counter()
-        await to_thread.run_sync(self._save_all, docs_unique)
+        await to_thread.run_sync(self._save_all, docs_unique, limiter=embed_limiter)
         t_store = time.perf_counter() - t1
 
         result = {
@@ -193,11 +231,112 @@ class SmartDocumentProcessor:
         )
         return result
 
+    async def _ingest_pdf_streaming(
+        self,
+        pdf_source: Union[str, bytes],
+        doc_id: str,
+        filename: Optional[str],
+        extract_limiter: Optional[CapacityLimiter] = None,
+        embed_limiter: Optional[CapacityLimiter] = None,
+    ) -> Dict[str, Any]:
+        """
+        Same result as _ingest_pdf, built as three overlapped stages:
+
+          extract (thread, PDFProcessor.iter_pdf_pages)
+            -> [pages, bounded] -> chunk (TextSplitter, filter, dedupe)
+            -> [micro-batches, bounded] -> embed (embed_documents per batch)
+
+        Full queues block the stage upstream, so at most a few pages and batches
+        are in flight. The collected chunks and vectors are written in one
+        save_to_faiss call with precomputed vectors.
+        """
+        t0 = time.perf_counter()
+        page_send, page_recv = anyio.create_memory_object_stream(max(1, self.cfg.stream_page_buffer))
+        batch_send, batch_recv = anyio.create_memory_object_stream(max(1, self.cfg.stream_batch_buffer))
+        stats = {"pages": 0, "ocr_used": False, "batches": 0}
+        docs: List[Document] = []
+        vectors: List[List[float]] = []
+
+        def pump_pages() -> None:
+            for page in self.pdf.iter_pdf_pages(pdf_source, doc_id):
+                from_thread.run(page_send.send, page)
+
+        async def extract_stage() -> None:
+            async with page_send:
+                await to_thread.run_sync(pump_pages, limiter=extract_limiter)
+
+        async def chunk_stage() -> None:
+            seen: set[str] = set()
+            batch: List[Document] = []
+            async with page_recv, batch_send:
+                async for page in page_recv:
+                    stats["pages"] += 1
+                    stats["ocr_used"] = stats["ocr_used"] or page.get("textSource") == "ocr"
+                    split = await to_thread.run_sync(self._split_pages, [page], doc_id, filename, limiter=embed_limiter)
+                    for d in self._filter_min_len(split, self.cfg.min_chars_per_chunk):
+                        if self.cfg.dedupe:
+                            key = content_hash(d.page_content)
+                            if key in seen:
+                                continue
+                            seen.add(key)
+                        batch.append(d)
+                    while len(batch) >= self.cfg.embed_batch_size:
+                        await batch_send.send(batch[: self.cfg.embed_batch_size])
+                        batch = batch[self.cfg.embed_batch_size:]
+                if batch:
+                    await batch_send.send(batch)
+
+        async def embed_stage() -> None:
+            async with batch_recv:
+                async for batch in batch_recv:
+                    texts = [d.page_content for d in batch]
+                    vecs = await to_thread.run_sync(self.embeddings.embed_documents, texts, limiter=embed_limiter)
+                    docs.extend(batch)
+                    vectors.extend(vecs)
+                    stats["batches"] += 1
+
+        try:
+            async with anyio.create_task_group() as tg:
+                tg.start_soon(extract_stage)
+                tg.start_soon(chunk_stage)
+                tg.start_soon(embed_stage)
+        except BaseExceptionGroup as eg:
+            # Callers see the failing stage's own error; the group stays chained.
+            raise _first_error(eg) from eg
+        t_pipeline = time.perf_counter() - t0
+
+        if not docs:
+            return {"status": "error", "doc_id": doc_id, "reason": "no_usable_chunks_after_split"}
+
+        t1 = time.perf_counter()
+        await to_thread.run_sync(self._save_all, docs, vectors, limiter=embed_limiter)
+        t_store = time.perf_counter() - t1
+
+        result = {
+            "status": "success",
+            "doc_id": doc_id,
+            "pages_processed": stats["pages"],
+            "ocr_used": stats["ocr_used"],
+            "chunk_count": len(docs),
+            "stored": len(docs),
+            "streaming": True,
+            "timings": {
+                "pipeline_s": round(t_pipeline, 3),
+                "store_s": round(t_store, 3),
+            },
+        }
+        logger.info(
+            "Ingest(stream) done doc_id=%s pages=%s chunks=%s batches=%s timings=%s",
+            doc_id, stats["pages"], len(docs), stats["batches"], result["timings"]
+        )
+        return result
+
     async def _ingest_texts(
         self,
         chunks: List[str],
         doc_id: str,
-        base_metadata: Optional[Dict[str, Any]] = None
+        base_metadata: Optional[Dict[str, Any]] = None,
+        embed_limiter: Optional[CapacityLimiter] = None,
     ) -> Dict[str, Any]:
         """Chunk and index pre-supplied plain texts (no PDF)."""
         base_metadata = base_metadata or {}
@@ -247,7 +386,7 @@ class SmartDocumentProcessor:
             }
 
         t1 = time.perf_counter()
-        await to_thread.run_sync(self._save_all, docs_unique)
+        await to_thread.run_sync(self._save_all, docs_unique, limiter=embed_limiter)
         t_store = time.perf_counter() - t1
 
         result = {
@@ -278,6 +417,30 @@ class SmartDocumentProcessor:
     # Utilities
     # --------------------------------------------------------------
 
+    def _split_pages(self, pages: List[Dict[str, Any]], doc_id: str, filename: Optional[str]) -> List[Document]:
+        """Chunk extracted pages; every chunk must carry a chunkId."""
+        docs: List[Document] = []
+        for p in pages:
+            text = p.get("content") or ""
+            spans = p.get("spans") if self.cfg.use_spans else None
+            if not text.strip() and not (spans is not None and len(spans)):
+                continue
+
+            page_no = p.get("pageNumber")
+
+            if self.cfg.use_spans:
+                split_docs = self.splitter.split_pdf_pages_with_spans([p], document_id=doc_id)
+            else:
+                split_docs = self.splitter.split_text(text=text, document_id=doc_id, page_number=page_no)
+            for d in split_docs:
+                md = dict(d.metadata or {})
+                md.setdefault("filename", filename)
+
+                if "chunkId" not in md:
+                    raise ValueError("Splitter did not assign chunkId.")
+                docs.append(Document(page_content=d.page_content, metadata=md))
+        return docs
+
     def _filter_min_len(self, docs: List[Document], min_chars: int) -> List[Document]:
         """Drop micro-chunks below a minimum character length."""
         if min_chars <= 0:
@@ -294,24 +457,20 @@ class SmartDocumentProcessor:
         seen: set[str] = set()
         unique: List[Document] = []
         for d in docs:
-            key = hashlib.sha1(_normalize_text(d.page_content).encode("utf-8")).hexdigest()
+            key = content_hash(d.page_content)
             if key in seen:
                 continue
             seen.add(key)
             unique.append(d)
         return unique
 
-    @retry(
-        retry=retry_if_exception_type(Exception),
-        wait=wait_exponential(multiplier=0.8, min=1, max=8),
-        stop=stop_after_attempt(3),
-        reraise=True,
-    )
-
-    def _save_all(self, docs: List[Document]) -> None:
+    def _save_all(self, docs: List[Document], vectors: Optional[List[List[float]]] = None) -> None:
         """
-        Synchronous write of all chunks in one call.
-        VectorStore will rebuild (delete + recreate) the per-document FAISS index.
+        Synchronous write of all chunks in one call. Not retried as a whole:
+        the embedding scheduler retries failed batches on its own.
+        VectorStore diffs them against the stored per-document index and only
+        embeds/adds new chunks and removes vanished ones (or uses `vectors`
+        when the caller already embedded them).
         """
-        self.vector_store.save_to_faiss(docs=docs)
+        self.vector_store.save_to_faiss(docs=docs, vectors=vectors)
 
@@ -4,7 +4,8 @@ import pathlib
 from typing import List, Dict
 from langchain_openai import OpenAIEmbeddings
 from langchain_core.documents import Document
-from app.services.vector_store import save_to_faiss
+from app.services.clients import get_registry
+from app.services.vector_store import VectorStore
 
 
 def get_embeddings(chunks: List[str], metadata_list: List[Dict]) -> List[List[float]]:
@@ -16,12 +17,13 @@ def get_embeddings(chunks: List[str], metadata_list: List[Dict]) -> List[List[fl
     if not openai_api_key:
         raise EnvironmentError("OPENAI_API_KEY is not set in environment variables.")
 
-    embeddings = OpenAIEmbeddings(
-    model="text-embedding-3-small"
-    )
+    embeddings = get_registry().scheduled_embeddings("text-embedding-3-small", factory=OpenAIEmbeddings)
     embedded = embeddings.embed_documents(chunks)
 
-    save_to_faiss(chunks, metadata_list)
+    VectorStore(embedding_model="text-embedding-3-small", embeddings=embeddings).save_to_faiss(
+        [Document(page_content=chunk, metadata=metadata_list[i]) for i, chunk in enumerate(chunks)],
+        vectors=embedded,
+    )
 
     docs = [
         {
@@ -0,0 +1,217 @@
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional
+from uuid import uuid4
+
+from anyio import CapacityLimiter
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# Config
+# ===============================
+
+@dataclass
+class IngestQueueConfig:
+    """
+    - workers: documents in flight at once (queue consumers)
+    - extract_concurrency: CPU-bound PDF extraction/OCR slots (INGEST_EXTRACT_CONCURRENCY)
+    - embed_concurrency: I/O-bound chunking/embedding/save slots (INGEST_EMBED_CONCURRENCY)
+    - max_finished_jobs: finished jobs kept for status queries; oldest are dropped first
+    """
+    extract_concurrency: int = int(os.getenv("INGEST_EXTRACT_CONCURRENCY", str(max(1, (os.cpu_count() or 2) // 2))))
+    embed_concurrency: int = int(os.getenv("INGEST_EMBED_CONCURRENCY", "8"))
+    workers: int = int(os.getenv("INGEST_QUEUE_WORKERS", "0"))  # 0 = extract + embed concurrency
+    max_finished_jobs: int = int(os.getenv("INGEST_MAX_FINISHED_JOBS", "1000"))
+
+# ===============================
+# Jobs
+# ===============================
+
+QUEUED, RUNNING, SUCCESS, ERROR = "queued", "running", "success", "error"
+
+
+@dataclass
+class IngestItem:
+    source: str
+    doc_id: str
+    filename: Optional[str] = None
+    status: str = QUEUED
+    result: Optional[Dict[str, Any]] = None
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+
+    def to_dict(self) -> Dict[str, Any]:
+        out: Dict[str, Any] = {"id": self.doc_id, "filename": self.filename, "status": self.status}
+        if self.started_at and self.finished_at:
+            out["duration_s"] = round(self.finished_at - self.started_at, 3)
+        if self.result is not None:
+            out["result"] = self.result
+        return out
+
+
+@dataclass
+class IngestJob:
+    job_id: str
+    items: List[IngestItem]
+    created_at: float = field(default_factory=time.time)
+
+    @property
+    def done(self) -> bool:
+        return all(i.status in (SUCCESS, ERROR) for i in self.items)
+
+    def progress(self) -> Dict[str, int]:
+        counts = {QUEUED: 0, RUNNING: 0, SUCCESS: 0, ERROR: 0}
+        for item in self.items:
+            counts[item.status] += 1
+        return {"total": len(self.items), **counts}
+
+    @property
+    def status(self) -> str:
+        progress = self.progress()
+        if not self.done:
+            return RUNNING if progress[QUEUED] < progress["total"] else QUEUED
+        return "completed" if progress[ERROR] == 0 else "completed_with_errors"
+
+    def to_dict(self, include_items: bool = True) -> Dict[str, Any]:
+        out: Dict[str, Any] = {
+            "job_id": self.job_id,
+            "status": self.status,
+            "progress": self.progress(),
+            "created_at": self.created_at,
+        }
+        if include_items:
+            out["items"] = [i.to_dict() for i in self.items]
+        return out
+
+# ===============================
+# Queue
+# ===============================
+
+class IngestQueue:
+    """
+    In-process async job queue on top of SmartDocumentProcessor.ingest.
+
+    - submit() registers a job and enqueues each item; returns immediately
+    - a fixed pool of worker tasks drains the queue
+    - extraction/OCR and embedding run under separate CapacityLimiters,
+      so CPU-bound and I/O-bound stages of different documents overlap
+    - job status and per-item results are kept in memory (bounded)
+    """
+
+    def __init__(self, processor, cfg: Optional[IngestQueueConfig] = None):
+        self.processor = processor
+        self.cfg = cfg or IngestQueueConfig()
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        self._extract_limiter: Optional[CapacityLimiter] = None
+        self._embed_limiter: Optional[CapacityLimiter] = None
+
+    # ---------------------------
+    # Lifecycle
+    # ---------------------------
+
+    @property
+    def running(self) -> bool:
+        return bool(self._workers)
+
+    def _worker_count(self) -> int:
+        return max(1, self.cfg.workers or (self.cfg.extract_concurrency + self.cfg.embed_concurrency))
+
+    async def start(self) -> None:
+        """Spawn the worker tasks on the running loop (idempotent)."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue()
+        self._extract_limiter = CapacityLimiter(max(1, self.cfg.extract_concurrency))
+        self._embed_limiter = CapacityLimiter(max(1, self.cfg.embed_concurrency))
+        self._workers = [asyncio.create_task(self._worker(n)) for n in range(self._worker_count())]
+        logger.info(
+            "Ingest queue started workers=%d extract=%d embed=%d",
+            len(self._workers), self.cfg.extract_concurrency, self.cfg.embed_concurrency,
+        )
+
+    async def stop(self) -> None:
+        """Cancel the workers; queued items stay queued."""
+        workers, self._workers = self._workers, []
+        for task in workers:
+            task.cancel()
+        await asyncio.gather(*workers, return_exceptions=True)
+
+    async def join(self) -> None:
+        """Wait until every enqueued item has been processed."""
+        if self._queue is not None:
+            await self._queue.join()
+
+    # ---------------------------
+    # Jobs
+    # ---------------------------
+
+    async def submit(self, items: List[Dict[str, Any]]) -> IngestJob:
+        """
+        Enqueue a batch. Each item: {"source", "doc_id", "filename"?}.
+        Items with an "error" key are recorded as failed without being processed.
+        """
+        await self.start()
+        job = IngestJob(
+            job_id=uuid4().hex,
+            items=[IngestItem(source=i.get("source", ""), doc_id=i["doc_id"], filename=i.get("filename")) for i in items],
+        )
+        for spec, item in zip(items, job.items):
+            if spec.get("error"):
+                item.status = ERROR
+                item.result = {"status": "error", "doc_id": item.doc_id, "error": spec["error"]}
+
+        self._jobs[job.job_id] = job
+        self._prune()
+        for item in job.items:
+            if item.status == QUEUED:
+                self._queue.put_nowait(item)
+        logger.info("Ingest job %s queued with %d items", job.job_id, len(job.items))
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        return self._jobs.get(job_id)
+
+    def jobs(self) -> List[IngestJob]:
+        return list(reversed(self._jobs.values()))
+
+    def _prune(self) -> None:
+        finished = [jid for jid, job in self._jobs.items() if job.done]
+        for jid in finished[: max(0, len(finished) - self.cfg.max_finished_jobs)]:
+            del self._jobs[jid]
+
+    # ---------------------------
+    # Workers
+    # ---------------------------
+
+    async def _worker(self, n: int) -> None:
+        while True:
+            item: IngestItem = await self._queue.get()
+            try:
+                await self._run(item)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, item: IngestItem) -> None:
+        item.status = RUNNING
+        item.started_at = time.time()
+        try:
+            result = await self.processor.ingest(
+                source=item.source,
+                doc_id=item.doc_id,
+                filename=item.filename,
+                extract_limiter=self._extract_limiter,
+                embed_limiter=self._embed_limiter,
+            )
+        except Exception as e:  # ingest() reports errors itself; this is a last resort
+            logger.exception("Ingest worker failed doc_id=%s", item.doc_id)
+            result = {"status": "error", "doc_id": item.doc_id, "error": str(e)}
+        item.result = result
+        item.status = SUCCESS if result.get("status") == "success" else ERROR
+        item.finished_at = time.time()
@@ -0,0 +1,184 @@
+import logging
+import re
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple, Union
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# ===============================
+# Tokenizer
+# ===============================
+
+# "§ 5a" -> "§5a", amounts keep their separators ("9.800,96"), everything else is \w+.
+TOKEN_RE = re.compile(r"§\s*\d+[a-z]?|\d+(?:[.,]\d+)*|\w+", re.UNICODE)
+SPACE_RE = re.compile(r"\s+")
+
+LEXICAL_FILE = "lexical.npz"
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercased BM25 tokens; keeps §-sections and formatted numbers intact."""
+    return [SPACE_RE.sub("", t) for t in TOKEN_RE.findall((text or "").lower())]
+
+# ===============================
+# Index
+# ===============================
+
+class LexicalIndex:
+    """
+    BM25 index over one document's chunks, stored as compact arrays.
+
+    Layout (term-major CSR):
+      - vocab:   sorted term strings (looked up with np.searchsorted)
+      - indptr:  postings offsets per term
+      - docs:    chunk row per posting (int32)
+      - tf:      term frequency per posting (float32)
+      - idf:     BM25 idf per term (float32)
+      - doc_len: tokens per chunk (float32)
+      - ids:     docstore id per chunk row
+    """
+
+    def __init__(
+        self,
+        vocab: np.ndarray,
+        indptr: np.ndarray,
+        docs: np.ndarray,
+        tf: np.ndarray,
+        idf: np.ndarray,
+        doc_len: np.ndarray,
+        ids: np.ndarray,
+        k1: float = 1.5,
+        b: float = 0.75,
+    ):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.docs = docs
+        self.tf = tf
+        self.idf = idf
+        self.doc_len = doc_len
+        self.ids = ids
+        self.k1 = float(k1)
+        self.b = float(b)
+        avg = float(doc_len.mean()) if len(doc_len) else 1.0
+        self._norm = (self.k1 * (1.0 - self.b + self.b * doc_len / max(avg, 1e-9))).astype(np.float32)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    # ---------------------------
+    # Build / persist
+    # ---------------------------
+
+    @classmethod
+    def build(cls, ids: Sequence[str], texts: Sequence[str], k1: float = 1.5, b: float = 0.75) -> "LexicalIndex":
+        """Build from chunk texts; `ids` are the matching docstore ids."""
+        from sklearn.feature_extraction.text import CountVectorizer
+
+        n = len(texts)
+        try:
+            vectorizer = CountVectorizer(tokenizer=tokenize, lowercase=False, token_pattern=None)
+            counts = vectorizer.fit_transform(texts).tocsc()
+            vocab = vectorizer.get_feature_names_out().astype(str)
+        except ValueError:  # empty vocabulary
+            return cls._empty(ids, n, k1, b)
+
+        df = np.diff(counts.indptr).astype(np.float32)
+        idf = np.log(1.0 + (n - df + 0.5) / (df + 0.5)).astype(np.float32)
+        doc_len = np.asarray(counts.sum(axis=1)).ravel()
+
+        return cls(
+            vocab=vocab,
+            indptr=counts.indptr.astype(np.int64),
+            docs=counts.indices.astype(np.int32),
+            tf=counts.data.astype(np.float32),
+            idf=idf,
+            doc_len=doc_len.astype(np.float32),
+            ids=np.asarray([str(i) for i in ids]),
+            k1=k1,
+            b=b,
+        )
+
+    @classmethod
+    def _empty(cls, ids: Sequence[str], n: int, k1: float, b: float) -> "LexicalIndex":
+        return cls(
+            vocab=np.asarray([], dtype=str),
+            indptr=np.zeros(1, dtype=np.int64),
+            docs=np.zeros(0, dtype=np.int32),
+            tf=np.zeros(0, dtype=np.float32),
+            idf=np.zeros(0, dtype=np.float32),
+            doc_len=np.zeros(n, dtype=np.float32),
+            ids=np.asarray([str(i) for i in ids]),
+            k1=k1,
+            b=b,
+        )
+
+    def save(self, folder: Union[str, Path]) -> None:
+        np.savez(
+            Path(folder) / LEXICAL_FILE,
+            vocab=self.vocab,
+            indptr=self.indptr,
+            docs=self.docs,
+            tf=self.tf,
+            idf=self.idf,
+            doc_len=self.doc_len,
+            ids=self.ids,
+            params=np.asarray([self.k1, self.b], dtype=np.float64),
+        )
+
+    @classmethod
+    def load(cls, folder: Union[str, Path]) -> "LexicalIndex":
+        with np.load(Path(folder) / LEXICAL_FILE, allow_pickle=False) as z:
+            k1, b = (float(x) for x in z["params"])
+            return cls(
+                vocab=z["vocab"],
+                indptr=z["indptr"],
+                docs=z["docs"],
+                tf=z["tf"],
+                idf=z["idf"],
+                doc_len=z["doc_len"],
+                ids=z["ids"],
+                k1=k1,
+                b=b,
+            )
+
+    # ---------------------------
+    # Query
+    # ---------------------------
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[str, float]]:
+        """Top-k (docstore id, BM25 score) for the query; chunks without any match are omitted."""
+        terms = sorted(set(tokenize(query)))
+        if not terms or not len(self.vocab) or k <= 0:
+            return []
+
+        pos = np.searchsorted(self.vocab, terms)
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term, p in zip(terms, pos):
+            if p >= len(self.vocab) or self.vocab[p] != term:
+                continue
+            start, stop = self.indptr[p], self.indptr[p + 1]
+            rows = self.docs[start:stop]
+            tf = self.tf[start:stop]
+            scores[rows] += self.idf[p] * tf * (self.k1 + 1.0) / (tf + self._norm[rows])
+
+        hits = np.flatnonzero(scores)
+        if not len(hits):
+            return []
+        if len(hits) > k:
+            hits = hits[np.argpartition(-scores[hits], k - 1)[:k]]
+        hits = hits[np.argsort(-scores[hits], kind="stable")]
+        return [(str(self.ids[i]), float(scores[i])) for i in hits]
+
+# ===============================
+# Fusion
+# ===============================
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked id lists: score(id) = sum(1 / (k + rank)), rank starting at 1."""
+    fused: Dict[str, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            fused[key] = fused.get(key, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda kv: kv[1], reverse=True)
@@ -1,22 +1,50 @@
 import os
 import json
+from typing import AsyncIterator
 from langchain_openai import OpenAI
 from dotenv import load_dotenv
+from app.services.clients import get_registry
 
 load_dotenv()
 
-async def get_answer_from_openai(context: str, question: str) -> dict:
+
+def _model() -> OpenAI:
     api_key = os.getenv("OPENAI_API_KEY")
     if not api_key:
         raise ValueError("OPENAI_API_KEY not set in environment.")
 
-    model = OpenAI(
+    # Shared across questions: one client, one keep-alive pool.
+    return get_registry().llm(
+        OpenAI,
         temperature=0.3,
         max_tokens=600,
         openai_api_key=api_key
     )
 
-    prompt = f"""
+
+def parse_answer(raw: str) -> dict:
+    try:
+        return json.loads(raw)
+    except Exception as e:
+        raise ValueError(f"Failed to parse response: {raw}")
+
+
+async def get_answer_from_openai(context: str, question: str) -> dict:
+    model = _model()
+    raw = await model.ainvoke(build_prompt(context, question))
+    return parse_answer(raw)
+
+
+async def stream_answer_from_openai(context: str, question: str) -> AsyncIterator[str]:
+    """Yield completion text chunks as the model produces them (same prompt as get_answer_from_openai)."""
+    model = _model()
+    async for chunk in model.astream(build_prompt(context, question)):
+        if chunk:
+            yield chunk
+
+
+def build_prompt(context: str, question: str) -> str:
+    return f"""
 Answer the following question in **strict JSON format** with exactly two fields: 
 "contextAnswer" and "additionalInfo".
 
@@ -65,10 +93,3 @@ Question: {question}
 
 Respond ONLY with valid JSON:
 """
-
-    raw = await model.ainvoke(prompt)
-
-    try:
-        return json.loads(raw)
-    except Exception as e:
-        raise ValueError(f"Failed to parse response: {raw}")
@@ -1,12 +1,22 @@
 import logging
+import multiprocessing
+import os
 import re
+import tempfile
+import threading
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from contextlib import contextmanager
 from dataclasses import dataclass
-from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+from typing import Any, Callable, Deque, Dict, Iterator, List, Optional, Tuple, Union
 from uuid import uuid5, NAMESPACE_URL
 import io
 
 import fitz
 
+from app.services.utils.spans import SpanArrays
+
 logger = logging.getLogger(__name__)
 
 # ==============================================================
@@ -25,6 +35,18 @@ def _page_id(doc_id: str, page_number: int) -> str:
     return uuid5(NAMESPACE_URL, f"{doc_id}:{page_number}").hex[:16]
 
 
+def _page_ranges(total: int, shards: int) -> List[Tuple[int, int]]:
+    """Split [0, total) into at most `shards` contiguous, near-equal (start, stop) ranges."""
+    shards = max(1, min(shards, total))
+    size, rest = divmod(total, shards)
+    out, start = [], 0
+    for i in range(shards):
+        stop = start + size + (1 if i < rest else 0)
+        out.append((start, stop))
+        start = stop
+    return out
+
+
 # ==============================================================
 # Config
 # ==============================================================
@@ -37,6 +59,11 @@ class PDFProcessorConfig:
     skip_empty_pages: bool = True
     trim_whitespace: bool = True
     keep_spans: bool = True
+    workers: int = int(os.getenv("PDF_EXTRACT_WORKERS", "1"))
+    parallel_min_pages: int = 16
+    shards_per_worker: int = 4
+    mp_start_method: str = "spawn"
+    stream_ocr_lookahead: int = 8
 
 
 # ==============================================================
@@ -52,6 +79,11 @@ class PDFProcessor:
       2) If empty and OCR is enabled and `ocr_fn` is provided, run OCR.
       3) Normalize text if configured; skip empty pages if configured.
 
+    With cfg.workers > 1 and at least cfg.parallel_min_pages pages, page ranges
+    are sharded across a process pool; each worker opens its own fitz document
+    and records are reassembled in page order. The pool is started on first use
+    and kept for later documents (workers import fitz once); close() stops it.
+
     Returns a dict:
       {
         "metadata": {documentId, totalPages, pagesReturned, maxPagesEvaluated, ocrUsed},
@@ -61,6 +93,9 @@ class PDFProcessor:
 
     On failure:
       {"error": "PDF processing failed", "documentId": <doc_id>}
+
+    iter_pdf_pages() yields the same page records one by one instead, holding
+    at most cfg.stream_ocr_lookahead pages in flight.
     """
 
     def __init__(
@@ -79,8 +114,17 @@ class PDFProcessor:
         """
         self.cfg = cfg
         self.ocr_fn = ocr_fn
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
         logger.info("PDFProcessor init use_ocr=%s", cfg.use_ocr_fallback)
 
+    def close(self) -> None:
+        """Stop the extraction worker processes (pending shards are cancelled)."""
+        with self._pool_lock:
+            pool, self._pool = self._pool, None
+        if pool is not None:
+            pool.shutdown(wait=False, cancel_futures=True)
+
     # --------------------------------------------------------------
     # Main extraction method
     # --------------------------------------------------------------
@@ -94,41 +138,17 @@ class PDFProcessor:
         """Read pages, optionally run OCR, and return page records."""
         try:
             open_kwargs = self._open_kwargs(source, password)
-            pages_out: List[Dict[str, Any]] = []
 
             with fitz.open(**open_kwargs) as doc:
                 total = len(doc)
-               
                 logger.info("Processing PDF doc_id=%s pages=%s", doc_id, total)
 
-                for i in range(total):  
-                    page = doc.load_page(i)
-                    page_num = i + 1
-
-                    text, src = self._page_text(page)
-                    if self.cfg.trim_whitespace:
-                        text = self._clean(text)
-
-                    if not text.strip() and self.cfg.skip_empty_pages:
-                        logger.debug("Skipping empty page %s/%s doc_id=%s", page_num, total, doc_id)
-                        continue
-
-                    record: Dict[str, Any] = {
-                        "pageNumber": page_num,
-                        "pageId": _page_id(doc_id, page_num),
-                        "textSource": src, 
-                        "headings": self._headings(text),
-                        "wordCount": len(text.split()),
-                        "charCount": len(text),
-                        "pageIndicator": f"Page {page_num}/{total}",
-                    }
-                    if self.cfg.keep_full_page_text:
-                        record["content"] = text
-                    
-                    if self.cfg.keep_spans:
-                        record["spans"] = self._page_spans(page)
-
-                    pages_out.append(record)
+                workers = self._worker_count(total)
+                if workers <= 1:
+                    pages_out = self._extract_range(doc, doc_id, 0, total, total)
+
+            if workers > 1:
+                pages_out = self._extract_parallel(source, doc_id, password, total, workers)
 
             return {
                 "metadata": {
@@ -145,6 +165,208 @@ class PDFProcessor:
             logger.exception("PDF processing failed doc_id=%s", doc_id)
             return {"error": "PDF processing failed", "documentId": doc_id}
 
+    def iter_pdf_pages(
+        self,
+        source: Union[str, bytes],
+        doc_id: str,
+        password: Optional[str] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield page records in page order as they are extracted (serial).
+
+        OCR of a page may run while up to cfg.stream_ocr_lookahead later pages are
+        read; beyond that the generator waits, so memory stays bounded by the
+        window rather than the document. Errors propagate to the caller.
+        """
+        with fitz.open(**self._open_kwargs(source, password)) as doc:
+            total = len(doc)
+            logger.info("Streaming PDF doc_id=%s pages=%s", doc_id, total)
+            yield from self._iter_range(
+                doc, doc_id, 0, total, total, lookahead=max(1, self.cfg.stream_ocr_lookahead)
+            )
+
+    # --------------------------------------------------------------
+    # Page loop (serial / per worker)
+    # --------------------------------------------------------------
+
+    def _extract_range(
+        self,
+        doc: fitz.Document,
+        doc_id: str,
+        start: int,
+        stop: int,
+        total: int,
+    ) -> List[Dict[str, Any]]:
+        """Build page records for pages [start, stop) of an open document."""
+        return list(self._iter_range(doc, doc_id, start, stop, total))
+
+    def _iter_range(
+        self,
+        doc: fitz.Document,
+        doc_id: str,
+        start: int,
+        stop: int,
+        total: int,
+        lookahead: Optional[int] = None,
+    ) -> Iterator[Dict[str, Any]]:
+        """
+        Yield page records for pages [start, stop) in page order.
+
+        If `ocr_fn` exposes `submit(page)` / `result(future)` (see OcrExecutor),
+        OCR pages are queued while later pages are still being read, and their
+        futures are resolved in page order. With `lookahead` None every page is
+        read before the first OCR result is awaited; otherwise at most `lookahead`
+        pages are pending at a time. If `ocr_fn` exposes `document()`, a
+        per-document session is opened first.
+        """
+        ocr = self.ocr_fn
+        if ocr is not None and self.cfg.use_ocr_fallback and hasattr(ocr, "document"):
+            ocr = ocr.document()
+        submit = getattr(ocr, "submit", None) if self.cfg.use_ocr_fallback else None
+        entries: Deque[Tuple[int, str, str, SpanArrays, Optional[Future]]] = deque()
+
+        def ready() -> bool:
+            if lookahead is None or not entries:
+                return False
+            fut = entries[0][4]
+            return fut is None or fut.done() or len(entries) > lookahead
+
+        try:
+            for i in range(start, stop):
+                page = doc.load_page(i)
+                page_num = i + 1
+
+                textpage = page.get_textpage(flags=fitz.TEXTFLAGS_TEXT)
+                fut: Optional[Future] = None
+                if submit is not None:
+                    text = (page.get_text("text", textpage=textpage) or "").strip()
+                    src = "text"
+                    if not text:
+                        fut, src = submit(page), "ocr"
+                else:
+                    text, src = self._page_text(page, textpage)
+
+                spans = self._page_spans(page, textpage) if self.cfg.keep_spans and src == "text" else SpanArrays.empty()
+                entries.append((page_num, text, src, spans, fut))
+
+                while ready():
+                    record = self._resolve_entry(ocr, doc_id, total, entries.popleft())
+                    if record is not None:
+                        yield record
+
+            while entries:
+                record = self._resolve_entry(ocr, doc_id, total, entries.popleft())
+                if record is not None:
+                    yield record
+
+        finally:
+            for *_, fut in entries:
+                if fut is not None and not fut.done():
+                    fut.cancel()
+
+    def _resolve_entry(self, ocr, doc_id: str, total: int, entry) -> Optional[Dict[str, Any]]:
+        page_num, text, src, spans, fut = entry
+        if fut is not None:
+            text = (ocr.result(fut) or "").strip()
+            src = "ocr" if text else "text"
+        return self._page_record(doc_id, page_num, total, text, src, spans)
+
+    def _page_record(
+        self,
+        doc_id: str,
+        page_num: int,
+        total: int,
+        text: str,
+        src: str,
+        spans: SpanArrays,
+    ) -> Optional[Dict[str, Any]]:
+        """Normalize page text and build its record; None if the page is skipped as empty."""
+        if self.cfg.trim_whitespace:
+            text = self._clean(text)
+
+        if not text.strip() and self.cfg.skip_empty_pages:
+            logger.debug("Skipping empty page %s/%s doc_id=%s", page_num, total, doc_id)
+            return None
+
+        record: Dict[str, Any] = {
+            "pageNumber": page_num,
+            "pageId": _page_id(doc_id, page_num),
+            "textSource": src,
+            "headings": self._headings(text),
+            "wordCount": len(text.split()),
+            "charCount": len(text),
+            "pageIndicator": f"Page {page_num}/{total}",
+        }
+        if self.cfg.keep_full_page_text:
+            record["content"] = text
+
+        if self.cfg.keep_spans:
+            record["spans"] = spans
+
+        return record
+
+    # --------------------------------------------------------------
+    # Parallel extraction
+    # --------------------------------------------------------------
+
+    def _worker_count(self, total: int) -> int:
+        if self.cfg.workers <= 1 or total < max(2, self.cfg.parallel_min_pages):
+            return 1
+        return min(self.cfg.workers, total)
+
+    def _extract_parallel(
+        self,
+        source: Union[str, bytes],
+        doc_id: str,
+        password: Optional[str],
+        total: int,
+        workers: int,
+    ) -> List[Dict[str, Any]]:
+        """
+        Shard page ranges across the process pool and reassemble records in order.
+
+        Tasks carry a file path, never the PDF bytes: a bytes source is written to
+        a temp file once and every shard opens that.
+        """
+        ranges = _page_ranges(total, workers * max(1, self.cfg.shards_per_worker))
+        logger.info("Parallel extraction doc_id=%s workers=%s shards=%s", doc_id, workers, len(ranges))
+
+        pool = self._ensure_pool()
+        with _source_path(source) as path:
+            futures = [
+                pool.submit(_extract_range_in_worker, path, password, doc_id, start, stop, total)
+                for start, stop in ranges
+            ]
+            try:
+                pages_out: List[Dict[str, Any]] = []
+                for fut in futures:
+                    pages_out.extend(fut.result())
+            except BrokenProcessPool:
+                self._discard_pool(pool)
+                raise
+            finally:
+                for fut in futures:
+                    fut.cancel()
+        return pages_out
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=max(1, self.cfg.workers),
+                    mp_context=multiprocessing.get_context(self.cfg.mp_start_method),
+                    initializer=_init_worker,
+                    initargs=(self.cfg, self.ocr_fn),
+                )
+            return self._pool
+
+    def _discard_pool(self, pool: ProcessPoolExecutor) -> None:
+        """Drop a broken pool (a worker died); the next document starts a fresh one."""
+        with self._pool_lock:
+            if self._pool is pool:
+                self._pool = None
+        pool.shutdown(wait=False, cancel_futures=True)
+
     # ==============================================================
     # Internals
     # ==============================================================
@@ -162,12 +384,14 @@ class PDFProcessor:
             kw["password"] = password
         return kw
 
-    def _page_text(self, page: fitz.Page) -> Tuple[str, str]:
+    def _page_text(self, page: fitz.Page, textpage: Optional[fitz.TextPage] = None) -> Tuple[str, str]:
         """
         Return (text, source_tag) using embedded text first, then OCR.
         source_tag ∈ {"text", "ocr"}.
+
+        Pass the page's `textpage` to reuse one content-stream parse for text and spans.
         """
-        txt = (page.get_text("text") or "").strip()
+        txt = (page.get_text("text", textpage=textpage) or "").strip()
         if txt:
             return txt, "text"
 
@@ -203,7 +427,7 @@ class PDFProcessor:
             out.append({"text": m.group(1).strip(), "level": hashes})
         return out
 
-    def _page_spans(self, page: fitz.Page) -> List[Dict[str, Any]]:
+    def _page_spans(self, page: fitz.Page, textpage: Optional[fitz.TextPage] = None) -> SpanArrays:
         """
         Extract line-level text spans with bounding boxes in PDF coordinate space.
 
@@ -213,21 +437,28 @@ class PDFProcessor:
 
         Args:
             page (fitz.Page): The PDF page to inspect.
+            textpage (fitz.TextPage, optional): Already parsed text page (shared with
+                `_page_text`), so the content stream is parsed only once.
 
         Returns:
-            List[Dict[str, Any]]: A list of line records, each containing:
-                - "text" (str): Concatenated line text (trimmed).
-                - "bbox" (Dict[str, float]): Rectangle with keys {x, y, width, height}
-                in PDF units, where (x, y) is the **bottom-left** corner.
+            SpanArrays: one entry per line; columns x, y, width, height in PDF units,
+                where (x, y) is the **bottom-left** corner, plus the trimmed line text.
+                Indexing yields the {"text", "bbox"} dict of a line.
 
         Notes:
-            - Uses `page.get_text("rawdict")` for stable line geometry and spans.
-            - On failure, logs a warning and returns an empty list.
+            - Uses `page.get_text("dict")` for line geometry and span text; "rawdict"
+              would add per-character records we never use.
+            - Lines are collected into flat columns, not one dict per line.
+            - On failure, logs a warning and returns no spans.
             - Lines with empty text or non-positive geometry are skipped.
         """
-        spans_out: List[Dict[str, Any]] = []
+        texts: List[str] = []
+        xs: List[float] = []
+        ys: List[float] = []
+        ws: List[float] = []
+        hs: List[float] = []
         try:
-            raw = page.get_text("rawdict") or {}
+            raw = page.get_text("dict", textpage=textpage) or {}
             height = float(page.rect.height)
 
             blocks = raw.get("blocks") or []
@@ -247,12 +478,11 @@ class PDFProcessor:
                         if not text:
                             continue
 
-                        y_bottom = height - y1
-
-                        spans_out.append({
-                            "text": text,
-                            "bbox": {"x": x0, "y": y_bottom, "width": w, "height": h},
-                        })
+                        texts.append(text)
+                        xs.append(x0)
+                        ys.append(height - y1)
+                        ws.append(w)
+                        hs.append(h)
                     except Exception:
                         logger.debug(
                             "Failed to parse line b=%s l=%s on page %s",
@@ -260,7 +490,7 @@ class PDFProcessor:
                             exc_info=True,
                         )
 
-            return spans_out
+            return SpanArrays.from_lines(texts, xs, ys, ws, hs)
 
         except Exception:
             logger.warning(
@@ -268,4 +498,44 @@ class PDFProcessor:
                 getattr(page, "number", "?"),
                 exc_info=True,
             )
-            return []
+            return SpanArrays.empty()
+
+
+# ==============================================================
+# Process-pool workers
+# ==============================================================
+
+_WORKER_STATE: Dict[str, Any] = {}
+
+
+@contextmanager
+def _source_path(source: Union[str, bytes]) -> Iterator[str]:
+    """A path for `source`: the path itself, or a temp copy of PDF bytes (removed afterwards)."""
+    if isinstance(source, str):
+        yield source
+        return
+    fd, path = tempfile.mkstemp(suffix=".pdf")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(source)
+        yield path
+    finally:
+        os.unlink(path)
+
+
+def _init_worker(cfg: PDFProcessorConfig, ocr_fn: Optional[Callable[[fitz.Page], str]]) -> None:
+    """Runs once per worker process, which then serves shards of many documents."""
+    _WORKER_STATE["processor"] = PDFProcessor(cfg=cfg, ocr_fn=ocr_fn)
+
+
+def _extract_range_in_worker(
+    path: str,
+    password: Optional[str],
+    doc_id: str,
+    start: int,
+    stop: int,
+    total: int,
+) -> List[Dict[str, Any]]:
+    proc: PDFProcessor = _WORKER_STATE["processor"]
+    with fitz.open(**proc._open_kwargs(path, password)) as doc:
+        return proc._extract_range(doc, doc_id, start, stop, total)
@@ -1,57 +1,285 @@
+import asyncio
+import logging
+import os
+import weakref
+from dataclasses import dataclass
+from functools import lru_cache, partial
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+import anyio
+from anyio import CapacityLimiter
 from fastapi import HTTPException
-from app.services.vector_store import load_faiss_store
-from app.services.open_ai import get_answer_from_openai
+from langchain_core.documents import Document
+from app.services.answer_cache import AnswerCache
+from app.services.utils.spans import bbox_dict
+from app.services.vector_store import VectorStore, add_invalidation_listener
+from app.services.open_ai import get_answer_from_openai, parse_answer, stream_answer_from_openai
 import re
 
+logger = logging.getLogger(__name__)
 
-async def handle_ask_question(question: str, document_id: str):
-    if not question or not document_id:
-        raise HTTPException(status_code=400, detail="Question and documentId are required.")
+NOT_INDEXED_DETAIL = "No index found for this document."
+
+
+@dataclass
+class QAConcurrencyConfig:
+    """
+    Per-stage limits of the question answering path (per worker event loop):
+    - embed: concurrent query embedding calls (QA_EMBED_CONCURRENCY)
+    - retrieve: threads loading indexes and searching them (QA_RETRIEVE_CONCURRENCY)
+    - llm: concurrent completions, streamed ones included (QA_LLM_CONCURRENCY)
+    """
+    embed: int = int(os.getenv("QA_EMBED_CONCURRENCY", "16"))
+    retrieve: int = int(os.getenv("QA_RETRIEVE_CONCURRENCY", "8"))
+    llm: int = int(os.getenv("QA_LLM_CONCURRENCY", "32"))
+
+
+@dataclass
+class QARetrievalConfig:
+    """
+    - fetch_k: chunks retrieved per question, reported as debug.chunksAnalyzed (QA_RETRIEVE_K)
+    - context_chunks: top chunks passed to the LLM and returned as sources (QA_CONTEXT_CHUNKS)
+    """
+    fetch_k: int = int(os.getenv("QA_RETRIEVE_K", "10"))
+    context_chunks: int = int(os.getenv("QA_CONTEXT_CHUNKS", "4"))
+
+
+_STAGE_LIMITERS: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, Dict[str, CapacityLimiter]]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _limiter(stage: str) -> CapacityLimiter:
+    """Limiter of a stage for the running loop (anyio limiters are bound to one loop)."""
+    loop = asyncio.get_running_loop()
+    limiters = _STAGE_LIMITERS.get(loop)
+    if limiters is None:
+        cfg = QAConcurrencyConfig()
+        limiters = {
+            "embed": CapacityLimiter(max(1, cfg.embed)),
+            "retrieve": CapacityLimiter(max(1, cfg.retrieve)),
+            "llm": CapacityLimiter(max(1, cfg.llm)),
+        }
+        _STAGE_LIMITERS[loop] = limiters
+    return limiters[stage]
+
+
+@lru_cache(maxsize=1)
+def _vector_store() -> VectorStore:
+    return VectorStore()
+
+
+@lru_cache(maxsize=1)
+def _answer_cache() -> AnswerCache:
+    cache = AnswerCache()
+    add_invalidation_listener(cache.invalidate)
+    return cache
+
+
+async def _run_in_thread(stage: str, fn, *args, **kwargs):
+    return await anyio.to_thread.run_sync(partial(fn, *args, **kwargs), limiter=_limiter(stage))
+
+
+async def _embed_question(question: str) -> List[float]:
+    async with _limiter("embed"):
+        return await _vector_store().aembed_query(question)
+
+
+async def _cache_lookup(question: str, document_id: str) -> Dict[str, Any]:
+    """
+    Check the answer cache before retrieval.
+
+    Returns {"version", "vector", "hit"}. Raises HTTPException(404) when the
+    document has no index, before anything is embedded. On an exact miss the
+    question is embedded (async) once: for near-duplicate matching (if enabled;
+    such hits get highlights for this question) and, on a miss, for retrieval.
+    """
+    cache = _answer_cache()
+    version = await _run_in_thread("retrieve", _vector_store().index_version, document_id)
+    if version is None:
+        raise HTTPException(status_code=404, detail=NOT_INDEXED_DETAIL)
+    if not cache.cfg.enabled:
+        version = None
+    follow_up = version is not None and cache.semantic
+    hit = cache.get(document_id, version, question, count_miss=not follow_up)
+    vector = None
+    if hit is None:
+        vector = await _embed_question(question)
+        if follow_up:
+            hit = cache.get(document_id, version, question, vector=vector)
+            if hit is not None:
+                hit = _for_question(hit, question)
+    return {"version": version, "vector": vector, "hit": hit}
+
+
+def _for_question(hit: Dict[str, Any], question: str) -> Dict[str, Any]:
+    """A near-duplicate cache hit with its source highlights recomputed for `question`."""
+    keywords = question.split()
+    sources = [
+        {**source, "highlights": _extract_highlights(source.get("textMatch", ""), keywords)}
+        for source in hit["sources"]
+    ]
+    return {**hit, "sources": sources, "debug": {**hit["debug"], "semanticMatch": True}}
 
+
+def _extract_highlights(text: str, keywords: List[str]) -> List[str]:
+    found = []
+    for kw in keywords:
+        if re.search(rf'\b{re.escape(kw)}\b', text, re.IGNORECASE):
+           found.append(kw)
+    return found
+
+
+def _line_rects(rects, page: Optional[int]) -> List[Dict[str, float]]:
+    """(k, 4) rect rows as JSON-ready {x, y, width, height, page} dicts (PDF space)."""
+    if rects is None:
+        return []
+    return [bbox_dict(row, page) for row in rects]
+
+
+def retrieve_context(
+    question: str,
+    document_id: str,
+    query_vector: Optional[Sequence[float]] = None,
+) -> Dict[str, Any]:
+    """
+    Retrieve the chunks used to answer a question.
+
+    Returns {"context", "sources", "debug"}; raises HTTPException(404) when
+    the document has no index or no relevant content.
+    """
+    # Vector + BM25 candidates fused by rank; exact amounts / §-sections
+    # surface through the lexical side without over-fetching.
+    cfg = QARetrievalConfig()
     try:
-        vector_store = load_faiss_store(document_id)
+        similar_chunks: List[Document] = _vector_store().hybrid_search(
+            document_id, question, k=max(cfg.fetch_k, cfg.context_chunks), query_vector=query_vector
+        )
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail=NOT_INDEXED_DETAIL)
 
-        similar_chunks = vector_store.similarity_search(question, k=10)
+    filtered = [c for c in similar_chunks if str(c.metadata.get("documentId")) == str(document_id)]
 
-        def extract_highlights(text: str, keywords: List[str]) -> List[str]:
-            found = []
-            for kw in keywords:
-                if re.search(rf'\b{re.escape(kw)}\b', text, re.IGNORECASE):
-                   found.append(kw)
-            return found
+    if not filtered:
+        raise HTTPException(status_code=404, detail="No relevant content found for this document.")
 
-        filtered = [c for c in similar_chunks if str(c.metadata.get("documentId")) == str(document_id)]
+    top_chunks = filtered[:max(1, cfg.context_chunks)]
+    question_keywords = question.split()
+    # Per-line geometry of span-aware indexes (rects.bin), for highlighting in the viewer
+    line_rects = _vector_store().load_line_rects(document_id)
 
-        if not filtered:
-            raise HTTPException(status_code=404, detail="No relevant content found for this document.")
+    sources = [
+        {
+            **chunk.metadata,
+            "textMatch": chunk.page_content,
+            "pageIndicator": f"Page {chunk.metadata.get('pageNumber')}",
+            "confidence": 1,
+            "highlights": _extract_highlights(chunk.page_content, question_keywords),
+            "lineRects": _line_rects(line_rects.get(str(chunk.metadata.get("chunkId"))), chunk.metadata.get("pageNumber")),
+        }
+        for chunk in top_chunks
+    ]
 
-        top_chunks = filtered[:4]
-        context = "\n\n---\n\n".join(c.page_content for c in top_chunks)
-        answer = await get_answer_from_openai(context, question)
+    return {
+        "context": "\n\n---\n\n".join(c.page_content for c in top_chunks),
+        "sources": sources,
+        "debug": {
+            "chunksAnalyzed": len(similar_chunks),
+            "chunksUsed": len(top_chunks)
+        }
+    }
+
+
+async def aretrieve_context(
+    question: str,
+    document_id: str,
+    query_vector: Optional[Sequence[float]] = None,
+) -> Dict[str, Any]:
+    """retrieve_context with the embedding awaited and index I/O + search in a worker thread."""
+    if query_vector is None:
+        query_vector = await _embed_question(question)
+    return await _run_in_thread("retrieve", retrieve_context, question, document_id, query_vector=query_vector)
 
-        question_keywords = question.split()
 
-        sources = [
-            {
-                **chunk.metadata,
-                "textMatch": chunk.page_content,
-                "pageIndicator": f"Page {chunk.metadata.get('pageNumber')}",
-                "confidence": 1,
-                "highlights": extract_highlights(chunk.page_content, question_keywords)
-            }
-            for chunk in top_chunks
-        ]
+async def handle_ask_question(question: str, document_id: str):
+    if not question or not document_id:
+        raise HTTPException(status_code=400, detail="Question and documentId are required.")
+
+    try:
+        cached = await _cache_lookup(question, document_id)
+        if cached["hit"] is not None:
+            return {**cached["hit"], "debug": {**cached["hit"]["debug"], "cached": True}}
 
+        retrieved = await aretrieve_context(question, document_id, query_vector=cached["vector"])
+        async with _limiter("llm"):
+            answer = await get_answer_from_openai(retrieved["context"], question)
 
-        return {
+        result = {
             "answer": answer,
-            "sources": sources,
-            "debug": {
-                "chunksAnalyzed": len(similar_chunks),
-                "chunksUsed": len(top_chunks)
-            }
+            "sources": retrieved["sources"],
+            "debug": retrieved["debug"],
         }
+        _answer_cache().put(document_id, cached["version"], question, result, vector=cached["vector"])
+        return result
 
+    except HTTPException:
+        raise
     except Exception as e:
-        print("Error in handle_ask_question:", e)
+        logger.exception("handle_ask_question failed doc_id=%s", document_id)
         raise HTTPException(status_code=500, detail=str(e))
+
+
+async def stream_ask_question(question: str, document_id: str) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Streaming variant of handle_ask_question.
+
+    Yields events in order:
+      - {"event": "sources", "data": {"sources", "debug"}}   right after retrieval
+      - {"event": "token",   "data": "<text>"}               per completion chunk
+      - {"event": "answer",  "data": {...}}                  parsed JSON answer (or {"raw": text})
+      - {"event": "done",    "data": {}}
+    Cached answers skip the token events.
+    Failures are reported as {"event": "error", "data": {"status", "detail"}} and end the stream.
+    """
+    if not question or not document_id:
+        yield {"event": "error", "data": {"status": 400, "detail": "Question and documentId are required."}}
+        return
+
+    try:
+        cached = await _cache_lookup(question, document_id)
+        if cached["hit"] is not None:
+            hit = cached["hit"]
+            yield {"event": "sources", "data": {"sources": hit["sources"], "debug": {**hit["debug"], "cached": True}}}
+            yield {"event": "answer", "data": hit["answer"]}
+            yield {"event": "done", "data": {}}
+            return
+
+        retrieved = await aretrieve_context(question, document_id, query_vector=cached["vector"])
+        yield {"event": "sources", "data": {"sources": retrieved["sources"], "debug": retrieved["debug"]}}
+
+        parts: List[str] = []
+        async with _limiter("llm"):
+            async for token in stream_answer_from_openai(retrieved["context"], question):
+                parts.append(token)
+                yield {"event": "token", "data": token}
+
+        raw = "".join(parts)
+        try:
+            answer = parse_answer(raw)
+            _answer_cache().put(
+                document_id,
+                cached["version"],
+                question,
+                {"answer": answer, "sources": retrieved["sources"], "debug": retrieved["debug"]},
+                vector=cached["vector"],
+            )
+        except ValueError:
+            answer = {"raw": raw}
+        yield {"event": "answer", "data": answer}
+        yield {"event": "done", "data": {}}
+
+    except HTTPException as e:
+        yield {"event": "error", "data": {"status": e.status_code, "detail": e.detail}}
+    except Exception as e:
+        logger.exception("stream_ask_question failed doc_id=%s", document_id)
+        yield {"event": "error", "data": {"status": 500, "detail": str(e)}}
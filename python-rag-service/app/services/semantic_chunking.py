@@ -0,0 +1,159 @@
+import logging
+import re
+from typing import Callable, List, Sequence, Tuple
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+logger = logging.getLogger(__name__)
+
+# Same sentence split as langchain_experimental's SemanticChunker
+SENTENCE_SPLIT_RE = re.compile(r"(?<=[.?!])\s+")
+
+# --------------------------------------------------------------
+# Vectorized helpers
+# --------------------------------------------------------------
+
+def split_sentences(text: str) -> List[str]:
+    return SENTENCE_SPLIT_RE.split(text)
+
+
+def pack_windows(token_counts: Sequence[int], window_tokens: int) -> np.ndarray:
+    """
+    Window id per sentence. Sentences are kept in order and packed into windows of
+    ~window_tokens by where their cumulative token offset falls; a sentence longer
+    than the budget gets a window of its own.
+    """
+    tokens = np.asarray(token_counts, dtype=np.int64)
+    if not len(tokens):
+        return np.zeros(0, dtype=np.int64)
+    starts = np.cumsum(tokens) - tokens
+    return np.unique(starts // max(1, window_tokens), return_inverse=True)[1].astype(np.int64)
+
+
+def adjacent_cosine_distances(vectors: np.ndarray) -> np.ndarray:
+    """1 - cos(v[i], v[i+1]) for consecutive rows."""
+    v = np.asarray(vectors, dtype=np.float32)
+    v = v / np.clip(np.linalg.norm(v, axis=1, keepdims=True), 1e-12, None)
+    return 1.0 - np.einsum("ij,ij->i", v[:-1], v[1:])
+
+
+def breakpoint_threshold(distances: np.ndarray, kind: str, amount: float) -> Tuple[float, np.ndarray]:
+    """
+    SemanticChunker's threshold rules (percentile, standard_deviation, interquartile,
+    gradient): returns (threshold, scores); a break goes where score > threshold.
+    """
+    d = np.asarray(distances, dtype=np.float64)
+    if kind == "percentile":
+        return float(np.percentile(d, amount)), d
+    if kind == "standard_deviation":
+        return float(d.mean() + amount * d.std()), d
+    if kind == "interquartile":
+        q1, q3 = np.percentile(d, [25, 75])
+        return float(d.mean() + amount * (q3 - q1)), d
+    if kind == "gradient":
+        if len(d) < 2:
+            return float("inf"), d
+        grad = np.gradient(d)
+        return float(np.percentile(grad, amount)), grad
+    raise ValueError(f"Unknown breakpoint threshold type: {kind!r}")
+
+
+def with_neighbours(sentences: Sequence[str], lo: int, hi: int, buffer: int = 1) -> List[str]:
+    """Sentences lo..hi-1, each joined with `buffer` neighbours on both sides (SemanticChunker's combine_sentences)."""
+    n = len(sentences)
+    return [" ".join(sentences[max(0, i - buffer) : min(n, i + buffer + 1)]) for i in range(lo, hi)]
+
+# --------------------------------------------------------------
+# Chunker
+# --------------------------------------------------------------
+
+class HierarchicalSemanticChunker:
+    """
+    Semantic chunking with window-level instead of sentence-level embeddings.
+
+    1. Sentences are packed into ~window_tokens windows (cumulative token sums);
+       short texts use smaller windows so there are at least min_windows.
+    2. Each window is embedded once; breaks go at window edges whose distance to
+       the next window passes the threshold rule. For "percentile" the amount is
+       rescaled so the expected number of breaks matches the per-sentence rule:
+       a window edge stands for the ~s sentence gaps inside the window, so it
+       breaks with probability 1 - (p/100)^s.
+    3. Optionally (refine_sentences > 0) each break is moved to the widest
+       sentence gap within refine_sentences of the edge, embedding only the
+       sentences around it.
+
+    Costs ~1/s of SemanticChunker's embeddings (s = sentences per window), plus
+    2*refine_sentences+2 per break when refining.
+    """
+
+    def __init__(
+        self,
+        embeddings: Embeddings,
+        count_tokens: Callable[[List[str]], List[int]],
+        breakpoint_type: str = "percentile",
+        breakpoint_amount: float = 95,
+        window_tokens: int = 384,
+        refine_sentences: int = 0,
+        min_windows: int = 8,
+    ):
+        self.embeddings = embeddings
+        self.count_tokens = count_tokens
+        self.breakpoint_type = breakpoint_type
+        self.breakpoint_amount = breakpoint_amount
+        self.window_tokens = window_tokens
+        self.refine_sentences = refine_sentences
+        self.min_windows = min_windows
+        self.embedded = 0  # texts sent to the embeddings so far
+
+    def _embed(self, texts: List[str]) -> np.ndarray:
+        self.embedded += len(texts)
+        return np.asarray(self.embeddings.embed_documents(texts), dtype=np.float32)
+
+    def breakpoints(self, sentences: List[str]) -> np.ndarray:
+        """Indices i such that a chunk ends after sentences[i]."""
+        if len(sentences) < 2:
+            return np.zeros(0, dtype=np.int64)
+        tokens = np.asarray(self.count_tokens(sentences), dtype=np.int64)
+        window = min(self.window_tokens, int(tokens.sum()) // max(1, self.min_windows))
+        window_of = pack_windows(tokens, window)
+        edges = np.flatnonzero(np.diff(window_of)) + 1  # first sentence of windows 1..
+        if not len(edges):
+            return np.zeros(0, dtype=np.int64)
+
+        bounds = np.concatenate([[0], edges, [len(sentences)]])
+        windows = [" ".join(sentences[a:b]) for a, b in zip(bounds[:-1], bounds[1:])]
+        distances = adjacent_cosine_distances(self._embed(windows))
+
+        amount = self.breakpoint_amount
+        if self.breakpoint_type == "percentile":
+            per_window = len(sentences) / len(windows)
+            amount = 100.0 * (amount / 100.0) ** per_window
+        threshold, scores = breakpoint_threshold(distances, self.breakpoint_type, amount)
+        breaks = edges[scores > threshold] - 1
+        if self.refine_sentences > 0 and len(breaks):
+            breaks = self._refine(sentences, breaks)
+        return breaks
+
+    def _refine(self, sentences: List[str], breaks: np.ndarray) -> np.ndarray:
+        r, n = self.refine_sentences, len(sentences)
+        lo = np.maximum(breaks - r, 0)
+        hi = np.minimum(breaks + r + 2, n)
+        texts: List[str] = []
+        for a, b in zip(lo, hi):
+            texts.extend(with_neighbours(sentences, int(a), int(b)))
+        vectors = self._embed(texts)
+
+        refined, offset = [], 0
+        for a, b in zip(lo, hi):
+            d = adjacent_cosine_distances(vectors[offset : offset + b - a])
+            offset += b - a
+            refined.append(int(a) + int(np.argmax(d)))
+        return np.unique(refined)
+
+    def split_text(self, text: str) -> List[str]:
+        sentences = split_sentences(text)
+        if len(sentences) < 2:
+            return sentences
+        cuts = np.concatenate([[0], self.breakpoints(sentences) + 1, [len(sentences)]])
+        return [" ".join(sentences[a:b]) for a, b in zip(cuts[:-1], cuts[1:]) if b > a]
@@ -1,7 +1,11 @@
-import io
 import os
 import logging
-from typing import Optional, Dict, Any
+import multiprocessing
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor, TimeoutError as FutureTimeout
+from collections import Counter
+from dataclasses import dataclass
+from typing import Optional, Dict, Any, List, Tuple
 
 import pytesseract
 from PIL import Image, ImageOps, ImageFilter
@@ -38,29 +42,105 @@ def _rotate_pil(img: Image.Image, angle_deg: float) -> Image.Image:
     return img.rotate(-angle_deg, expand=True, fillcolor="white")
 
 # --------------------------------------------------------------
-# Detect skew and rotate accordingly
+# Orientation detection
 # --------------------------------------------------------------
 
-def _deskew_pil(img: Image.Image) -> Image.Image:
-    """Deskew image using Tesseract's orientation detection.
+def _parse_osd(osd: str) -> Optional[int]:
+    """Extract the rotation angle from Tesseract OSD output."""
+    for line in osd.splitlines():
+        if "Orientation in degrees" in line or "Rotate" in line:
+            return int(line.split(":")[-1].strip())
+    return None
 
-    Args:
-        img: PIL image.
 
-    Returns:
-        Deskewed image if orientation was detected; original otherwise.
-    """
+def _osd_angle(img: Image.Image) -> Optional[int]:
+    """Run Tesseract OSD; None if it fails or reports nothing."""
     try:
-        osd = pytesseract.image_to_osd(img)
-        for line in osd.splitlines():
-            if "Orientation in degrees" in line or "Rotate" in line:
-                angle = int(line.split(":")[-1].strip())
-                if angle % 360 != 0:
-                    logger.info("Rotating image by %d degrees", angle)
-                    return _rotate_pil(img, angle)
+        return _parse_osd(pytesseract.image_to_osd(img))
     except Exception as e:
-        logger.warning("Deskew failed: %s", e)
-    return img
+        logger.warning("Orientation detection failed: %s", e)
+        return None
+
+
+def _thumbnail(img: Image.Image, max_side: int) -> Image.Image:
+    w, h = img.size
+    m = max(w, h)
+    if m <= max_side:
+        return img
+    scale = max_side / float(m)
+    return img.resize((max(1, int(w * scale)), max(1, int(h * scale))), Image.BILINEAR)
+
+
+def _orient(
+    img: Image.Image,
+    known_angle: Optional[int] = None,
+    expected_angle: int = 0,
+    page_rotation: int = 0,
+    thumb_side: int = 1000,
+) -> Tuple[Image.Image, int]:
+    """Rotate the image upright, spending as little OSD as the signals allow.
+
+    Signals, cheapest first:
+      1) `known_angle`: orientation already settled for this document -> no OSD.
+      2) `page_rotation`: the PDF declares /Rotate; PyMuPDF renders with it applied -> no OSD.
+      3) OSD on a downscaled thumbnail, compared with `expected_angle`
+         (what earlier pages of the document showed, 0 by default).
+    A full-resolution OSD runs only if the thumbnail fails or disagrees.
+
+    Returns:
+        (image, angle applied)
+    """
+    if known_angle is not None:
+        angle = known_angle
+    elif page_rotation % 360:
+        angle = 0
+    else:
+        thumb_angle = _osd_angle(_thumbnail(img, thumb_side))
+        if thumb_angle is not None and thumb_angle == expected_angle:
+            angle = thumb_angle
+        else:
+            full_angle = _osd_angle(img)
+            if full_angle is not None:
+                angle = full_angle
+            else:
+                angle = thumb_angle if thumb_angle is not None else expected_angle
+
+    if angle % 360 != 0:
+        logger.info("Rotating image by %d degrees", angle)
+        img = _rotate_pil(img, angle)
+    return img, angle
+
+
+class OrientationDetector:
+    """Per-document orientation memory.
+
+    Once the first `probe_pages` OCR'd pages agree on an angle, that angle is
+    reused for the rest of the document and OSD is skipped.
+    """
+
+    def __init__(self, probe_pages: int = 3):
+        self.probe_pages = probe_pages
+        self._first: List[int] = []
+        self._counts: Counter = Counter()
+        self._lock = threading.Lock()
+
+    def observe(self, angle: Optional[int]) -> None:
+        if angle is None:
+            return
+        with self._lock:
+            if len(self._first) < self.probe_pages:
+                self._first.append(angle)
+            self._counts[angle] += 1
+
+    def known_angle(self) -> Optional[int]:
+        with self._lock:
+            if self.probe_pages > 0 and len(self._first) == self.probe_pages and len(set(self._first)) == 1:
+                return self._first[0]
+            return None
+
+    def expected_angle(self) -> int:
+        with self._lock:
+            return self._counts.most_common(1)[0][0] if self._counts else 0
 
 # --------------------------------------------------------------
 # Preprocessing using PIL
@@ -105,6 +185,95 @@ def _preprocess_cv2(img: Image.Image) -> Image.Image:
     return Image.fromarray(thr)
 
 
+# --------------------------------------------------------------
+# Render + recognize
+# --------------------------------------------------------------
+
+def _render_zoom(page: fitz.Page, dpi: int, max_side: int) -> float:
+    """Zoom factor for rendering: `dpi`, capped so the longest side fits `max_side` pixels."""
+    longest_pt = max(float(page.rect.width), float(page.rect.height))
+    zoom = dpi / 72.0
+    if longest_pt > 0 and longest_pt * zoom > max_side:
+        zoom = max_side / longest_pt
+    return zoom
+
+
+def _render_page(page: fitz.Page, dpi: int, max_side: int = 3000) -> Image.Image:
+    """Render a PDF page to a grayscale PIL image no larger than `max_side`.
+
+    The DPI is chosen up front from the page size. The image is mapped onto the
+    pixmap's sample memory (samples_mv, no copy and no PNG round trip); the
+    pixmap is kept referenced by the image so that memory outlives it.
+    """
+    zoom = _render_zoom(page, dpi, max_side)
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    img = Image.frombuffer("L", (pix.width, pix.height), pix.samples_mv, "raw", "L", pix.stride, 1)
+    img._pixmap = pix
+    return img
+
+
+def _tesseract(img: Image.Image, lang: str, config: str, timeout: float) -> str:
+    if timeout:
+        return pytesseract.image_to_string(img, lang=lang, config=config, timeout=timeout)
+    return pytesseract.image_to_string(img, lang=lang, config=config)
+
+
+def _ocr_image(
+    img: Image.Image,
+    lang: str = "deu+eng",
+    psm: int = 6,
+    oem: int = 1,
+    max_side: int = 3000,
+    timeout: float = 0,
+    known_angle: Optional[int] = None,
+    expected_angle: int = 0,
+    page_rotation: int = 0,
+    thumb_side: int = 1000,
+) -> Tuple[str, int]:
+    """Resize, orient, preprocess and OCR a rendered page image.
+
+    Args:
+        img: Rendered page.
+        lang: Tesseract language codes.
+        psm: Page segmentation mode.
+        oem: OCR engine mode.
+        max_side: Maximum side length for scaling.
+        timeout: Seconds per tesseract call (0 = no limit). A timed-out page
+            is not retried with the fallback config.
+        known_angle, expected_angle, page_rotation, thumb_side: see `_orient`.
+
+    Returns:
+        (OCR-extracted text, rotation angle applied)
+    """
+    # Resize if still too large (rendering already targets max_side)
+    w, h = img.size
+    m = max(w, h)
+    if m > max_side:
+        scale = max_side / float(m)
+        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+
+    # Orient and preprocess
+    img, angle = _orient(img, known_angle, expected_angle, page_rotation, thumb_side)
+    img = _preprocess_cv2(img) if HAS_CV2 else _preprocess_pil(img)
+
+    # OCR
+    config = f"--oem {oem} --psm {psm}"
+    try:
+        text = _tesseract(img, lang, config, timeout)
+        return (text or "").strip(), angle
+    except Exception as e:
+        if timeout and "timeout" in str(e).lower():
+            logger.warning("OCR timed out after %ss", timeout)
+            return "", angle
+        logger.warning("OCR primary config failed: %s", e)
+        try:
+            fallback_config = f"--oem {oem} --psm 11"
+            text = _tesseract(img, lang, fallback_config, timeout)
+            return (text or "").strip(), angle
+        except Exception as e:
+            logger.error("OCR fallback failed: %s", e)
+            return "", angle
+
 # --------------------------------------------------------------
 # Extract text from a PDF page using OCR
 # --------------------------------------------------------------
@@ -124,42 +293,159 @@ def extract_text_with_ocr(
         lang: Tesseract language codes (e.g. "eng", "deu+eng").
         psm: Page segmentation mode.
         oem: OCR engine mode.
-        dpi: Dots per inch (resolution).
+        dpi: Dots per inch (resolution); lowered if the page would exceed `max_side`.
         max_side: Maximum side length for scaling.
 
     Returns:
         OCR-extracted text.
     """
     try:
-        pix = page.get_pixmap(dpi=dpi)
-        img_bytes = pix.tobytes("png")
-        img = Image.open(io.BytesIO(img_bytes)).convert("RGB")
+        img = _render_page(page, dpi, max_side)
     except Exception as e:
         logger.error("Failed to render PDF page to image: %s", e)
         return ""
 
-    # Resize if too large
-    w, h = img.size
-    m = max(w, h)
-    if m > max_side:
-        scale = max_side / float(m)
-        img = img.resize((int(w * scale), int(h * scale)), Image.LANCZOS)
+    text, _ = _ocr_image(img, lang=lang, psm=psm, oem=oem, max_side=max_side, page_rotation=page.rotation)
+    return text
 
-    # Deskew and preprocess
-    img = _deskew_pil(img)
-    img = _preprocess_cv2(img) if HAS_CV2 else _preprocess_pil(img)
+# --------------------------------------------------------------
+# Parallel OCR executor
+# --------------------------------------------------------------
 
-    # OCR
-    config = f"--oem {oem} --psm {psm}"
-    try:
-        text = pytesseract.image_to_string(img, lang=lang, config=config)
-        return (text or "").strip()
-    except Exception as e:
-        logger.warning("OCR primary config failed: %s", e)
+@dataclass
+class OcrConfig:
+    """Settings for OcrExecutor."""
+    lang: str = "deu+eng"
+    psm: int = 6
+    oem: int = 1
+    dpi: int = 300
+    max_side: int = 3000
+    workers: int = int(os.getenv("OCR_WORKERS", "0")) or (os.cpu_count() or 1)
+    page_timeout_s: float = float(os.getenv("OCR_PAGE_TIMEOUT_S", "120"))
+    max_in_flight: int = 0  # 0 -> 2 * workers
+    mp_start_method: str = "spawn"
+    osd_thumb_side: int = 1000
+    orientation_probe_pages: int = 3
+
+
+class OcrExecutor:
+    """
+    OCR on a bounded process pool, usable as PDFProcessor's `ocr_fn`.
+
+    - Called directly (`ocr_fn(page)`) it behaves like extract_text_with_ocr.
+    - PDFProcessor uses `submit(page)` / `result(future)`: the page is rendered in
+      the caller and tesseract runs in a worker, so rendering of the next pages
+      overlaps with recognition of earlier ones.
+    - At most `max_in_flight` rendered pages are queued; `submit` blocks beyond that.
+    - Each tesseract call is limited to `page_timeout_s`; the caller additionally
+      stops waiting (and cancels the future) after twice that.
+    - `document()` opens a per-document session that remembers page orientation
+      (see OrientationDetector), so OSD is skipped once the first pages agree.
+    - A pickled copy (e.g. sent to a page-range worker process) runs inline.
+    """
+
+    def __init__(self, cfg: OcrConfig = OcrConfig()):
+        self.cfg = cfg
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._pool_lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(cfg.max_in_flight or 2 * max(1, cfg.workers))
+        self._inline = cfg.workers <= 1
+
+    def __call__(self, page: fitz.Page) -> str:
+        return self.result(self.submit(page))
+
+    def document(self) -> "_OcrSession":
+        """Session for the pages of one document (shares orientation decisions)."""
+        return _OcrSession(self, OrientationDetector(self.cfg.orientation_probe_pages))
+
+    def submit(self, page: fitz.Page, orientation: Optional[OrientationDetector] = None) -> Future:
+        """Render `page` now and queue it for recognition."""
         try:
-            fallback_config = f"--oem {oem} --psm 11"
-            text = pytesseract.image_to_string(img, lang=lang, config=fallback_config)
-            return (text or "").strip()
+            img = _render_page(page, self.cfg.dpi, self.cfg.max_side)
         except Exception as e:
-            logger.error("OCR fallback failed: %s", e)
-            return ""
+            logger.error("Failed to render PDF page to image: %s", e)
+            return _done(("", None))
+
+        args = (img, self.cfg.lang, self.cfg.psm, self.cfg.oem, self.cfg.max_side, self.cfg.page_timeout_s)
+        kwargs = {"page_rotation": page.rotation, "thumb_side": self.cfg.osd_thumb_side}
+        if orientation is not None:
+            kwargs["known_angle"] = orientation.known_angle()
+            kwargs["expected_angle"] = orientation.expected_angle()
+
+        if self._inline:
+            fut = _done(_ocr_image(*args, **kwargs))
+        else:
+            self._slots.acquire()
+            try:
+                fut = self._ensure_pool().submit(_ocr_image, *args, **kwargs)
+            except Exception:
+                self._slots.release()
+                raise
+            fut.add_done_callback(lambda _: self._slots.release())
+
+        if orientation is not None:
+            fut.add_done_callback(lambda f: _observe_angle(orientation, f))
+        return fut
+
+    def result(self, fut: Future) -> str:
+        """Wait for a submitted page; timeouts and worker errors yield ""."""
+        wait_s = 2 * self.cfg.page_timeout_s if self.cfg.page_timeout_s else None
+        try:
+            text, _ = fut.result(timeout=wait_s)
+            return text or ""
+        except FutureTimeout:
+            fut.cancel()
+            logger.warning("OCR page did not finish within %ss; skipped", wait_s)
+        except Exception:
+            logger.warning("OCR worker failed", exc_info=True)
+        return ""
+
+    def shutdown(self) -> None:
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=False, cancel_futures=True)
+                self._pool = None
+
+    def _ensure_pool(self) -> ProcessPoolExecutor:
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ProcessPoolExecutor(
+                    max_workers=self.cfg.workers,
+                    mp_context=multiprocessing.get_context(self.cfg.mp_start_method),
+                )
+            return self._pool
+
+    def __getstate__(self) -> Dict[str, Any]:
+        return {"cfg": self.cfg}
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__init__(state["cfg"])
+        self._inline = True
+
+
+class _OcrSession:
+    """OcrExecutor bound to one document's OrientationDetector."""
+
+    def __init__(self, executor: OcrExecutor, orientation: OrientationDetector):
+        self.executor = executor
+        self.orientation = orientation
+
+    def __call__(self, page: fitz.Page) -> str:
+        return self.result(self.submit(page))
+
+    def submit(self, page: fitz.Page) -> Future:
+        return self.executor.submit(page, self.orientation)
+
+    def result(self, fut: Future) -> str:
+        return self.executor.result(fut)
+
+
+def _observe_angle(orientation: OrientationDetector, fut: Future) -> None:
+    if not fut.cancelled() and fut.exception() is None:
+        orientation.observe(fut.result()[1])
+
+
+def _done(value: Any) -> Future:
+    fut: Future = Future()
+    fut.set_result(value)
+    return fut
@@ -0,0 +1,139 @@
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Union
+
+import numpy as np
+
+# --------------------------------------------------------------
+# Span arrays
+# --------------------------------------------------------------
+
+class SpanArrays:
+    """
+    Line spans of one page as a struct of arrays.
+
+    - x, y, w, h: float32 rectangles in PDF space (bottom-left origin); NaN when
+      a legacy span had no bbox
+    - text: every line's text concatenated; line i is text[offsets[i]:offsets[i + 1]]
+
+    Indexing or iterating yields the legacy {"text", "bbox"} dicts, so existing
+    consumers of page["spans"] keep working; chunking reads the arrays directly.
+    """
+
+    __slots__ = ("x", "y", "w", "h", "text", "offsets")
+
+    def __init__(self, x, y, w, h, text: str, offsets):
+        self.x = np.asarray(x, dtype=np.float32)
+        self.y = np.asarray(y, dtype=np.float32)
+        self.w = np.asarray(w, dtype=np.float32)
+        self.h = np.asarray(h, dtype=np.float32)
+        self.text = text
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+
+    @classmethod
+    def from_lines(cls, texts: Sequence[str], x: Sequence[float], y: Sequence[float], w: Sequence[float], h: Sequence[float]) -> "SpanArrays":
+        offsets = np.zeros(len(texts) + 1, dtype=np.int64)
+        if texts:
+            np.cumsum([len(t) for t in texts], out=offsets[1:])
+        return cls(x, y, w, h, "".join(texts), offsets)
+
+    @classmethod
+    def empty(cls) -> "SpanArrays":
+        return cls.from_lines([], [], [], [], [])
+
+    @classmethod
+    def from_dicts(cls, spans: Iterable[Any]) -> "SpanArrays":
+        """From legacy span dicts; non-dicts and blank lines are dropped, text is stripped."""
+        texts: List[str] = []
+        boxes: List[List[float]] = []
+        for s in spans:
+            if not isinstance(s, dict):
+                continue
+            text = (s.get("text") or "").strip()
+            if not text:
+                continue
+            b = s.get("bbox")
+            texts.append(text)
+            boxes.append([float(b["x"]), float(b["y"]), float(b["width"]), float(b["height"])] if b else [np.nan] * 4)
+        cols = np.asarray(boxes, dtype=np.float32).reshape(-1, 4).T
+        return cls.from_lines(texts, *cols)
+
+    @classmethod
+    def coerce(cls, spans: Union["SpanArrays", Iterable[Any], None]) -> "SpanArrays":
+        if isinstance(spans, SpanArrays):
+            return spans
+        return cls.from_dicts(spans or [])
+
+    # ---------------------------
+    # Sequence view
+    # ---------------------------
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def line(self, i: int) -> str:
+        return self.text[self.offsets[i] : self.offsets[i + 1]]
+
+    def lines(self) -> List[str]:
+        o = self.offsets.tolist()
+        return [self.text[a:b] for a, b in zip(o[:-1], o[1:])]
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        n = len(self)
+        if not -n <= i < n:
+            raise IndexError(i)
+        i %= n
+        span: Dict[str, Any] = {"text": self.line(i)}
+        if not np.isnan(self.x[i]):
+            span["bbox"] = {"x": float(self.x[i]), "y": float(self.y[i]), "width": float(self.w[i]), "height": float(self.h[i])}
+        return span
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self[i] for i in range(len(self)))
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, SpanArrays):
+            return self.text == other.text and all(
+                np.array_equal(a, b, equal_nan=True)
+                for a, b in ((self.offsets, other.offsets), (self.x, other.x), (self.y, other.y), (self.w, other.w), (self.h, other.h))
+            )
+        if isinstance(other, list):
+            return self.to_dicts() == other
+        return NotImplemented
+
+    def __repr__(self) -> str:
+        return f"SpanArrays({len(self)} lines)"
+
+    def to_dicts(self) -> List[Dict[str, Any]]:
+        """Legacy list of {"text", "bbox"} dicts (e.g. for JSON responses)."""
+        return list(self)
+
+    # ---------------------------
+    # Vectorized geometry
+    # ---------------------------
+
+    def char_lengths(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def union_bboxes(self, starts: Sequence[int]) -> np.ndarray:
+        """
+        Bounding rectangle (x, y, w, h) of each run of lines [starts[k], starts[k + 1]),
+        the last run ending at the last line. starts must be increasing, starting at 0.
+        Spans without a bbox are ignored; a run without any gives a NaN row.
+        """
+        if not len(self):
+            return np.zeros((0, 4), dtype=np.float32)
+        starts = np.asarray(starts, dtype=np.int64)
+        x0 = np.fmin.reduceat(self.x, starts)
+        y0 = np.fmin.reduceat(self.y, starts)
+        x1 = np.fmax.reduceat(self.x + self.w, starts)
+        y1 = np.fmax.reduceat(self.y + self.h, starts)
+        return np.stack([x0, y0, x1 - x0, y1 - y0], axis=1)
+
+
+def bbox_dict(row: np.ndarray, page: Optional[int] = None) -> Optional[Dict[str, float]]:
+    """One union_bboxes row as a {x, y, width, height[, page]} dict; None for a NaN row."""
+    if np.isnan(row[0]):
+        return None
+    out: Dict[str, Any] = {"x": float(row[0]), "y": float(row[1]), "width": float(row[2]), "height": float(row[3])}
+    if page is not None:
+        out["page"] = page
+    return out
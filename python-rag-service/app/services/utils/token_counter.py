@@ -0,0 +1,148 @@
+import logging
+import os
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+# --------------------------------------------------------------
+# Token counter
+# --------------------------------------------------------------
+
+class TokenCounter:
+    """
+    Memoized token counting on top of a tiktoken encoding.
+
+    - count(text): LRU-cached per string
+    - count_many(texts): cache lookups; misses are encoded together, on a thread
+      pool (encode_ordinary_batch) once they exceed `batch_min_chars`
+    - count_joined(counts, sep): estimate for "sep".join(parts) from the part counts,
+      without re-encoding the joined text (may be off by a token per boundary)
+
+    Falls back to a words/chars heuristic when tiktoken is not installed.
+    Special-token strings in the text are counted as ordinary text.
+    """
+
+    def __init__(
+        self,
+        encoding: str = "cl100k_base",
+        cache_size: int = 8192,
+        batch_threads: int = 4,
+        batch_min_chars: int = 200_000,
+    ):
+        self.encoding = encoding
+        self.cache_size = cache_size
+        self.batch_threads = batch_threads
+        # tiktoken's batch API spins up a thread pool per call; below this much
+        # text a plain loop is faster.
+        self.batch_min_chars = batch_min_chars
+        self._encoder = None
+        self._loaded = False
+        self._cache: "OrderedDict[str, int]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    # ---------------------------
+    # Encoder
+    # ---------------------------
+
+    def _get_encoder(self):
+        if not self._loaded:
+            try:
+                import tiktoken
+                self._encoder = tiktoken.get_encoding(self.encoding)
+            except ImportError:
+                logger.info("tiktoken not available; using heuristic token counts")
+                self._encoder = None
+            self._loaded = True
+        return self._encoder
+
+    @staticmethod
+    def _estimate(text: str) -> int:
+        words = len(text.split())
+        chars = len(text)
+        return max(1, int((words * 1.3) + (chars * 0.2)))
+
+    def _encode_counts(self, texts: List[str]) -> List[int]:
+        encoder = self._get_encoder()
+        if encoder is None:
+            return [self._estimate(t) for t in texts]
+        if len(texts) == 1 or sum(len(t) for t in texts) < self.batch_min_chars:
+            return [len(encoder.encode_ordinary(t)) for t in texts]
+        return [len(tokens) for tokens in encoder.encode_ordinary_batch(texts, num_threads=self.batch_threads)]
+
+    # ---------------------------
+    # Counting
+    # ---------------------------
+
+    def count(self, text: str) -> int:
+        text = text or ""
+        with self._lock:
+            n = self._cache.get(text)
+            if n is not None:
+                self._cache.move_to_end(text)
+                self.hits += 1
+                return n
+            self.misses += 1
+        n = self._encode_counts([text])[0]
+        self._remember({text: n})
+        return n
+
+    def count_many(self, texts: Sequence[str]) -> List[int]:
+        texts = [t or "" for t in texts]
+        found: Dict[str, int] = {}
+        with self._lock:
+            for t in texts:
+                n = self._cache.get(t)
+                if n is not None:
+                    self._cache.move_to_end(t)
+                    found[t] = n
+            missing = list(dict.fromkeys(t for t in texts if t not in found))
+            self.hits += len(texts) - sum(1 for t in texts if t not in found)
+            self.misses += len(missing)
+        if missing:
+            fresh = dict(zip(missing, self._encode_counts(missing)))
+            self._remember(fresh)
+            found.update(fresh)
+        return [found[t] for t in texts]
+
+    def count_joined(self, counts: Sequence[int], sep: str = "\n") -> int:
+        """Estimated tokens of sep.join(parts) given the parts' counts."""
+        if not counts:
+            return 0
+        return int(sum(counts)) + (len(counts) - 1) * (self.count(sep) if sep else 0)
+
+    def _remember(self, counts: Dict[str, int]) -> None:
+        if self.cache_size <= 0:
+            return
+        with self._lock:
+            for text, n in counts.items():
+                self._cache[text] = n
+                self._cache.move_to_end(text)
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._cache.clear()
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"hits": self.hits, "misses": self.misses, "entries": len(self._cache)}
+
+
+@lru_cache(maxsize=None)
+def _shared_counter(encoding: str) -> TokenCounter:
+    return TokenCounter(encoding, cache_size=int(os.getenv("TOKEN_COUNT_CACHE_SIZE", "8192")))
+
+
+def get_token_counter(encoding: str = "cl100k_base") -> TokenCounter:
+    """Process-wide counter per encoding (cache size from TOKEN_COUNT_CACHE_SIZE)."""
+    return _shared_counter(encoding)
+
+
+def count_tokens(text: str, encoding: Optional[str] = None) -> int:
+    return get_token_counter(encoding or "cl100k_base").count(text)
@@ -1,14 +1,49 @@
+import argparse
 import os
 import shutil
 import logging
+import threading
+import time
+from collections import OrderedDict
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Callable, Dict, Hashable, List, Optional, Sequence, Tuple
+from uuid import uuid4
 
+import faiss
+import numpy as np
 from langchain_core.documents import Document
+from langchain_community.docstore.in_memory import InMemoryDocstore
 from langchain_community.vectorstores import FAISS
 from langchain_openai import OpenAIEmbeddings
 
+from app.services.chunk_store import (
+    CHUNKS_FILE,
+    LINE_RECTS_KEY,
+    RECTS_FILE,
+    ChunkDocstore,
+    ChunkIdMap,
+    ChunkStore,
+    RectStore,
+    normalize_metadata,
+    split_line_rects,
+    write_chunks,
+    write_rects,
+)
+from app.services.embedding_backends import backend_embeddings, default_embedding_model
+from app.services.embedding_cache import content_hash
+from app.services.faiss_index import (
+    FLAT,
+    apply_search_params,
+    build_index,
+    empty_like,
+    index_kind,
+    open_index,
+    resolve_index_spec,
+    supports_remove,
+)
+from app.services.lexical_index import LEXICAL_FILE, LexicalIndex, reciprocal_rank_fusion
+
 log = logging.getLogger(__name__)
 
 # ===============================
@@ -19,15 +54,258 @@ log = logging.getLogger(__name__)
 class VectorStoreConfig:
     index_base: str = os.getenv("FAISS_STORE_PATH", "faiss_index")
     k_default: int = 10
-    allow_dangerous_deser: bool = True
+    # Only indexes written before chunks.bin existed still carry a pickled index.pkl;
+    # convert them once with migrate_legacy instead of enabling this
+    allow_dangerous_deser: bool = os.getenv("FAISS_ALLOW_LEGACY_PICKLE", "0") == "1"
+    incremental: bool = True
+    hybrid: bool = True
+    hybrid_fetch_k: int = 8
+    rrf_k: int = 60
+    cache_enabled: bool = True
+    # ANN index type: auto | flat | hnsw | ivf | ivfpq | <faiss factory string>
+    index_type: str = os.getenv("FAISS_INDEX_TYPE", "auto")
+    flat_max_chunks: int = int(os.getenv("FAISS_FLAT_MAX_CHUNKS", "20000"))
+    ivfpq_min_chunks: int = int(os.getenv("FAISS_IVFPQ_MIN_CHUNKS", "500000"))
+    hnsw_m: int = 32
+    hnsw_ef_search: int = int(os.getenv("FAISS_HNSW_EF_SEARCH", "64"))
+    ivf_nprobe: int = int(os.getenv("FAISS_IVF_NPROBE", "16"))
+    # Map vectors instead of reading them into each process (read path only)
+    mmap_indexes: bool = os.getenv("FAISS_MMAP", "0") == "1"
+
+
+@dataclass
+class StoreCacheConfig:
+    """Budget of the process-wide store cache; shared by every VectorStore, so set once (configure_store_cache)."""
+    max_entries: int = int(os.getenv("FAISS_CACHE_MAX_ENTRIES", "32"))
+    max_bytes: int = int(os.getenv("FAISS_CACHE_MAX_BYTES", str(512 * 1024 * 1024)))
 
 # ===============================
 # Helpers
 # ===============================
 
+LEGACY_DOCSTORE_FILE = "index.pkl"
+
+
+def _docstore_file(path: str) -> Optional[str]:
+    """chunks.bin, or the pickled docstore of a legacy index; None if neither exists."""
+    for name in (CHUNKS_FILE, LEGACY_DOCSTORE_FILE):
+        if (Path(path) / name).is_file():
+            return name
+    return None
+
 def _faiss_files_present(path: str) -> bool:
-    p = Path(path)
-    return (p / "index.faiss").is_file() and (p / "index.pkl").is_file()
+    return (Path(path) / "index.faiss").is_file() and _docstore_file(path) is not None
+
+def _index_stamp(path: str, names: Optional[Tuple[str, ...]] = None) -> Tuple[int, int]:
+    """(mtime_ns, size in bytes) of the given index files; changes whenever they are rewritten."""
+    if names is None:
+        names = ("index.faiss", _docstore_file(path) or CHUNKS_FILE)
+    stats = [(Path(path) / name).stat() for name in names]
+    return max(st.st_mtime_ns for st in stats), sum(st.st_size for st in stats)
+
+CENTROID_FILE = "centroid.npy"
+
+
+def index_centroid(index) -> Optional[np.ndarray]:
+    """Unit-length mean of the vectors in a FAISS index; a document's routing signature."""
+    n = int(getattr(index, "ntotal", 0) or 0)
+    if n == 0:
+        return None
+    centroid = index.reconstruct_n(0, n).astype(np.float32).mean(axis=0)
+    norm = float(np.linalg.norm(centroid))
+    return centroid / norm if norm > 0 else centroid
+
+
+def _chunk_key(doc: Document) -> Tuple[Optional[str], str]:
+    """Identity used for incremental diffs: (chunkId, hash of the normalized text)."""
+    return (doc.metadata or {}).get("chunkId"), content_hash(doc.page_content)
+
+# A document folder doc_<id> is a symlink to its current version .doc_<id>.v-<hex>.
+# Writers publish a new version by renaming a fresh symlink over doc_<id>, which
+# is atomic: readers always find either the old or the new index.
+_STALE_MARKERS = (".tmp-", ".old-", ".lnk-", ".v-")
+
+
+def _replace_dir(src: Path, dst: Path) -> None:
+    """Publish a fully written index folder as the new version behind the `dst` symlink."""
+    version = dst.with_name(f".{dst.name}.v-{uuid4().hex[:8]}")
+    os.replace(src, version)
+    previous: Optional[Path] = None
+    if dst.is_symlink():
+        previous = dst.parent / os.readlink(dst)
+    elif dst.exists():
+        # Plain folder from before versioning: moved aside once (brief gap, readers retry)
+        previous = dst.with_name(f".{dst.name}.old-{uuid4().hex[:8]}")
+        os.replace(dst, previous)
+    link = dst.with_name(f".{dst.name}.lnk-{uuid4().hex[:8]}")
+    os.symlink(version.name, link, target_is_directory=True)
+    os.replace(link, dst)
+    if previous is not None:
+        shutil.rmtree(previous, ignore_errors=True)
+
+
+def _read_swapped(link: Path, read: Callable[[str], Any]) -> Any:
+    """
+    Run `read` on the version folder `link` currently points to. A concurrent
+    writer may swap in a new version and delete the old one mid-read; the read
+    is then retried once on the new version.
+    """
+    try:
+        return read(str(link.resolve()))
+    except FileNotFoundError:
+        return read(str(link.resolve()))
+
+
+def cleanup_stale_dirs(index_base: Optional[str] = None, max_age_s: float = 3600.0) -> int:
+    """
+    Remove leftovers of interrupted writes under every model folder of index_base:
+    temp folders, moved-aside legacy folders and versions no document links to.
+    Only entries older than max_age_s are touched, so writes in flight in other
+    processes are left alone. Returns the number of folders removed.
+    """
+    base = Path(index_base or VectorStoreConfig().index_base)
+    if not base.is_dir():
+        return 0
+    now = time.time()
+    removed = 0
+    for model_dir in (p for p in base.iterdir() if p.is_dir()):
+        live = {os.readlink(p) for p in model_dir.iterdir() if p.is_symlink()}
+        for entry in model_dir.iterdir():
+            if not entry.name.startswith(".") or not any(m in entry.name for m in _STALE_MARKERS):
+                continue
+            if entry.name in live:
+                continue
+            try:
+                if now - entry.lstat().st_mtime < max_age_s:
+                    continue
+                if entry.is_symlink() or not entry.is_dir():
+                    entry.unlink()
+                else:
+                    shutil.rmtree(entry)
+                removed += 1
+            except OSError as e:
+                log.warning("Could not remove stale index folder %s: %s", entry, e)
+    if removed:
+        log.info("Removed %d stale index folders under %s", removed, base)
+    return removed
+
+_WRITE_LOCKS: Dict[str, threading.Lock] = {}
+_WRITE_LOCKS_GUARD = threading.Lock()
+
+def _write_lock(path: str) -> threading.Lock:
+    """Serialize writers of the same index folder within the process."""
+    with _WRITE_LOCKS_GUARD:
+        return _WRITE_LOCKS.setdefault(path, threading.Lock())
+
+# ===============================
+# Process-wide store cache
+# ===============================
+
+class _StoreCache:
+    """
+    Size-bounded LRU of loaded indexes (FAISS stores, lexical indexes), shared by every VectorStore in the process.
+
+    - Keyed by (model_base_dir, doc_id, kind) with kind in {"faiss", "lexical", "rects"}.
+    - Budget: max entries and max bytes (on-disk index size as a proxy for resident size).
+    - Entries are validated against the index file stamp, so a rebuild by another
+      worker is picked up even without an explicit invalidate().
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[Hashable, Tuple[Tuple[int, int], Any]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def resize(self, max_entries: int, max_bytes: int) -> None:
+        with self._lock:
+            self.max_entries = max_entries
+            self.max_bytes = max_bytes
+            self._evict_locked()
+
+    def get(self, key: Hashable, stamp: Tuple[int, int]) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] != stamp:
+                if entry is not None:
+                    self._drop_locked(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def put(self, key: Hashable, stamp: Tuple[int, int], value: Any) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop_locked(key)
+            if self.max_entries <= 0 or stamp[1] > self.max_bytes:
+                return
+            self._entries[key] = (stamp, value)
+            self._bytes += stamp[1]
+            self._evict_locked()
+
+    def invalidate(self, key: Hashable) -> None:
+        with self._lock:
+            if key in self._entries:
+                self._drop_locked(key)
+                self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+            }
+
+    def _drop_locked(self, key: Hashable) -> None:
+        stamp, _ = self._entries.pop(key)
+        self._bytes -= stamp[1]
+
+    def _evict_locked(self) -> None:
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            key = next(iter(self._entries))
+            self._drop_locked(key)
+            self.evictions += 1
+
+
+_STORE_CACHE = _StoreCache(
+    max_entries=StoreCacheConfig.max_entries,
+    max_bytes=StoreCacheConfig.max_bytes,
+)
+
+
+def configure_store_cache(cfg: Optional[StoreCacheConfig] = None) -> None:
+    """Set the process-wide cache budget (at startup); entries over it are evicted."""
+    cfg = cfg or StoreCacheConfig()
+    _STORE_CACHE.resize(cfg.max_entries, cfg.max_bytes)
+
+# Called with the documentId after its index was (re)written; e.g. the answer cache.
+_INVALIDATION_LISTENERS: List[Callable[[str], None]] = []
+
+
+def add_invalidation_listener(listener: Callable[[str], None]) -> None:
+    if listener not in _INVALIDATION_LISTENERS:
+        _INVALIDATION_LISTENERS.append(listener)
+
+
+def remove_invalidation_listener(listener: Callable[[str], None]) -> None:
+    if listener in _INVALIDATION_LISTENERS:
+        _INVALIDATION_LISTENERS.remove(listener)
 
 # ===============================
 # Store
@@ -38,8 +316,11 @@ class VectorStore:
     Minimal wrapper around FAISS (via LangChain):
 
     - Namespaced by model: <index_base>/<embedding_model_sanitized>/
-    - Per-document index:  doc_<documentId>/
-    - save_to_faiss: builds a fresh index
+    - Per-document index:  doc_<documentId>/ (index.faiss + memory-mapped chunks.bin)
+    - save_to_faiss: incremental upsert/delete by chunkId, written atomically
+    - load_faiss_store: served from a process-wide LRU of loaded stores
+    - BM25 lexical index (lexical.npz) next to each FAISS index; hybrid_search
+      fuses both rankings with reciprocal rank fusion
     """
 
     def __init__(
@@ -49,16 +330,31 @@ class VectorStore:
         cfg: VectorStoreConfig = VectorStoreConfig(),
     ):
         self.cfg = cfg
-        self.embeddings = embeddings or OpenAIEmbeddings(
-            model=embedding_model or os.getenv("EMBEDDING_MODEL", "text-embedding-3-large")
-        )
+        if embeddings is None:
+            embedding_model = embedding_model or default_embedding_model()
+            embeddings = backend_embeddings(embedding_model, factory=OpenAIEmbeddings)
+        self.embeddings = embeddings
         model_name = embedding_model or getattr(self.embeddings, "model", "openai_embeddings")
-        self.model_base_dir = Path(self.cfg.index_base) / embedding_model.replace("/", "_")
+        self.model_base_dir = Path(self.cfg.index_base) / model_name.replace("/", "_")
         self.model_base_dir.mkdir(parents=True, exist_ok=True)
 
     def _doc_dir(self, doc_id: str, index_dir: Optional[str] = None) -> Path:
+        """The document's folder link; readers resolve it once to a fixed version (_read_swapped)."""
         base = Path(index_dir) if index_dir else self.model_base_dir
-        return (base / f"doc_{doc_id}").resolve()
+        return base.resolve() / f"doc_{doc_id}"
+
+    def _cache_key(self, doc_id: str, index_dir: Optional[str] = None, kind: str = "faiss") -> Tuple[str, str, str]:
+        base = Path(index_dir) if index_dir else self.model_base_dir
+        return str(base.resolve()), str(doc_id), kind
+
+    def _invalidate(self, doc_id: str, index_dir: Optional[str] = None) -> None:
+        for kind in ("faiss", "lexical", "rects"):
+            _STORE_CACHE.invalidate(self._cache_key(doc_id, index_dir, kind))
+        for listener in list(_INVALIDATION_LISTENERS):
+            try:
+                listener(doc_id)
+            except Exception as e:
+                log.warning("Invalidation listener failed for doc_id=%s: %s", doc_id, e)
 
     # ---------------------------
     # Save
@@ -68,29 +364,218 @@ class VectorStore:
         self,
         docs: List[Document],
         index_dir: Optional[str] = None,
-    ) -> None:
+        incremental: Optional[bool] = None,
+        vectors: Optional[Sequence[Sequence[float]]] = None,
+    ) -> Dict[str, Any]:
         """
-        Build a fresh FAISS index for the given document.
+        Write the FAISS index for the given document.
+
+        `vectors` (optional, aligned with `docs`) are precomputed embeddings, e.g.
+        from a streaming ingest; chunks that need adding then are not re-embedded.
+
+        - Incremental (default, cfg.incremental): diff incoming chunks against the
+          stored docstore by (chunkId, text hash); embed and add only new chunks,
+          remove chunks that vanished, refresh metadata of kept ones.
+        - Otherwise (or when no usable index exists): build a fresh index.
+        - Index type follows cfg.index_type; with "auto" a flat index is swapped for
+          HNSW / IVF-PQ (trained on the stored vectors) once the chunk count passes
+          cfg.flat_max_chunks / cfg.ivfpq_min_chunks. An existing ANN index keeps
+          its type across incremental updates; a full rebuild re-selects it.
+        - Chunks go to a memory-mapped chunks.bin (see chunk_store.py) instead of
+          a pickled index.pkl; legacy indexes are converted on their next save.
+        - A BM25 lexical index and the vector centroid (used by corpus search
+          routing) are written alongside.
+        - The new index is written to a temp folder and published by atomically
+          swapping the doc_<id> symlink to it (see _replace_dir), so readers never
+          see a half-written or missing index. Nothing is written when nothing changed.
+        - After a write, drops the document from the process-wide store cache and
+          notifies invalidation listeners (see add_invalidation_listener).
 
-        - Deletes the existing per-document folder (if any).
-        - Builds a brand new index from all provided docs.
+        Returns:
+            Dict[str, Any]: {"mode", "added", "removed", "kept"}
         """
         if not docs:
             log.info("save_to_faiss: empty docs; nothing to save.")
-            return
+            return {"mode": "noop", "added": 0, "removed": 0, "kept": 0}
 
         doc_id = (docs[0].metadata or {}).get("documentId")
         if not doc_id:
             raise ValueError("First document is missing metadata['documentId'].")
+        if vectors is not None and len(vectors) != len(docs):
+            raise ValueError("vectors must be aligned with docs.")
 
+        # Same JSON rules as chunks.bin, so unchanged chunks diff as unchanged
+        docs = [Document(page_content=d.page_content, metadata=normalize_metadata(d.metadata)) for d in docs]
+        doc_id = docs[0].metadata["documentId"]
         target_dir = self._doc_dir(str(doc_id), index_dir)
-        if target_dir.exists():
-            shutil.rmtree(target_dir)
-        target_dir.mkdir(parents=True, exist_ok=True)
+        use_incremental = self.cfg.incremental if incremental is None else incremental
+
+        with _write_lock(str(target_dir)):
+            result: Optional[Dict[str, Any]] = None
+            store = None
+            if use_incremental and _faiss_files_present(str(target_dir)):
+                try:
+                    store = self._read_store(str(target_dir.resolve()), lazy=False)
+                    result = self._apply_diff(store, docs, vectors)
+                except Exception as e:
+                    log.warning("Incremental update failed for doc_id=%s (%s); rebuilding.", doc_id, e)
+                    store, result = None, None
+
+            if store is None and vectors is not None:
+                store = FAISS.from_embeddings(
+                    [(d.page_content, list(v)) for d, v in zip(docs, vectors)],
+                    self.embeddings,
+                    metadatas=[d.metadata for d in docs],
+                )
+                result = {"mode": "rebuild", "added": len(docs), "removed": 0, "kept": 0}
+            elif store is None:
+                store = FAISS.from_documents(docs, self.embeddings)
+                result = {"mode": "rebuild", "added": len(docs), "removed": 0, "kept": 0}
+
+            changed = result.pop("changed", True)
+            if self._fit_index(store):
+                changed = True
+            side_files = (CHUNKS_FILE, LEXICAL_FILE, CENTROID_FILE)
+            if changed or not all((target_dir / name).is_file() for name in side_files):
+                self._write_atomic(store, target_dir)
+                self._invalidate(str(doc_id), index_dir)
 
-        store = FAISS.from_documents(docs, self.embeddings)
-        store.save_local(str(target_dir))
-        log.info("Created fresh FAISS index with %d chunks at %s", len(docs), str(target_dir))
+        log.info("Saved FAISS index doc_id=%s at %s: %s", doc_id, str(target_dir), result)
+        return result
+
+    def _apply_diff(
+        self,
+        store,
+        docs: List[Document],
+        vectors: Optional[Sequence[Sequence[float]]] = None,
+    ) -> Dict[str, Any]:
+        """Mutate a loaded store in place so it holds exactly `docs`."""
+        incoming: Dict[Tuple[Optional[str], str], Document] = {}
+        incoming_vectors: Dict[Tuple[Optional[str], str], Sequence[float]] = {}
+        for i, d in enumerate(docs):
+            key = _chunk_key(d)
+            if key not in incoming:
+                incoming[key] = d
+                if vectors is not None:
+                    incoming_vectors[key] = vectors[i]
+
+        existing: Dict[Tuple[Optional[str], str], str] = {}
+        to_remove: List[str] = []
+        for store_id in store.index_to_docstore_id.values():
+            stored = store.docstore.search(store_id)
+            if not isinstance(stored, Document):
+                to_remove.append(store_id)
+                continue
+            key = _chunk_key(stored)
+            if key in incoming and key not in existing:
+                existing[key] = store_id
+            else:
+                to_remove.append(store_id)
+
+        add_keys = [key for key in incoming if key not in existing]
+        to_add = [incoming[key] for key in add_keys]
+
+        meta_changed = False
+        for key, store_id in existing.items():
+            new_doc = incoming[key]
+            if store.docstore.search(store_id).metadata != new_doc.metadata:
+                store.docstore._dict[store_id] = Document(
+                    page_content=new_doc.page_content, metadata=dict(new_doc.metadata)
+                )
+                meta_changed = True
+
+        if to_remove:
+            self._remove_chunks(store, to_remove)
+        if to_add and vectors is not None:
+            store.add_embeddings(
+                [(d.page_content, list(incoming_vectors[key])) for key, d in zip(add_keys, to_add)],
+                metadatas=[d.metadata for d in to_add],
+            )
+        elif to_add:
+            store.add_documents(to_add)
+
+        return {
+            "mode": "incremental",
+            "added": len(to_add),
+            "removed": len(to_remove),
+            "kept": len(existing),
+            "changed": bool(to_add or to_remove or meta_changed),
+        }
+
+    # ---------------------------
+    # ANN index
+    # ---------------------------
+
+    def _tune(self, store) -> None:
+        index = getattr(store, "index", None)
+        if isinstance(index, faiss.Index):
+            apply_search_params(index, nprobe=self.cfg.ivf_nprobe, ef_search=self.cfg.hnsw_ef_search)
+
+    def _fit_index(self, store) -> bool:
+        """Replace a flat index with the configured ANN type when the chunk count calls for it."""
+        index = getattr(store, "index", None)
+        if not isinstance(index, faiss.Index) or index.ntotal == 0 or index_kind(index) != FLAT:
+            return False
+        spec = resolve_index_spec(
+            int(index.ntotal),
+            int(index.d),
+            index_type=self.cfg.index_type,
+            flat_max_chunks=self.cfg.flat_max_chunks,
+            ivfpq_min_chunks=self.cfg.ivfpq_min_chunks,
+            hnsw_m=self.cfg.hnsw_m,
+        )
+        if spec == "Flat":
+            return False
+        store.index = build_index(index.reconstruct_n(0, index.ntotal), spec, index.metric_type)
+        self._tune(store)
+        log.info("Built %s index over %d vectors", spec, store.index.ntotal)
+        return True
+
+    def _remove_chunks(self, store, store_ids: List[str]) -> None:
+        """Delete chunks; ANN indexes without safe remove_ids are refilled from the surviving vectors."""
+        index = getattr(store, "index", None)
+        if not isinstance(index, faiss.Index) or supports_remove(index):
+            store.delete(store_ids)
+            return
+        drop = set(store_ids)
+        mapping = store.index_to_docstore_id
+        keep = [pos for pos in sorted(mapping) if mapping[pos] not in drop]
+        rebuilt = empty_like(index)
+        if keep:
+            rebuilt.add(index.reconstruct_n(0, index.ntotal)[keep])
+        store.index = rebuilt
+        store.index_to_docstore_id = {i: mapping[pos] for i, pos in enumerate(keep)}
+        store.docstore.delete([i for i in drop if i in store.docstore._dict])
+        self._tune(store)
+
+    def _write_atomic(self, store, target_dir: Path) -> None:
+        tmp_dir = target_dir.with_name(f".{target_dir.name}.tmp-{uuid4().hex[:8]}")
+        try:
+            tmp_dir.mkdir(parents=True)
+            faiss.write_index(store.index, str(tmp_dir / "index.faiss"))
+            mapping = store.index_to_docstore_id
+            ids = [mapping[i] for i in range(len(mapping))]
+            docs, rects = split_line_rects([store.docstore.search(i) for i in ids])
+            write_chunks(tmp_dir / CHUNKS_FILE, ids, docs)
+            if rects is not None:
+                write_rects(tmp_dir / RECTS_FILE, rects)
+            self._build_lexical(store).save(tmp_dir)
+            centroid = index_centroid(getattr(store, "index", None))
+            if centroid is not None:
+                np.save(tmp_dir / CENTROID_FILE, centroid)
+            _replace_dir(tmp_dir, target_dir)
+        finally:
+            if tmp_dir.exists():
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    @staticmethod
+    def _build_lexical(store) -> LexicalIndex:
+        ids = [store.index_to_docstore_id[i] for i in range(len(store.index_to_docstore_id))]
+        texts = []
+        for store_id in ids:
+            doc = store.docstore.search(store_id)
+            texts.append(doc.page_content if isinstance(doc, Document) else "")
+        return LexicalIndex.build(ids, texts)
 
     # ---------------------------
     # Load
@@ -105,21 +590,29 @@ class VectorStore:
     ):
         """
         Load the FAISS index for a given document_id.
+
+        Loaded stores are kept in the process-wide LRU; repeated loads of a hot
+        document are a dictionary lookup plus a stat() of the index files.
+        Chunk text/metadata stay in the memory-mapped chunks.bin and are decoded
+        only for the hits a search returns.
         """
-        target_dir = self._doc_dir(str(document_id), index_dir)
-        dir_str = str(target_dir)
+        key = self._cache_key(str(document_id), index_dir)
 
-        if not _faiss_files_present(dir_str):
-            raise FileNotFoundError(
-                f"FAISS index missing for doc_id={document_id}. "
-                f"Expected files at {dir_str}: ['index.faiss','index.pkl']"
-            )
+        def read(dir_str: str):
+            if not _faiss_files_present(dir_str):
+                raise FileNotFoundError(
+                    f"FAISS index missing for doc_id={document_id}. "
+                    f"Expected files at {dir_str}: ['index.faiss','{CHUNKS_FILE}']"
+                )
+            stamp = _index_stamp(dir_str)
+            cached = _STORE_CACHE.get(key, stamp) if self.cfg.cache_enabled else None
+            if cached is None:
+                cached = self._read_store(dir_str)
+                if self.cfg.cache_enabled:
+                    _STORE_CACHE.put(key, stamp, cached)
+            return cached
 
-        store = FAISS.load_local(
-            dir_str,
-            self.embeddings,
-            allow_dangerous_deserialization=self.cfg.allow_dangerous_deser,
-        )
+        store = _read_swapped(self._doc_dir(str(document_id), index_dir), read)
 
         if not as_retriever:
             return store
@@ -127,6 +620,146 @@ class VectorStore:
         k_eff = int(k or self.cfg.k_default)
         return store.as_retriever(search_kwargs={"k": k_eff})
 
+    def _read_store(self, dir_str: str, lazy: bool = True):
+        """
+        Open a saved index.
+
+        lazy=True: docstore and id map read from the mmapped chunks.bin (read-only);
+          with cfg.mmap_indexes the vectors are memory-mapped too (see open_index).
+        lazy=False: chunks and vectors materialized in memory, for in-place updates;
+          line rectangles from rects.bin are put back into the chunk metadata.
+        Legacy indexes (index.pkl) go through FAISS.load_local.
+        """
+        if _docstore_file(dir_str) == LEGACY_DOCSTORE_FILE:
+            if not self.cfg.allow_dangerous_deser:
+                raise FileNotFoundError(
+                    f"Only a legacy pickled docstore at {dir_str}; run "
+                    "`python -m app.services.vector_store --migrate-legacy` or re-ingest the document."
+                )
+            store = FAISS.load_local(dir_str, self.embeddings, allow_dangerous_deserialization=True)
+        else:
+            chunks = ChunkStore.open(Path(dir_str) / CHUNKS_FILE)
+            if lazy:
+                docstore, mapping = ChunkDocstore(chunks), ChunkIdMap(chunks)
+            else:
+                docs = chunks.documents()
+                rects_path = Path(dir_str) / RECTS_FILE
+                if rects_path.is_file():
+                    rects = RectStore.open(rects_path)
+                    for pos, store_id in enumerate(docs):
+                        raw = rects.raw(pos)
+                        if raw:  # empty rects are not kept in metadata (normalize_metadata)
+                            docs[store_id].metadata[LINE_RECTS_KEY] = raw
+                docstore, mapping = InMemoryDocstore(docs), dict(enumerate(docs))
+            store = FAISS(
+                embedding_function=self.embeddings,
+                index=open_index(str(Path(dir_str) / "index.faiss"), mmap_vectors=lazy and self.cfg.mmap_indexes),
+                docstore=docstore,
+                index_to_docstore_id=mapping,
+            )
+        self._tune(store)
+        return store
+
+    def index_version(self, document_id: str, index_dir: Optional[str] = None) -> Optional[Tuple[int, int]]:
+        """Stamp of the document's index files (changes on every rewrite); None if there is no index."""
+        try:
+            return _read_swapped(self._doc_dir(str(document_id), index_dir), _index_stamp)
+        except FileNotFoundError:
+            return None
+
+    def load_line_rects(self, document_id: str, index_dir: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        chunkId -> (k, 4) float32 line rectangles (x, y, w, h, PDF space) of a
+        span-aware index (cached per index version); empty when the document was
+        ingested without spans. Used for answer-source highlighting.
+        """
+        key = self._cache_key(str(document_id), index_dir, "rects")
+
+        def read(dir_str: str) -> Dict[str, np.ndarray]:
+            target_dir = Path(dir_str)
+            if not (target_dir / RECTS_FILE).is_file():
+                return {}
+            stamp = _index_stamp(dir_str, (RECTS_FILE,))
+            out = _STORE_CACHE.get(key, stamp) if self.cfg.cache_enabled else None
+            if out is None:
+                chunks = ChunkStore.open(target_dir / CHUNKS_FILE)
+                rects = RectStore.open(target_dir / RECTS_FILE)
+                out = {}
+                for pos in range(len(rects)):
+                    boxes = rects.rects(pos)
+                    if len(boxes):
+                        out[str(chunks.metadata(pos).get("chunkId", chunks.id_at(pos)))] = boxes
+                if self.cfg.cache_enabled:
+                    _STORE_CACHE.put(key, stamp, out)
+            return out
+
+        return _read_swapped(self._doc_dir(str(document_id), index_dir), read)
+
+    def load_lexical_index(self, document_id: str, index_dir: Optional[str] = None) -> Optional[LexicalIndex]:
+        """Load the BM25 index for a document (cached); None for indexes built before it existed."""
+        key = self._cache_key(str(document_id), index_dir, "lexical")
+
+        def read(dir_str: str) -> Optional[LexicalIndex]:
+            if not (Path(dir_str) / LEXICAL_FILE).is_file():
+                return None
+            stamp = _index_stamp(dir_str, (LEXICAL_FILE,))
+            lexical = _STORE_CACHE.get(key, stamp) if self.cfg.cache_enabled else None
+            if lexical is None:
+                lexical = LexicalIndex.load(dir_str)
+                if self.cfg.cache_enabled:
+                    _STORE_CACHE.put(key, stamp, lexical)
+            return lexical
+
+        return _read_swapped(self._doc_dir(str(document_id), index_dir), read)
+
+    # ---------------------------
+    # Legacy migration
+    # ---------------------------
+
+    def migrate_legacy(self, index_dir: Optional[str] = None) -> Dict[str, int]:
+        """
+        One-shot conversion of legacy indexes (pickled index.pkl) to chunks.bin, so
+        they load without unpickling. The pickles are trusted here: only run it on
+        index folders this service wrote (see main(), --migrate-legacy).
+
+        Returns {"migrated", "failed"}.
+        """
+        base = (Path(index_dir) if index_dir else self.model_base_dir).resolve()
+        counts = {"migrated": 0, "failed": 0}
+        if not base.is_dir():
+            return counts
+        for entry in sorted(base.iterdir()):
+            if not entry.name.startswith("doc_") or not entry.is_dir():
+                continue
+            with _write_lock(str(entry)):
+                dir_str = str(entry.resolve())
+                if _docstore_file(dir_str) != LEGACY_DOCSTORE_FILE:
+                    continue
+                try:
+                    store = FAISS.load_local(dir_str, self.embeddings, allow_dangerous_deserialization=True)
+                    self._write_atomic(store, entry)
+                except Exception as e:
+                    log.warning("Could not migrate legacy index %s: %s", entry, e)
+                    counts["failed"] += 1
+                    continue
+            self._invalidate(entry.name[len("doc_"):], index_dir)
+            counts["migrated"] += 1
+        log.info("Legacy index migration under %s: %s", base, counts)
+        return counts
+
+    # ---------------------------
+    # Cache
+    # ---------------------------
+
+    @staticmethod
+    def cache_stats() -> Dict[str, int]:
+        """Hit/miss/eviction counters and current size of the process-wide store cache."""
+        return _STORE_CACHE.stats()
+
+    @staticmethod
+    def clear_cache() -> None:
+        _STORE_CACHE.clear()
+
     # ---------------------------
     # Convenience
     # ---------------------------
@@ -153,3 +786,91 @@ class VectorStore:
     ) -> List[Document]:
         retr = self.load_faiss_store(document_id, index_dir=index_dir, as_retriever=True, k=k)
         return retr.get_relevant_documents(query)
+
+    def hybrid_search(
+        self,
+        document_id: str,
+        query: str,
+        k: int = 4,
+        index_dir: Optional[str] = None,
+        fetch_k: Optional[int] = None,
+        query_vector: Optional[Sequence[float]] = None,
+    ) -> List[Document]:
+        """
+        Top-k chunks by reciprocal rank fusion of vector and BM25 rankings.
+
+        Each side contributes its top `fetch_k` (cfg.hybrid_fetch_k) candidates.
+        Falls back to vector-only ranking when no lexical index exists.
+        Pass `query_vector` to reuse an embedding the caller already computed.
+        Returned Documents are copies carrying `retrievalScore` in metadata.
+        """
+        store = self.load_faiss_store(document_id, index_dir=index_dir, as_retriever=False)
+        fetch = int(fetch_k or max(self.cfg.hybrid_fetch_k, k))
+
+        if query_vector is None:
+            query_vector = self.embed_query(query)
+        rankings = [self._vector_ids(store, query_vector, fetch)]
+        lexical = self.load_lexical_index(document_id, index_dir) if self.cfg.hybrid else None
+        if lexical is not None:
+            rankings.append([store_id for store_id, _ in lexical.search(query, fetch)])
+
+        out: List[Document] = []
+        for store_id, score in reciprocal_rank_fusion(rankings, k=self.cfg.rrf_k)[:k]:
+            doc = store.docstore.search(store_id)
+            if isinstance(doc, Document):
+                out.append(Document(
+                    page_content=doc.page_content,
+                    metadata={**(doc.metadata or {}), "retrievalScore": round(score, 6)},
+                ))
+        return out
+
+    def embed_query(self, query: str) -> List[float]:
+        return self.embeddings.embed_query(query)
+
+    async def aembed_query(self, query: str) -> List[float]:
+        """Query embedding through the async client; keeps the event loop free."""
+        return await self.embeddings.aembed_query(query)
+
+    def _vector_ids(self, store, query_vector: Sequence[float], k: int) -> List[str]:
+        """Docstore ids of the k nearest chunks to the query embedding."""
+        vector = np.asarray([query_vector], dtype=np.float32)
+        if getattr(store, "_normalize_L2", False):
+            faiss.normalize_L2(vector)
+        _, indices = store.index.search(vector, k)
+        return [store.index_to_docstore_id[i] for i in indices[0] if i != -1]
+
+# ===============================
+# CLI
+# ===============================
+
+def main() -> None:
+    """
+    Index maintenance:
+
+        python -m app.services.vector_store --migrate-legacy [--index-base DIR]
+
+    --migrate-legacy converts the pickled index.pkl indexes of every model folder
+    under the index root to chunks.bin (see VectorStore.migrate_legacy).
+    """
+    parser = argparse.ArgumentParser(description=main.__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--migrate-legacy", action="store_true", help="convert pickled index.pkl indexes to chunks.bin")
+    parser.add_argument("--index-base", help="index root (default: FAISS_STORE_PATH)")
+    args = parser.parse_args()
+    if not args.migrate_legacy:
+        parser.print_help()
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    base = Path(args.index_base or VectorStoreConfig().index_base)
+    if not base.is_dir():
+        print(f"No index root at {base}")
+        return
+    model_dirs = sorted(p for p in base.iterdir() if p.is_dir())
+    # Any embeddings object will do: migration only rewrites stored chunks and vectors
+    vs = VectorStore(cfg=VectorStoreConfig(index_base=str(base)))
+    for model_dir in model_dirs:
+        print(f"{model_dir.name}: {vs.migrate_legacy(str(model_dir))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,40 @@
+import logging
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+from app.services.question_answering import stream_ask_question
+
+log = logging.getLogger(__name__)
+
+ws_router = APIRouter()
+
+
+@ws_router.websocket("/ws/ask-question")
+async def ask_question_ws(websocket: WebSocket):
+    """
+    Streaming Q&A over a WebSocket.
+
+    Client sends {"question": ..., "documentId": ...} per question; the server replies
+    with the same events as the SSE route ({"event": ..., "data": ...}), ending each
+    answer with "done" or "error". The connection stays open for follow-up questions.
+    """
+    await websocket.accept()
+    try:
+        while True:
+            try:
+                payload = await websocket.receive_json()
+            except ValueError:
+                payload = None
+            if not isinstance(payload, dict):
+                await websocket.send_json({"event": "error", "data": {"status": 400, "detail": "Expected a JSON object."}})
+                continue
+            async for event in stream_ask_question(payload.get("question", ""), payload.get("documentId", "")):
+                await websocket.send_json(event)
+    except WebSocketDisconnect:
+        log.info("WebSocket client disconnected.")
+    except Exception as e:
+        log.exception("WebSocket Q&A failed")
+        try:
+            await websocket.send_json({"event": "error", "data": {"status": 500, "detail": str(e)}})
+            await websocket.close(code=1011)
+        except Exception:
+            pass
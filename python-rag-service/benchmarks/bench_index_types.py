@@ -0,0 +1,110 @@
+"""
+Recall vs latency of the ANN index types against exact (flat) search.
+
+Runs on synthetic clustered vectors (embedding-like: many topics, noisy members)
+or on a saved document index:
+
+    python -m benchmarks.bench_index_types --n 100000 --dim 256
+    python -m benchmarks.bench_index_types --index faiss_index/<model>/doc_<id>/index.faiss
+
+Prints build time, per-query latency (mean / p95, one query per call)
+and recall@k for Flat, HNSW (efSearch sweep), IVF-Flat and IVF-PQ (nprobe sweep).
+"""
+import argparse
+import time
+from typing import Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from app.services.faiss_index import apply_search_params, build_index, ivf_nlist, pq_subquantizers
+
+
+def clustered_vectors(n: int, dim: int, clusters: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim), dtype=np.float32)
+    labels = rng.integers(0, clusters, size=n)
+    x = centers[labels] + 0.35 * rng.standard_normal((n, dim), dtype=np.float32)
+    return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+def timed_search(index, queries: np.ndarray, k: int) -> Tuple[np.ndarray, List[float]]:
+    results, latencies = [], []
+    for q in queries:
+        t0 = time.perf_counter()
+        _, ids = index.search(q[None, :], k)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        results.append(ids[0])
+    return np.stack(results), latencies
+
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+
+def run(x: np.ndarray, queries: np.ndarray, k: int, threads: int = 1) -> List[Dict[str, object]]:
+    n, dim = x.shape
+    nlist = ivf_nlist(n)
+    m = pq_subquantizers(dim) or 8
+    configs = [("Flat", [None])]
+    configs.append(("HNSW32", [16, 32, 64, 128]))
+    if nlist >= 2:
+        configs.append((f"IVF{nlist},Flat", [1, 8, 16, 64]))
+        if n >= 256 * 39:
+            configs.append((f"IVF{nlist},PQ{m}", [1, 8, 16, 64]))
+
+    build_threads = faiss.omp_get_max_threads()
+    truth = None
+    rows = []
+    for spec, knobs in configs:
+        faiss.omp_set_num_threads(build_threads)
+        t0 = time.perf_counter()
+        index = build_index(x, spec)
+        build_s = time.perf_counter() - t0
+        faiss.omp_set_num_threads(threads)
+        for knob in knobs:
+            if knob is not None:
+                apply_search_params(index, nprobe=knob, ef_search=knob)
+            found, lat = timed_search(index, queries, k)
+            if truth is None:
+                truth = found
+            rows.append({
+                "index": spec,
+                "param": "-" if knob is None else (f"efSearch={knob}" if spec.startswith("HNSW") else f"nprobe={knob}"),
+                "build_s": build_s,
+                "mean_ms": float(np.mean(lat)),
+                "p95_ms": float(np.percentile(lat, 95)),
+                f"recall@{k}": recall_at_k(found, truth),
+            })
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--n", type=int, default=50_000)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--clusters", type=int, default=200)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--index", help="benchmark the vectors of an existing index.faiss instead")
+    parser.add_argument("--threads", type=int, default=1, help="OpenMP threads while searching")
+    args = parser.parse_args()
+
+    if args.index:
+        stored = faiss.read_index(args.index)
+        x = stored.reconstruct_n(0, stored.ntotal)
+    else:
+        x = clustered_vectors(args.n + args.queries, args.dim, args.clusters)
+    x, queries = x[args.queries:], x[: args.queries]
+    print(f"n={len(x)} dim={x.shape[1]} queries={len(queries)} k={args.k}")
+
+    rows = run(x, queries, args.k, args.threads)
+    header = ["index", "param", "build_s", "mean_ms", "p95_ms", f"recall@{args.k}"]
+    print("  ".join(f"{h:>16}" for h in header))
+    for row in rows:
+        print("  ".join(f"{row[h]:>16.3f}" if isinstance(row[h], float) else f"{row[h]:>16}" for h in header))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+Boundary agreement and embedding cost: hierarchical semantic chunking vs SemanticChunker.
+
+Runs on a synthetic document (topic segments with known boundaries, embedded with
+a hashed bag-of-words model, no network) or on a text file with the configured
+embedding backend:
+
+    python -m benchmarks.bench_semantic_chunking --sentences 2000
+    python -m benchmarks.bench_semantic_chunking --file doc.txt --backend
+
+Prints texts embedded, wall time, chunk count and boundary F1 against the
+SemanticChunker boundaries (exact and within +/- tolerance sentences) and,
+for synthetic input, against the true topic boundaries.
+"""
+import argparse
+import time
+import zlib
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_experimental.text_splitter import SemanticChunker
+
+from app.services.semantic_chunking import HierarchicalSemanticChunker, split_sentences
+from app.services.utils.token_counter import get_token_counter
+
+
+class HashedBowEmbeddings(Embeddings):
+    """Bag of words hashed into `dim` buckets; topic vocabularies make topics separable."""
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        out = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in text.lower().split():
+                out[row, zlib.crc32(word.strip(".").encode()) % self.dim] += 1.0
+        return out.tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+class CountingEmbeddings(Embeddings):
+    def __init__(self, inner: Embeddings):
+        self.inner = inner
+        self.texts = 0
+        self.calls = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += 1
+        self.texts += len(texts)
+        return self.inner.embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed_documents([text])[0]
+
+
+def synthetic_document(sentences: int, topics: int, seed: int = 0):
+    """Text plus the indices of the last sentence of each topic segment."""
+    rng = np.random.default_rng(seed)
+    common = [f"w{i}" for i in range(300)]
+    vocab = [[f"t{t}x{i}" for i in range(60)] for t in range(topics)]
+    out: List[str] = []
+    truth: Set[int] = set()
+    topic = 0
+    while len(out) < sentences:
+        topic = (topic + int(rng.integers(1, topics))) % topics
+        for _ in range(int(rng.integers(8, 40))):
+            n = int(rng.integers(8, 22))
+            words = [vocab[topic][i] if rng.random() < 0.5 else common[j]
+                     for i, j in zip(rng.integers(0, 60, n), rng.integers(0, 300, n))]
+            out.append(" ".join(words).capitalize() + ".")
+        truth.add(len(out) - 1)
+    truth.discard(len(out) - 1)
+    return " ".join(out), truth
+
+
+def boundaries_of(chunks: List[str]) -> Set[int]:
+    ends, pos = set(), -1
+    for chunk in chunks[:-1]:
+        pos += len(split_sentences(chunk))
+        ends.add(pos)
+    return ends
+
+
+def f1(found: Set[int], reference: Set[int], tolerance: int) -> float:
+    if not found and not reference:
+        return 1.0
+    hit_ref = sum(1 for r in reference if any(abs(r - f) <= tolerance for f in found))
+    hit_found = sum(1 for f in found if any(abs(r - f) <= tolerance for r in reference))
+    recall = hit_ref / len(reference) if reference else 1.0
+    precision = hit_found / len(found) if found else 1.0
+    return 0.0 if precision + recall == 0 else 2 * precision * recall / (precision + recall)
+
+
+def run(text: str, embeddings: Embeddings, windows: List[int], refine: List[int], tolerance: int,
+        truth: Optional[Set[int]] = None, amount: float = 95) -> List[Dict[str, object]]:
+    counter = get_token_counter("cl100k_base")
+    rows = []
+
+    counting = CountingEmbeddings(embeddings)
+    t0 = time.perf_counter()
+    base_chunks = SemanticChunker(counting, breakpoint_threshold_amount=amount).split_text(text)
+    base_s = time.perf_counter() - t0
+    reference = boundaries_of(base_chunks)
+    base_texts = counting.texts
+
+    def row(name, chunks, embedded, seconds):
+        found = boundaries_of(chunks)
+        r = {"strategy": name, "embedded": embedded, "x_fewer": base_texts / max(embedded, 1),
+             "seconds": seconds, "chunks": len(chunks), "F1@0": f1(found, reference, 0),
+             f"F1@{tolerance}": f1(found, reference, tolerance)}
+        if truth is not None:
+            r[f"truthF1@{tolerance}"] = f1(found, truth, tolerance)
+        return r
+
+    rows.append(row("sentence", base_chunks, base_texts, base_s))
+    for window in windows:
+        for r in refine:
+            chunker = HierarchicalSemanticChunker(
+                CountingEmbeddings(embeddings), counter.count_many,
+                breakpoint_amount=amount, window_tokens=window, refine_sentences=r,
+            )
+            t0 = time.perf_counter()
+            chunks = chunker.split_text(text)
+            rows.append(row(f"hier w={window} r={r}", chunks, chunker.embedded, time.perf_counter() - t0))
+    return rows
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sentences", type=int, default=2000)
+    parser.add_argument("--topics", type=int, default=12)
+    parser.add_argument("--file", help="chunk this text file instead of a synthetic document")
+    parser.add_argument("--backend", action="store_true", help="use the configured embedding backend (EMBEDDING_BACKEND)")
+    parser.add_argument("--windows", type=int, nargs="+", default=[96, 192, 384])
+    parser.add_argument("--refine", type=int, nargs="+", default=[0, 2])
+    parser.add_argument("--tolerance", type=int, default=3, help="sentences a boundary may be off by")
+    args = parser.parse_args()
+
+    truth = None
+    if args.file:
+        with open(args.file, encoding="utf-8") as f:
+            text = f.read()
+    else:
+        text, truth = synthetic_document(args.sentences, args.topics)
+
+    if args.backend:
+        from app.services.embedding_backends import backend_embeddings, default_embedding_model
+        embeddings = backend_embeddings(default_embedding_model())
+    else:
+        embeddings = HashedBowEmbeddings()
+
+    print(f"sentences={len(split_sentences(text))} tolerance={args.tolerance}")
+    rows = run(text, embeddings, args.windows, args.refine, args.tolerance, truth)
+    header = list(rows[0])
+    print("  ".join(f"{h:>14}" for h in header))
+    for row in rows:
+        print("  ".join(f"{row[h]:>14.3f}" if isinstance(row[h], float) else f"{row[h]:>14}" for h in header))
+
+
+if __name__ == "__main__":
+    main()
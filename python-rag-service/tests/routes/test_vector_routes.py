@@ -0,0 +1,51 @@
+import asyncio
+from types import SimpleNamespace
+
+from fastapi import FastAPI
+
+import app.routes.vector as vector
+
+
+class FakeProcessor:
+    instances = 0
+
+    def __init__(self):
+        FakeProcessor.instances += 1
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+    async def ingest(self, source, doc_id, filename=None, **kwargs):
+        return {"status": "success", "doc_id": doc_id, "filename": filename}
+
+
+def test_processor_lives_inside_the_lifespan(monkeypatch, tmp_path):
+    monkeypatch.setattr(vector, "SmartDocumentProcessor", FakeProcessor)
+    monkeypatch.setattr(vector, "UPLOAD_FOLDER", str(tmp_path))
+    (tmp_path / "a.pdf").write_bytes(b"%PDF%")
+    app = FastAPI()
+    request = SimpleNamespace(app=app)
+    FakeProcessor.instances = 0
+
+    async def run():
+        async with vector.ingest_lifespan(app):
+            assert FakeProcessor.instances == 1
+            processor = vector._processor(request)
+            res = await vector.generate_embeddings_route(
+                vector.EmbeddingInput(path="a.pdf", id="D1", filename="a.pdf"), processor=processor
+            )
+            assert res == {"status": "success", "doc_id": "D1", "filename": "a.pdf"}
+
+            queue = vector._ingest_queue(request)
+            job = await vector.generate_embeddings_batch_route(
+                vector.BatchEmbeddingInput(items=[{"path": "missing.pdf", "id": "D2"}]), ingest_queue=queue
+            )
+            assert (await vector.get_ingest_job(job["job_id"], ingest_queue=queue))["status"] == "completed_with_errors"
+            assert queue.running
+        return queue, processor
+
+    queue, processor = asyncio.run(run())
+    assert FakeProcessor.instances == 1
+    assert not queue.running
+    assert processor.closed
@@ -0,0 +1,70 @@
+from app.services.answer_cache import AnswerCache, AnswerCacheConfig, normalize_question
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+    def __call__(self):
+        return self.now
+
+
+def make_cache(**kw):
+    clock = FakeClock()
+    cfg = AnswerCacheConfig(**{"enabled": True, "max_entries": 8, "ttl_s": 60, "similarity_threshold": 0.9, **kw})
+    return AnswerCache(cfg, clock=clock), clock
+
+
+def test_normalize_question():
+    assert normalize_question("  What is the TOTAL amount?? ") == "what is the total amount"
+
+def test_exact_hit_is_keyed_by_document_and_version():
+    cache, _ = make_cache()
+    cache.put("D1", (1, 1), "Total amount?", {"a": 1})
+
+    assert cache.get("D1", (1, 1), "total   amount") == {"a": 1}
+    assert cache.get("D1", (2, 1), "total amount") is None
+    assert cache.get("D2", (1, 1), "total amount") is None
+    assert cache.get("D1", None, "total amount") is None
+
+def test_near_duplicate_match_above_threshold():
+    cache, _ = make_cache()
+    cache.put("D1", 1, "What is the total amount?", "9.800,96€", vector=[1.0, 0.0, 0.0])
+
+    assert cache.get("D1", 1, "How much in total?", vector=[0.98, 0.1, 0.0]) == "9.800,96€"
+    assert cache.get("D1", 1, "Who is the landlord?", vector=[0.0, 1.0, 0.0]) is None
+    assert cache.stats()["semantic_hits"] == 1
+
+def test_ttl_and_lru_eviction():
+    cache, clock = make_cache(max_entries=2, ttl_s=10)
+    cache.put("D1", 1, "a", 1)
+    cache.put("D1", 1, "b", 2)
+    cache.get("D1", 1, "a")           # a becomes most recent
+    cache.put("D1", 1, "c", 3)        # evicts b
+
+    assert cache.get("D1", 1, "b") is None
+    assert cache.get("D1", 1, "a") == 1
+
+    clock.now = 11
+    assert cache.get("D1", 1, "a") is None
+    assert cache.stats()["entries"] == 1  # expired "a" dropped on access
+
+def test_invalidate_drops_only_that_document():
+    cache, _ = make_cache()
+    cache.put("D1", 1, "q", 1)
+    cache.put("D2", 1, "q", 2)
+    cache.invalidate("D1")
+
+    assert cache.get("D1", 1, "q") is None
+    assert cache.get("D2", 1, "q") == 2
+
+def test_probe_then_vector_lookup_counts_each_question_once():
+    cache, _ = make_cache()
+    cache.put("D1", 1, "What is the total amount?", "9.800,96€", vector=[1.0, 0.0, 0.0])
+
+    for question, vector in [("How much in total?", [0.98, 0.1, 0.0]), ("Who is the landlord?", [0.0, 1.0, 0.0])]:
+        assert cache.get("D1", 1, question, count_miss=False) is None
+        cache.get("D1", 1, question, vector=vector)
+    assert cache.get("D1", 1, "what is the total amount", count_miss=False) == "9.800,96€"
+
+    stats = cache.stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
@@ -0,0 +1,127 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.services.chunk_store import (
+    CHUNKS_FILE,
+    LINE_RECTS_KEY,
+    RECTS_FILE,
+    ChunkDocstore,
+    ChunkIdMap,
+    ChunkStore,
+    RectStore,
+    normalize_metadata,
+    pack_rects,
+    split_line_rects,
+    write_chunks,
+    write_rects,
+)
+
+
+def _docs():
+    return [
+        Document(page_content="Miete 1.200,00 €", metadata={"documentId": "D", "pageNumber": 1, "chunkId": "D-1", "bbox": [1, 2, 3, 4]}),
+        Document(page_content="§ 5 Kündigung – ünïcödé", metadata={"documentId": "D", "pageNumber": 2, "chunkId": "D-2", "flag": True}),
+        Document(page_content="", metadata={"documentId": "D", "pageNumber": 2, "chunkId": "D-3"}),
+    ]
+
+
+@pytest.fixture
+def chunks(tmp_path):
+    path = tmp_path / CHUNKS_FILE
+    write_chunks(path, ["id-b", "id-a", "id-c"], _docs())
+    return ChunkStore.open(path)
+
+
+def test_roundtrip_preserves_text_and_metadata(chunks):
+    assert len(chunks) == 3
+    for pos, doc in enumerate(_docs()):
+        got = chunks.document(pos)
+        assert got.page_content == doc.page_content
+        assert got.metadata == doc.metadata
+        assert list(got.metadata) == list(doc.metadata)  # key order kept
+    assert chunks.metadata(1)["flag"] is True
+    assert isinstance(chunks.metadata(0)["pageNumber"], int)
+
+
+def test_scalar_metadata_is_stored_in_columns(chunks):
+    assert chunks._columns["documentId"] == {"type": "dict", "values": ["D"]}
+    assert chunks._columns["pageNumber"] == {"type": "int"}
+    assert "bbox" not in chunks._columns and "flag" not in chunks._columns
+
+
+def test_ids_map_both_ways(chunks):
+    assert [chunks.id_at(i) for i in range(3)] == ["id-b", "id-a", "id-c"]
+    assert chunks.position("id-a") == 1
+    assert chunks.position("id-c") == 2
+    assert chunks.position("id-") is None
+    assert chunks.position("id-zzzzzzzz") is None
+    with pytest.raises(KeyError):
+        chunks.id_at(3)
+
+
+def test_docstore_and_id_map_views(chunks):
+    docstore = ChunkDocstore(chunks)
+    mapping = ChunkIdMap(chunks)
+
+    assert mapping[2] == "id-c" and len(mapping) == 3
+    assert docstore.search("id-a").metadata["chunkId"] == "D-2"
+    assert docstore.search("missing") == "ID missing not found."
+    assert sorted(d.metadata["chunkId"] for d in docstore._dict.values()) == ["D-1", "D-2", "D-3"]
+
+
+def test_tuple_numpy_and_date_metadata_round_trip_normalized(tmp_path):
+    import datetime
+
+    meta = {
+        "documentId": "D", "pageNumber": np.int64(3), "bbox": (1.5, 2, 3, 4),
+        "score": np.float32(0.5), "vec": np.arange(2), "ingestedAt": datetime.date(2024, 5, 1),
+    }
+    path = tmp_path / CHUNKS_FILE
+    write_chunks(path, ["a"], [Document(page_content="x", metadata=meta)])
+
+    got = ChunkStore.open(path).metadata(0)
+    assert got == normalize_metadata(meta) == {
+        "documentId": "D", "pageNumber": 3, "bbox": [1.5, 2, 3, 4],
+        "score": 0.5, "vec": [0, 1], "ingestedAt": "2024-05-01",
+    }
+    assert normalize_metadata({LINE_RECTS_KEY: b"\x00" * 16}) == {LINE_RECTS_KEY: b"\x00" * 16}
+
+
+def test_empty_store(tmp_path):
+    path = tmp_path / CHUNKS_FILE
+    write_chunks(path, [], [])
+    empty = ChunkStore.open(path)
+    assert len(empty) == 0 and empty.position("x") is None
+
+
+def test_rejects_foreign_file(tmp_path):
+    path = tmp_path / CHUNKS_FILE
+    path.write_bytes(b"not a chunk store at all")
+    with pytest.raises(ValueError):
+        ChunkStore.open(path)
+
+
+def test_line_rects_are_split_off_and_round_trip(tmp_path):
+    docs = _docs()
+    docs[0].metadata[LINE_RECTS_KEY] = pack_rects([[1, 2, 3, 4], [5, 6, 7, 8]])
+    docs[2].metadata[LINE_RECTS_KEY] = pack_rects([[9, 9, 9, 9]])
+
+    plain, rects = split_line_rects(docs)
+    assert all(LINE_RECTS_KEY not in d.metadata for d in plain)
+    assert split_line_rects(plain) == (plain, None)
+
+    write_rects(tmp_path / RECTS_FILE, rects)
+    store = RectStore.open(tmp_path / RECTS_FILE)
+    assert len(store) == 3
+    assert store.rects(0).tolist() == [[1, 2, 3, 4], [5, 6, 7, 8]]
+    assert store.rects(1).shape == (0, 4) and store.raw(1) == b""
+    assert store.raw(2) == docs[2].metadata[LINE_RECTS_KEY]
+    assert store.rects(2).dtype == np.float32
+
+
+def test_rect_store_rejects_foreign_file(tmp_path):
+    path = tmp_path / RECTS_FILE
+    path.write_bytes(b"not a rects file at all")
+    with pytest.raises(ValueError):
+        RectStore.open(path)
@@ -146,3 +146,26 @@ def test_split_pdf_pages_fallback_to_text(splitter):
 
 
 
+
+def test_span_chunks_follow_token_budget_and_union_bboxes(splitter_with_small_chunks):
+    """Span runs fill rec_chunk_size; an oversized line stands alone; bboxes are unions."""
+    from app.services.utils.spans import SpanArrays
+
+    splitter_with_small_chunks.cfg.rec_chunk_size = 30
+    lines = [f"line number {i} with a few extra words" for i in range(12)]
+    lines.insert(5, " ".join(["oversized"] * 60))
+    spans = SpanArrays.from_lines(lines, [10.0 + i for i in range(13)], [700.0 - 12 * i for i in range(13)], [100.0] * 13, [10.0] * 13)
+
+    chunks = splitter_with_small_chunks._chunk_by_spans(spans, "doc-arr", page_number=2)
+
+    assert "\n".join(c.page_content for c in chunks) == "\n".join(lines)
+    assert all(c.metadata["tokenCount"] <= 30 for c in chunks if "oversized" not in c.page_content)
+    assert [c.page_content for c in chunks if "oversized" in c.page_content] == [lines[5]]
+    first = chunks[0]
+    n = first.page_content.count("\n") + 1
+    assert first.metadata["bbox"] == {
+        "x": 10.0, "y": 700.0 - 12 * (n - 1), "width": 100.0 + (n - 1), "height": 12.0 * (n - 1) + 10.0, "page": 2,
+    }
+    # list-of-dicts input gives the same chunks
+    legacy = splitter_with_small_chunks._chunk_by_spans(spans.to_dicts(), "doc-arr", page_number=2)
+    assert [c.metadata for c in legacy] == [c.metadata for c in chunks]
@@ -0,0 +1,146 @@
+import asyncio
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from app.services.clients import ClientConfig, ClientRegistry, get_registry, lifespan, set_registry
+
+
+# ---------- Stub OpenAI-compatible server ----------
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        self.server.peers.add(self.client_address)
+        self.server.paths.append(self.path)
+        if self.path.endswith("/embeddings"):
+            inputs = body["input"] if isinstance(body["input"], list) else [body["input"]]
+            payload = {
+                "object": "list",
+                "model": body["model"],
+                "data": [{"object": "embedding", "index": i, "embedding": [0.1, 0.2, 0.3]} for i in range(len(inputs))],
+                "usage": {"prompt_tokens": 1, "total_tokens": 1},
+            }
+        else:
+            payload = {
+                "id": "cmpl-1",
+                "object": "text_completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{"index": 0, "text": '{"contextAnswer": "ok"}', "finish_reason": "stop", "logprobs": None}],
+                "usage": {"prompt_tokens": 1, "completion_tokens": 1, "total_tokens": 2},
+            }
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    server.peers, server.paths = set(), []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def registry(stub_server, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "test-key")
+    host, port = stub_server.server_address
+    reg = ClientRegistry(ClientConfig(base_url=f"http://{host}:{port}/v1", max_retries=0))
+    yield reg
+    reg.close()
+
+
+# ---------- Tests ----------
+
+def test_embeddings_client_is_shared_and_reuses_connection(registry, stub_server):
+    emb = registry.embeddings("text-embedding-3-small")
+    assert registry.embeddings("text-embedding-3-small") is emb
+    assert registry.embeddings("text-embedding-3-large") is not emb
+
+    for _ in range(3):
+        assert emb.embed_documents(["a", "b"]) == [[0.1, 0.2, 0.3]] * 2
+    registry.embeddings("text-embedding-3-large").embed_query("q")
+
+    assert all(p.endswith("/embeddings") for p in stub_server.paths)
+    assert len(stub_server.paths) == 4
+    assert len(stub_server.peers) == 1  # one keep-alive connection for all calls
+
+def test_llm_client_is_shared_per_parameters(registry, stub_server):
+    llm = registry.llm(temperature=0.3, max_tokens=600)
+    assert registry.llm(temperature=0.3, max_tokens=600) is llm
+    assert registry.llm(temperature=0.0, max_tokens=600) is not llm
+
+    async def ask():
+        return [await llm.ainvoke("hi") for _ in range(2)]
+
+    assert asyncio.run(ask()) == ['{"contextAnswer": "ok"}'] * 2
+    assert stub_server.paths == ["/v1/completions"] * 2
+
+def test_pool_limits_come_from_config():
+    reg = ClientRegistry(ClientConfig(max_connections=3, max_keepalive=2, http2=False))
+    pool = reg.http_client._transport._pool
+    assert pool._max_connections == 3 and pool._max_keepalive_connections == 2
+    assert reg.http_client is reg.http_client
+    reg.close()
+
+def test_lifespan_creates_and_closes_registry():
+    set_registry(None)
+
+    class App:
+        class state:
+            pass
+
+    async def run():
+        async with lifespan(App):
+            reg = App.state.clients
+            assert get_registry() is reg
+            reg.http_client
+        return reg
+
+    reg = asyncio.run(run())
+    assert reg._http is None
+    assert get_registry() is not reg
+    set_registry(None)
+
+
+def test_aclose_runs_blocking_close_off_the_event_loop(monkeypatch):
+    reg = ClientRegistry(ClientConfig(http2=False))
+    closed_in = []
+
+    def slow_close():
+        time.sleep(0.2)  # e.g. a scheduler finishing an in-flight batch
+        closed_in.append(threading.get_ident())
+
+    monkeypatch.setattr(reg, "close", slow_close)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while not closed_in:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        await asyncio.gather(reg.aclose(), ticker())
+        return threading.get_ident(), ticks
+
+    loop_thread, ticks = asyncio.run(run())
+    assert closed_in and closed_in[0] != loop_thread
+    assert ticks > 5
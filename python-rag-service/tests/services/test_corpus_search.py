@@ -0,0 +1,128 @@
+from typing import List
+
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
+
+TOPICS = ["miete", "gehalt", "steuer", "auto"]
+
+# ---------- Fakes ----------
+
+class TopicEmbeddings(Embeddings):
+    """4-dim embeddings: one axis per topic word, so similarity follows the topic."""
+    def __init__(self):
+        self.queries: List[str] = []
+    def _vec(self, text: str) -> List[float]:
+        words = text.lower().split()
+        return [float(words.count(t)) + 0.01 for t in TOPICS]
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return [self._vec(t) for t in texts]
+    def embed_query(self, text: str) -> List[float]:
+        self.queries.append(text)
+        return self._vec(text)
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    import app.services.vector_store as mod
+    from langchain_community.vectorstores import FAISS
+    from app.services.corpus_search import CorpusSearch, CorpusSearchConfig
+    monkeypatch.setattr(mod, "FAISS", FAISS)
+    cfg = mod.VectorStoreConfig(index_base=str(tmp_path / "faiss_root"))
+    vs = mod.VectorStore(embedding_model="topic-emb", embeddings=TopicEmbeddings(), cfg=cfg)
+
+    def add(doc_id: str, topic: str, n: int = 3):
+        vs.save_to_faiss([
+            Document(
+                page_content=f"{topic} " * (i + 1) + f"absatz {i}",
+                metadata={"documentId": doc_id, "chunkId": f"{doc_id}-{i}", "pageNumber": 1},
+            )
+            for i in range(n)
+        ])
+
+    add("rent", "miete")
+    add("salary", "gehalt")
+    add("tax", "steuer")
+    search = CorpusSearch(vs, CorpusSearchConfig(route_docs=1, per_doc_k=2, workers=2))
+    yield vs, search, add
+    search.close()
+    mod.remove_invalidation_listener(search.router.invalidate)
+
+# ---------- Tests ----------
+
+def test_save_writes_unit_centroid(corpus):
+    vs, _, _ = corpus
+    centroid = np.load(vs._doc_dir("rent") / "centroid.npy")
+    assert centroid.shape == (4,)
+    assert np.isclose(np.linalg.norm(centroid), 1.0)
+    assert int(np.argmax(centroid)) == TOPICS.index("miete")
+
+def test_router_picks_documents_by_centroid(corpus):
+    vs, search, _ = corpus
+    q = vs.embed_query("steuer")
+    assert search.router.route(q, 1) == ["tax"]
+    assert search.router.route(q, 10)[0] == "tax"
+    assert sorted(search.router.document_ids()) == ["rent", "salary", "tax"]
+
+def test_search_embeds_once_and_only_searches_routed_documents(corpus):
+    vs, search, _ = corpus
+    vs.embeddings.queries.clear()
+
+    results = search.search("miete", k=5)
+
+    assert vs.embeddings.queries == ["miete"]
+    assert results and {d.metadata["documentId"] for d in results} == {"rent"}
+    assert len(results) == 3  # every chunk of the single routed document (k > per_doc_k)
+    distances = [d.metadata["distance"] for d in results]
+    assert distances == sorted(distances)
+
+def test_document_filter_bypasses_routing_and_merges_by_distance(corpus):
+    _, search, _ = corpus
+    results = search.search("gehalt", k=3, document_ids=["rent", "salary", "missing"])
+
+    assert len(results) == 3
+    assert results[0].metadata["documentId"] == "salary"
+    assert {d.metadata["documentId"] for d in results} <= {"rent", "salary"}
+    distances = [d.metadata["distance"] for d in results]
+    assert distances == sorted(distances)
+
+def test_router_sees_new_documents_and_ignores_temp_dirs(corpus):
+    vs, search, add = corpus
+    assert search.router.route(vs.embed_query("auto"), 3)  # warm the matrix
+    (vs.model_base_dir / ".tmp_doc_x_1").mkdir()
+
+    add("car", "auto")
+
+    assert search.router.route(vs.embed_query("auto"), 1) == ["car"]
+    assert "car" in search.router.document_ids()
+
+def test_legacy_index_without_centroid_is_routed(corpus):
+    vs, search, _ = corpus
+    (vs._doc_dir("tax") / "centroid.npy").unlink()
+    search.router.invalidate("tax")
+
+    assert search.router.route(vs.embed_query("steuer"), 1) == ["tax"]
+
+def test_single_document_filter_returns_k_beyond_per_doc_k(corpus):
+    vs, search, add = corpus
+    add("long", "miete", n=6)
+
+    results = search.search("miete", k=5, document_ids=["long"])
+
+    assert len(results) == 5 > search.cfg.per_doc_k
+    assert {d.metadata["documentId"] for d in results} == {"long"}
+
+def test_failing_document_index_is_skipped(corpus, monkeypatch):
+    vs, search, _ = corpus
+    real = vs.load_faiss_store
+
+    def load(doc_id, **kw):
+        if doc_id == "rent":
+            raise RuntimeError("corrupt index")
+        return real(doc_id, **kw)
+
+    monkeypatch.setattr(vs, "load_faiss_store", load)
+    results = search.search("gehalt", k=3, document_ids=["rent", "salary"])
+
+    assert results and {d.metadata["documentId"] for d in results} == {"salary"}
@@ -0,0 +1,100 @@
+import numpy as np
+import pytest
+from langchain_core.documents import Document
+
+from app.services.clients import ClientRegistry, set_registry
+from app.services.embedding_backends import (
+    EmbeddingBackendConfig,
+    LocalEmbeddings,
+    backend_embeddings,
+    default_embedding_model,
+    mean_pool,
+)
+from app.services.embedding_scheduler import EmbeddingScheduler
+
+
+class FakeEncoder:
+    """Vector = [len(text), 1] normalized; records each forward pass."""
+
+    def __init__(self):
+        self.passes = []
+
+    def encode(self, texts):
+        self.passes.append(list(texts))
+        x = np.array([[len(t), 1.0] for t in texts], dtype=np.float32)
+        return x / np.linalg.norm(x, axis=1, keepdims=True)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    encoders = []
+
+    def load(self):
+        if self._encoder is None:
+            self._encoder = FakeEncoder()
+            encoders.append(self._encoder)
+        return self._encoder
+
+    monkeypatch.setattr(LocalEmbeddings, "_load", load)
+    reg = ClientRegistry()
+    set_registry(reg)
+    reg.encoders = encoders
+    yield reg
+    reg.close()
+    set_registry(None)
+
+
+def test_mean_pool_ignores_padding_and_normalizes():
+    hidden = np.array([[[1.0, 0.0], [3.0, 0.0], [100.0, 100.0]]], dtype=np.float32)
+    mask = np.array([[1, 1, 0]])
+
+    out = mean_pool(hidden, mask)
+    assert out.tolist() == [[1.0, 0.0]]
+    assert mean_pool(hidden, mask, normalize=False).tolist() == [[2.0, 0.0]]
+
+
+def test_local_embeddings_batch_by_length_and_keep_order():
+    encoder = FakeEncoder()
+    emb = LocalEmbeddings("mini", cfg=EmbeddingBackendConfig(batch_size=2), encoder=encoder)
+    texts = ["aaaa", "a", "aaa", "aa", "aaaaa"]
+
+    vectors = emb.embed_documents(texts)
+
+    assert encoder.passes == [["a", "aa"], ["aaa", "aaaa"], ["aaaaa"]]
+    assert vectors == encoder.encode(texts).tolist()
+    assert emb.embed_query("aa") == pytest.approx(vectors[3])
+    assert emb.model == "local/mini" and emb.model_path == "mini"
+
+
+def test_default_model_is_namespaced_by_backend(monkeypatch):
+    monkeypatch.setenv("EMBEDDING_MODEL", "text-embedding-3-small")
+    assert default_embedding_model(cfg=EmbeddingBackendConfig(backend="openai")) == "text-embedding-3-small"
+    assert default_embedding_model(cfg=EmbeddingBackendConfig(backend="local", local_model="minilm")) == "local/minilm"
+    with pytest.raises(ValueError):
+        default_embedding_model(cfg=EmbeddingBackendConfig(backend="bogus"))
+
+
+def test_backend_embeddings_dispatch_on_model_name(registry):
+    local = backend_embeddings("local/minilm")
+    assert isinstance(local, EmbeddingScheduler)
+    assert isinstance(local.embeddings, LocalEmbeddings)
+    assert local.cfg.rpm == 0 and local.cfg.tpm == 0 and local.cfg.concurrency == 1
+    assert local is backend_embeddings("local/minilm")
+
+    assert local.embed_query("abc") == pytest.approx((np.array([3.0, 1.0]) / np.sqrt(10)).tolist())
+    assert registry.encoders[0].passes == [["abc"]]
+
+    remote = backend_embeddings("text-embedding-3-small", factory=lambda **kw: LocalEmbeddings("stub"))
+    assert remote is not local
+
+
+def test_vector_store_keeps_backends_apart(registry, tmp_path):
+    from app.services.vector_store import VectorStore, VectorStoreConfig
+
+    cfg = VectorStoreConfig(index_base=str(tmp_path))
+    local_store = VectorStore(embedding_model="local/minilm", cfg=cfg)
+    local_store.save_to_faiss([Document(page_content="hello", metadata={"documentId": "D", "chunkId": "D-1"})])
+
+    assert local_store.model_base_dir == tmp_path / "local_minilm"
+    assert (local_store.model_base_dir / "doc_D").is_dir()
+    assert not (tmp_path / "text-embedding-3-large").exists()
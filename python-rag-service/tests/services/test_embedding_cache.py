@@ -0,0 +1,58 @@
+from typing import List
+
+from app.services.embedding_cache import CachedEmbeddings, content_hash
+
+# ---------- Fakes ----------
+
+class CountingEmbeddings:
+    def __init__(self):
+        self.calls: List[List[str]] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls.append(list(texts))
+        return [[float(len(t)), 1.0] for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        return [float(len(text)), 0.0]
+
+# ---------- Tests ----------
+
+def test_content_hash_ignores_whitespace():
+    assert content_hash("Alpha   beta\n") == content_hash("Alpha beta")
+    assert content_hash("Alpha beta") != content_hash("Alpha gamma")
+
+
+def test_only_missing_texts_are_embedded(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, model="m", path=str(tmp_path / "emb.sqlite3"))
+
+    first = cache.embed_documents(["one", "two"])
+    second = cache.embed_documents(["two", "three", "one"])
+
+    assert inner.calls == [["one", "two"], ["three"]]
+    assert second[0] == first[1]
+    assert second[2] == first[0]
+    assert cache.stats() == {"hits": 2, "misses": 3}
+
+
+def test_duplicates_within_call_embedded_once(tmp_path):
+    inner = CountingEmbeddings()
+    cache = CachedEmbeddings(inner, model="m", path=str(tmp_path / "emb.sqlite3"))
+
+    out = cache.embed_documents(["same", "same  ", "other"])
+
+    assert inner.calls == [["same", "other"]]
+    assert out[0] == out[1]
+
+
+def test_cache_persists_and_is_namespaced_by_model(tmp_path):
+    path = str(tmp_path / "emb.sqlite3")
+    CachedEmbeddings(CountingEmbeddings(), model="m1", path=path).embed_documents(["text"])
+
+    inner_same = CountingEmbeddings()
+    CachedEmbeddings(inner_same, model="m1", path=path).embed_documents(["text"])
+    assert inner_same.calls == []
+
+    inner_other = CountingEmbeddings()
+    CachedEmbeddings(inner_other, model="m2", path=path).embed_documents(["text"])
+    assert inner_other.calls == [["text"]]
@@ -0,0 +1,240 @@
+import threading
+
+import pytest
+from langchain_core.embeddings import Embeddings
+
+from app.services.clients import ClientRegistry
+from app.services.embedding_scheduler import (
+    BULK,
+    QUERY,
+    EmbeddingScheduler,
+    EmbeddingSchedulerConfig,
+    TokenBucket,
+)
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+class WordCounter:
+    def count_many(self, texts):
+        return [len(t.split()) for t in texts]
+
+
+class RecordingEmbeddings(Embeddings):
+    """Vector = [len(text)]; records every batch sent."""
+
+    def __init__(self, fail=None, gate=None):
+        self.batches = []
+        self.fail = fail or (lambda texts, attempt: None)
+        self.gate = gate
+        self._lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        if self.gate is not None:
+            self.gate.wait(timeout=5)
+        with self._lock:
+            self.batches.append(list(texts))
+            attempt = sum(1 for b in self.batches if b == list(texts))
+        err = self.fail(texts, attempt)
+        if err is not None:
+            raise err
+        return [[float(len(t))] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+class StatusError(Exception):
+    def __init__(self, status_code):
+        super().__init__(f"HTTP {status_code}")
+        self.status_code = status_code
+
+
+def make(base, **overrides):
+    params = dict(enabled=True, max_batch_inputs=64, max_batch_tokens=10_000, max_wait_ms=0,
+                  rpm=0, tpm=0, concurrency=2, max_retries=3, backoff_s=0.0)
+    params.update(overrides)
+    return EmbeddingScheduler(base, cfg=EmbeddingSchedulerConfig(**params), counter=WordCounter(), sleep=lambda s: None)
+
+
+def test_results_keep_request_order_across_batches():
+    base = RecordingEmbeddings()
+    sched = make(base, max_batch_inputs=3, concurrency=1)
+    texts = [str(i) * (i + 1) for i in range(7)]
+
+    assert sched.embed_documents(texts) == [[float(i + 1)] for i in range(7)]
+    assert [len(b) for b in base.batches] == [3, 3, 1]
+    sched.close()
+
+
+def test_batches_respect_token_budget():
+    base = RecordingEmbeddings()
+    sched = make(base, max_batch_tokens=5, concurrency=1)
+
+    sched.embed_documents(["a b c", "d e", "f g h i", "j"])
+    # an oversized single text still goes out alone
+    sched.embed_documents(["w " * 9])
+    assert [len(b) for b in base.batches] == [2, 2, 1]
+    assert all(sum(len(t.split()) for t in b) <= 5 for b in base.batches[:2])
+    sched.close()
+
+
+def test_concurrent_callers_are_coalesced():
+    base = RecordingEmbeddings()
+    sched = make(base, max_wait_ms=200, concurrency=1)
+    results = {}
+
+    def call(i):
+        results[i] = sched.embed_documents([f"doc{i}", f"doc{i}!"])
+
+    threads = [threading.Thread(target=call, args=(i,)) for i in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert len(base.batches) < 8
+    for i in range(8):
+        assert results[i] == [[float(len(f"doc{i}"))], [float(len(f"doc{i}!"))]]
+    sched.close()
+
+
+def test_queries_jump_ahead_of_queued_bulk_work():
+    gate = threading.Event()
+    base = RecordingEmbeddings(gate=gate)
+    sched = make(base, max_batch_inputs=1, concurrency=1)
+
+    bulk = sched.submit(["b1", "b2", "b3"], BULK)
+    # b1 is in flight (blocked on the gate); b2/b3 are queued
+    query = sched.submit(["question"], QUERY)
+    gate.set()
+
+    assert query.result(timeout=5) == [[8.0]]
+    assert bulk.result(timeout=5) == [[2.0]] * 3
+    assert base.batches.index(["question"]) < base.batches.index(["b3"])
+    sched.close()
+
+
+def test_only_the_failed_batch_is_retried():
+    base = RecordingEmbeddings(fail=lambda texts, attempt: StatusError(429) if "bad" in texts and attempt == 1 else None)
+    sched = make(base, max_batch_inputs=2, concurrency=1)
+
+    out = sched.embed_documents(["ok1", "ok2", "bad", "ok3"])
+
+    assert out == [[3.0], [3.0], [3.0], [3.0]]
+    assert base.batches.count(["ok1", "ok2"]) == 1
+    assert base.batches.count(["bad", "ok3"]) == 2
+    assert sched.stats["retries"] == 1
+    sched.close()
+
+
+def test_client_errors_fail_only_their_request():
+    base = RecordingEmbeddings(fail=lambda texts, attempt: StatusError(400) if "bad" in texts else None)
+    sched = make(base, max_batch_inputs=1, concurrency=1)
+
+    failing = sched.submit(["bad"])
+    fine = sched.submit(["fine"])
+
+    with pytest.raises(StatusError):
+        failing.result(timeout=5)
+    assert fine.result(timeout=5) == [[4.0]]
+    assert base.batches.count(["bad"]) == 1  # 400 is not retried
+    sched.close()
+
+
+def test_only_transient_errors_are_retried():
+    import httpx
+
+    flaky = RecordingEmbeddings(fail=lambda texts, attempt: httpx.ConnectError("reset") if attempt == 1 else None)
+    sched = make(flaky)
+    assert sched.embed_documents(["x"]) == [[1.0]]
+    assert len(flaky.batches) == 2
+    sched.close()
+
+    broken = RecordingEmbeddings(fail=lambda texts, attempt: ValueError("bad input"))
+    sched = make(broken)
+    with pytest.raises(ValueError):
+        sched.embed_documents(["x"])
+    assert len(broken.batches) == 1
+    sched.close()
+
+
+def test_scheduled_client_has_sdk_retries_disabled():
+    registry = ClientRegistry()
+    made = []
+
+    def factory(**kw):
+        made.append(kw)
+        return RecordingEmbeddings()
+
+    registry.scheduled_embeddings("m", factory=factory)
+    registry.embeddings("m", factory=factory)
+    assert [kw["max_retries"] for kw in made] == [0, registry.cfg.max_retries]
+    registry.close()
+
+
+def test_retries_are_bounded():
+    base = RecordingEmbeddings(fail=lambda texts, attempt: StatusError(503))
+    sched = make(base, max_retries=2)
+
+    with pytest.raises(StatusError):
+        sched.embed_documents(["x"])
+    assert len(base.batches) == 3
+    sched.close()
+
+
+@pytest.mark.anyio
+async def test_async_query_and_documents():
+    sched = make(RecordingEmbeddings())
+    assert await sched.aembed_query("abc") == [3.0]
+    assert await sched.aembed_documents(["a", "bb"]) == [[1.0], [2.0]]
+    assert await sched.aembed_documents([]) == []
+    sched.close()
+
+
+def test_token_bucket_refills_and_pauses():
+    now = [0.0]
+    bucket = TokenBucket(60, clock=lambda: now[0])  # 1 per second
+
+    assert bucket.wait_time(60) == 0
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    now[0] += 2
+    assert bucket.wait_time(2) == 0
+    # requests above capacity wait for a full bucket, then overdraw
+    assert bucket.wait_time(500) == pytest.approx(58.0)
+
+    bucket.pause(10)
+    assert bucket.wait_time(1) == pytest.approx(11.0)
+    assert TokenBucket(0).wait_time(10 ** 9) == 0
+
+
+def test_rate_budget_delays_dispatch():
+    base = RecordingEmbeddings()
+    sched = make(base, rpm=60, max_batch_inputs=1, concurrency=1)
+    sched._requests_bucket._tokens = 0  # budget exhausted: next slot in ~1s
+
+    future = sched.submit(["x"])
+    with pytest.raises(TimeoutError):
+        future.result(timeout=0.3)
+    assert future.result(timeout=3) == [[1.0]]
+    sched.close()
+
+
+def test_registry_shares_one_scheduler_per_model():
+    registry = ClientRegistry()
+    factory = lambda **kw: RecordingEmbeddings()  # noqa: E731
+
+    sched = registry.scheduled_embeddings("m", factory=factory)
+    assert isinstance(sched, EmbeddingScheduler)
+    assert sched is registry.scheduled_embeddings("m", factory=factory)
+    assert sched.embeddings is not registry.embeddings("m", factory=factory)
+    assert registry.scheduled_embeddings("other", factory=factory) is not sched
+
+    assert sched.embed_query("abcd") == [4.0]
+    registry.close()
+    with pytest.raises(RuntimeError):
+        sched.submit(["x"])
@@ -0,0 +1,98 @@
+import faiss
+import numpy as np
+
+from app.services.faiss_index import (
+    FLAT,
+    HNSW,
+    IVF,
+    IVFPQ,
+    apply_search_params,
+    build_index,
+    empty_like,
+    index_kind,
+    ivf_nlist,
+    resolve_index_spec,
+    supports_remove,
+)
+
+
+def _vectors(n: int, dim: int = 16, seed: int = 0) -> np.ndarray:
+    return np.random.default_rng(seed).random((n, dim), dtype=np.float32)
+
+
+def test_auto_picks_type_by_chunk_count():
+    kw = dict(flat_max_chunks=1_000, ivfpq_min_chunks=50_000)
+    assert resolve_index_spec(999, 64, **kw) == "Flat"
+    assert resolve_index_spec(1_000, 64, **kw) == "HNSW32"
+    assert resolve_index_spec(50_000, 64, **kw) == f"IVF{ivf_nlist(50_000)},PQ32"
+
+
+def test_explicit_types_degrade_when_too_small_to_train():
+    assert resolve_index_spec(50, 64, "ivf") == "Flat"
+    assert resolve_index_spec(1_000, 64, "ivf") == f"IVF{ivf_nlist(1_000)},Flat"
+    assert resolve_index_spec(1_000, 64, "ivfpq") == f"IVF{ivf_nlist(1_000)},Flat"
+    assert resolve_index_spec(10, 64, "HNSW16,Flat") == "HNSW16,Flat"  # raw factory string
+
+
+def test_nlist_respects_training_minimum():
+    assert ivf_nlist(1_000_000) == 4_000
+    assert ivf_nlist(1_000) == 1_000 // 39
+
+
+def test_build_kind_and_search_params():
+    x = _vectors(2_000)
+    hnsw = build_index(x, "HNSW16")
+    ivf = build_index(x, "IVF16,Flat")
+    ivfpq = build_index(x, "IVF16,PQ4x4")
+
+    assert [index_kind(i) for i in (faiss.IndexFlatL2(16), hnsw, ivf, ivfpq)] == [FLAT, HNSW, IVF, IVFPQ]
+    assert ivf.is_trained and ivf.ntotal == 2_000
+
+    apply_search_params(hnsw, ef_search=77)
+    apply_search_params(ivf, nprobe=99)
+    assert faiss.downcast_index(hnsw).hnsw.efSearch == 77
+    assert faiss.extract_index_ivf(ivf).nprobe == 16  # capped at nlist
+
+
+def test_empty_like_keeps_training():
+    ivf = build_index(_vectors(2_000), "IVF16,Flat")
+    clone = empty_like(ivf)
+    assert clone.ntotal == 0 and clone.is_trained
+    assert ivf.ntotal == 2_000
+    assert supports_remove(faiss.IndexFlatL2(4)) and not supports_remove(clone)
+
+
+def test_mmap_flat_matches_faiss(tmp_path):
+    from app.services.faiss_index import MmapFlatIndex
+
+    x, q = _vectors(1_000), _vectors(3, seed=1)
+    for exact in (faiss.IndexFlatL2(16), faiss.IndexFlatIP(16)):
+        exact.add(x)
+        path = str(tmp_path / "index.faiss")
+        faiss.write_index(exact, path)
+
+        mapped = MmapFlatIndex.open(path)
+        mapped.block_rows = 300  # exercise the blockwise top-k merge
+        assert (mapped.ntotal, mapped.d, mapped.metric_type) == (exact.ntotal, exact.d, exact.metric_type)
+
+        D1, I1 = exact.search(q, 5)
+        D2, I2 = mapped.search(q, 5)
+        assert (I1 == I2).all() and np.allclose(D1, D2, atol=1e-4)
+        assert (mapped.search(q, 1_005)[1][:, -5:] == -1).all()
+        assert np.array_equal(mapped.reconstruct_n(10, 2), x[10:12])
+
+
+def test_open_index_mmap_by_type(tmp_path):
+    from app.services.faiss_index import MmapFlatIndex, open_index
+
+    flat = faiss.IndexFlatL2(16)
+    flat.add(_vectors(100))
+    ivf = build_index(_vectors(2_000), "IVF16,Flat")
+    faiss.write_index(flat, str(tmp_path / "flat.faiss"))
+    faiss.write_index(ivf, str(tmp_path / "ivf.faiss"))
+
+    assert isinstance(open_index(str(tmp_path / "flat.faiss"), mmap_vectors=True), MmapFlatIndex)
+    assert index_kind(open_index(str(tmp_path / "flat.faiss"))) == FLAT
+    mapped_ivf = open_index(str(tmp_path / "ivf.faiss"), mmap_vectors=True)
+    assert index_kind(mapped_ivf) == IVF and mapped_ivf.ntotal == 2_000
+    assert MmapFlatIndex.open(str(tmp_path / "ivf.faiss")) is None
@@ -14,11 +14,13 @@ class FakeVectorStore:
     def __init__(self, *args, **kwargs):
         self.save_calls = 0
         self.last_saved_docs = None
+        self.last_saved_vectors = None
 
-    def save_to_faiss(self, docs, index_dir=None):
+    def save_to_faiss(self, docs, index_dir=None, vectors=None):
         self.save_calls += 1
         # Keep a copy so tests can assert on it
         self.last_saved_docs = list(docs)
+        self.last_saved_vectors = list(vectors) if vectors is not None else None
 
 
 class FakePDFProcessor:
@@ -31,13 +33,23 @@ class FakePDFProcessor:
     RAISE = None
 
     def __init__(self, *args, **kwargs):
-        pass
+        self.cfg = kwargs.get("cfg")
+        self.closed = False
+
+    def close(self):
+        self.closed = True
 
     def extract_pdf_pages(self, source, doc_id):
         if FakePDFProcessor.RAISE is not None:
             raise FakePDFProcessor.RAISE
         return FakePDFProcessor.RETURN
 
+    def iter_pdf_pages(self, source, doc_id):
+        for page in FakePDFProcessor.RETURN["pages"]:
+            if FakePDFProcessor.RAISE is not None:
+                raise FakePDFProcessor.RAISE
+            yield page
+
 
 class FakeOpenAIEmbeddings:
     """
@@ -181,3 +193,137 @@ async def test_splitter_must_provide_chunk_id(processor_semantic, patch_generate
     res = await processor_semantic.ingest(b"%PDF%", doc_id="DOC-NOID")
     assert res["status"] == "error"
     assert "splitter did not assign chunkid" in res.get("error", "").lower()
+
+
+# ---------- Streaming ingest ----------
+
+class RecordingEmbeddings:
+    def __init__(self):
+        self.batches = []
+    def embed_documents(self, texts):
+        self.batches.append(list(texts))
+        return [[float(len(t))] for t in texts]
+
+
+@pytest.fixture
+def processor_streaming(patch_generate_embeddings):
+    from app.services.generate_embeddings import SmartDocumentProcessor, ProcessorConfig
+    proc = SmartDocumentProcessor(cfg=ProcessorConfig(
+        chunk_mode="fast", streaming=True, embed_batch_size=3, stream_page_buffer=1, stream_batch_buffer=1,
+    ))
+    proc.embeddings = RecordingEmbeddings()
+    return proc
+
+
+@pytest.mark.anyio
+async def test_streaming_ingest_embeds_in_micro_batches(processor_streaming, patch_generate_embeddings):
+    FakePDF = patch_generate_embeddings["FakePDFProcessor"]
+    FakePDF.RAISE = None
+    FakePDF.RETURN = {
+        "metadata": {},
+        "pages": [{"pageNumber": i, "content": f"Page {i} has its own text.", "textSource": "text"} for i in range(1, 8)]
+                 + [{"pageNumber": 8, "content": "Page 1 has its own text.", "textSource": "ocr"}],  # duplicate
+        "chunks": [],
+    }
+
+    res = await processor_streaming.ingest(b"%PDF%", doc_id="DOC-S", filename="s.pdf")
+
+    assert res["status"] == "success" and res["streaming"] is True
+    assert res["pages_processed"] == 8 and res["ocr_used"] is True
+    assert res["stored"] == 7
+    assert [len(b) for b in processor_streaming.embeddings.batches] == [3, 3, 1]
+
+    store = processor_streaming.vector_store
+    assert [d.metadata["pageNumber"] for d in store.last_saved_docs] == list(range(1, 8))
+    assert store.last_saved_vectors == [[float(len(d.page_content))] for d in store.last_saved_docs]
+    assert all(d.metadata["filename"] == "s.pdf" for d in store.last_saved_docs)
+
+
+@pytest.mark.anyio
+async def test_streaming_ingest_reports_extraction_errors(processor_streaming, patch_generate_embeddings):
+    FakePDF = patch_generate_embeddings["FakePDFProcessor"]
+    FakePDF.RETURN = {"metadata": {}, "pages": [{"pageNumber": 1, "content": "Some content"}], "chunks": []}
+    FakePDF.RAISE = RuntimeError("broken pdf")
+    try:
+        res = await processor_streaming.ingest(b"%PDF%", doc_id="DOC-E")
+    finally:
+        FakePDF.RAISE = None
+
+    assert res["status"] == "error"
+    assert "broken pdf" in res["error"]
+    assert processor_streaming.vector_store.save_calls == 0
+
+
+# ---------- Span-aware ingestion ----------
+
+@pytest.fixture
+def processor_spans(patch_generate_embeddings):
+    from app.services.generate_embeddings import SmartDocumentProcessor, ProcessorConfig
+    return SmartDocumentProcessor(cfg=ProcessorConfig(chunk_mode="fast", use_spans=True))
+
+
+def test_span_extraction_follows_use_spans(processor_fast, processor_spans):
+    assert processor_fast.pdf.cfg.keep_spans is False
+    assert processor_spans.pdf.cfg.keep_spans is True
+
+
+@pytest.mark.anyio
+async def test_ingest_pdf_with_spans_keeps_line_rects(processor_spans, patch_generate_embeddings):
+    from app.services.chunk_store import LINE_RECTS_KEY, unpack_rects
+    from app.services.utils.spans import SpanArrays
+
+    lines = [f"Line number {i} of the page." for i in range(3)]
+    spans = SpanArrays.from_lines(lines, [10, 10, 10], [700, 680, 660], [200, 180, 150], [12, 12, 12])
+    FakePDF = patch_generate_embeddings["FakePDFProcessor"]
+    FakePDF.RAISE = None
+    FakePDF.RETURN = {
+        "metadata": {},
+        "pages": [
+            {"pageNumber": 1, "content": "\n".join(lines), "spans": spans},
+            {"pageNumber": 2, "content": "Scanned page text.", "spans": SpanArrays.empty()},
+        ],
+        "chunks": [],
+    }
+
+    res = await processor_spans.ingest(b"%PDF%", doc_id="DOC-R", filename="r.pdf")
+
+    assert res["status"] == "success" and res["stored"] == 2
+    by_spans, scanned = processor_spans.vector_store.last_saved_docs
+    assert by_spans.metadata["chunkType"] == "by_spans"
+    assert by_spans.metadata["filename"] == "r.pdf"
+    assert unpack_rects(by_spans.metadata[LINE_RECTS_KEY]).tolist() == [
+        [10, 700, 200, 12], [10, 680, 180, 12], [10, 660, 150, 12],
+    ]
+    # pages without spans (OCR) fall back to text chunking
+    assert scanned.metadata["pageNumber"] == 2 and LINE_RECTS_KEY not in scanned.metadata
+
+
+class FailingEmbeddings:
+    def embed_documents(self, texts):
+        raise ValueError("embedding backend rejected input")
+
+
+@pytest.mark.anyio
+async def test_streaming_stage_failure_surfaces_original_error(processor_streaming, patch_generate_embeddings):
+    FakePDF = patch_generate_embeddings["FakePDFProcessor"]
+    FakePDF.RAISE = None
+    FakePDF.RETURN = {"metadata": {}, "pages": [{"pageNumber": 1, "content": "Some page content"}], "chunks": []}
+    processor_streaming.embeddings = FailingEmbeddings()
+
+    with pytest.raises(ValueError, match="rejected input") as exc:
+        await processor_streaming._ingest_pdf_streaming(b"%PDF%", "DOC-F", None)
+    assert exc.value.__cause__ is not None and exc.value in exc.value.__cause__.exceptions
+
+    res = await processor_streaming.ingest(b"%PDF%", doc_id="DOC-F")
+    assert res == {"status": "error", "doc_id": "DOC-F", "error": "embedding backend rejected input"}
+    assert processor_streaming.vector_store.save_calls == 0
+
+
+def test_close_shuts_down_the_worker_pools(processor_fast, monkeypatch):
+    calls = []
+    monkeypatch.setattr(processor_fast.ocr, "shutdown", lambda: calls.append("shutdown"))
+
+    processor_fast.close()
+
+    assert calls == ["shutdown"]
+    assert processor_fast.pdf.closed
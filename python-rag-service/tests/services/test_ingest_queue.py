@@ -0,0 +1,88 @@
+import asyncio
+
+import pytest
+
+from app.services.ingest_queue import IngestQueue, IngestQueueConfig
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"  # the queue is built on asyncio tasks
+
+
+class FakeProcessor:
+    """Records stage concurrency while pretending to extract and embed."""
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.active = {"extract": 0, "embed": 0}
+        self.peak = {"extract": 0, "embed": 0}
+        self.calls = []
+
+    async def _stage(self, name, limiter):
+        async with limiter:
+            self.active[name] += 1
+            self.peak[name] = max(self.peak[name], self.active[name])
+            await asyncio.sleep(0.01)
+            self.active[name] -= 1
+
+    async def ingest(self, source, doc_id, **kwargs):
+        self.calls.append((source, doc_id, kwargs.get("filename")))
+        await self._stage("extract", kwargs["extract_limiter"])
+        await self._stage("embed", kwargs["embed_limiter"])
+        if doc_id in self.fail:
+            return {"status": "error", "doc_id": doc_id, "error": "boom"}
+        return {"status": "success", "doc_id": doc_id, "stored": 1}
+
+
+def _items(n):
+    return [{"source": f"/tmp/{i}.pdf", "doc_id": f"D{i}", "filename": f"{i}.pdf"} for i in range(n)]
+
+
+@pytest.mark.anyio
+async def test_batch_runs_with_separate_stage_limits():
+    proc = FakeProcessor(fail={"D3"})
+    queue = IngestQueue(proc, IngestQueueConfig(extract_concurrency=2, embed_concurrency=3, workers=6))
+    try:
+        job = await queue.submit(_items(12))
+        assert job.progress()["total"] == 12
+        await queue.join()
+    finally:
+        await queue.stop()
+
+    assert len(proc.calls) == 12
+    assert proc.peak["extract"] == 2
+    assert proc.peak["embed"] <= 3
+    assert job.status == "completed_with_errors"
+    assert job.progress() == {"total": 12, "queued": 0, "running": 0, "success": 11, "error": 1}
+    failed = [i for i in job.to_dict()["items"] if i["status"] == "error"]
+    assert failed[0]["id"] == "D3" and failed[0]["result"]["error"] == "boom"
+
+@pytest.mark.anyio
+async def test_prevalidated_errors_are_not_processed():
+    proc = FakeProcessor()
+    queue = IngestQueue(proc, IngestQueueConfig(extract_concurrency=1, embed_concurrency=1))
+    try:
+        job = await queue.submit([
+            {"source": "/tmp/ok.pdf", "doc_id": "OK"},
+            {"doc_id": "MISSING", "error": "File not found."},
+        ])
+        await queue.join()
+    finally:
+        await queue.stop()
+
+    assert [c[1] for c in proc.calls] == ["OK"]
+    assert job.progress()["error"] == 1 and job.status == "completed_with_errors"
+    assert queue.get(job.job_id) is job
+    assert queue.get("nope") is None
+
+@pytest.mark.anyio
+async def test_finished_jobs_are_pruned():
+    queue = IngestQueue(FakeProcessor(), IngestQueueConfig(extract_concurrency=1, embed_concurrency=1, max_finished_jobs=2))
+    try:
+        for i in range(4):
+            await queue.submit(_items(1))
+            await queue.join()
+        await queue.submit(_items(1))
+    finally:
+        await queue.stop()
+    assert len(queue.jobs()) <= 3
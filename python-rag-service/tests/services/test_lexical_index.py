@@ -0,0 +1,49 @@
+import time
+
+from app.services.lexical_index import LexicalIndex, reciprocal_rank_fusion, tokenize
+
+
+TEXTS = [
+    "Die Miete beträgt 1.250,00 EUR monatlich.",
+    "Nach § 5a ist die Kaution in drei Raten zu zahlen.",
+    "Der Mieter trägt die Nebenkosten gemäß § 5 der Vereinbarung.",
+    "Kündigungsfrist drei Monate zum Monatsende.",
+]
+IDS = ["a", "b", "c", "d"]
+
+
+def test_tokenize_keeps_sections_and_amounts():
+    assert tokenize("Gemäß § 5a: 9.800,96 EUR") == ["gemäß", "§5a", "9.800,96", "eur"]
+
+def test_search_ranks_exact_terms():
+    idx = LexicalIndex.build(IDS, TEXTS)
+    assert idx.search("§5a", k=3)[0][0] == "b"
+    assert [i for i, _ in idx.search("1.250,00", k=3)] == ["a"]
+    assert idx.search("unbekannt", k=3) == []
+
+def test_save_load_roundtrip(tmp_path):
+    idx = LexicalIndex.build(IDS, TEXTS)
+    idx.save(tmp_path)
+    loaded = LexicalIndex.load(tmp_path)
+    assert loaded.search("drei raten", k=2) == idx.search("drei raten", k=2)
+
+def test_empty_vocabulary():
+    idx = LexicalIndex.build(["x"], [""])
+    assert len(idx) == 1
+    assert idx.search("anything") == []
+
+def test_rrf_prefers_items_ranked_by_both():
+    fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "c"]], k=60)
+    assert fused[0][0] == "b"
+    assert {k for k, _ in fused} == {"a", "b", "c"}
+
+def test_query_is_sub_millisecond_on_medium_index():
+    texts = [f"Abschnitt {i} regelt Pflicht {i % 97} und Betrag {i * 3},50 EUR" for i in range(5000)]
+    idx = LexicalIndex.build([str(i) for i in range(5000)], texts)
+    idx.search("Pflicht 42", k=8)  # warm up
+
+    start = time.perf_counter()
+    for _ in range(50):
+        idx.search("Pflicht 42 Betrag", k=8)
+    per_query = (time.perf_counter() - start) / 50
+    assert per_query < 0.005  # generous bound for CI noise
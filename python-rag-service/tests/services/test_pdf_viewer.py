@@ -1,3 +1,4 @@
+import os
 import pytest
 from app.services.pdf_viewer import PDFProcessor, PDFProcessorConfig
 
@@ -9,7 +10,10 @@ class FakePage:
         self._text = text
         self.number = 0
 
-    def get_text(self, kind="text"):
+    def get_textpage(self, flags=0):
+        return object()
+
+    def get_text(self, kind="text", textpage=None):
         return self._text
 
         
@@ -40,17 +44,17 @@ class FakePageWithSpans(FakePage):
         self._rawdict = rawdict or {}
         self.rect = FakeRect(height)
 
-    def get_text(self, kind="text"):
-        if kind == "rawdict":
+    def get_text(self, kind="text", textpage=None):
+        if kind in ("dict", "rawdict"):
             return self._rawdict
-        return super().get_text(kind=kind)
+        return super().get_text(kind=kind, textpage=textpage)
 
 class FakeDocWithSpans(FakeDoc):
     def __init__(self, pages: list):
         self._pages = pages
 
 
-# ---------- Helpers to build a minimal rawdict line ----------
+# ---------- Helpers to build a minimal dict/rawdict line ----------
 
 def make_line(text: str, bbox=(10.0, 100.0, 110.0, 130.0)):
     return {
@@ -254,3 +258,206 @@ def test_spans_flag_disabled(monkeypatch):
     assert "error" not in out
     assert "spans" not in out["pages"][0]
 
+
+
+# ---------- Parallel extraction ----------
+
+class InlineExecutor:
+    """Runs submitted work in-process; stands in for ProcessPoolExecutor."""
+    started = 0
+
+    def __init__(self, max_workers=None, mp_context=None, initializer=None, initargs=()):
+        InlineExecutor.started += 1
+        self.shut_down = False
+        if initializer:
+            initializer(*initargs)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self.shut_down = True
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def submit(self, fn, *args):
+        from concurrent.futures import Future
+        fut = Future()
+        fut.set_result(fn(*args))
+        return fut
+
+
+def test_page_ranges_cover_all_pages_in_order():
+    from app.services.pdf_viewer import _page_ranges
+
+    assert _page_ranges(10, 3) == [(0, 4), (4, 7), (7, 10)]
+    assert _page_ranges(2, 8) == [(0, 1), (1, 2)]
+
+
+def test_parallel_extraction_matches_serial(monkeypatch):
+    texts = [f"Page {i} text" if i % 5 else "   " for i in range(1, 41)]
+    opened = {"n": 0}
+
+    def fake_open(**kwargs):
+        opened["n"] += 1
+        return FakeDoc(texts)
+
+    monkeypatch.setattr("app.services.pdf_viewer.fitz.open", fake_open)
+    monkeypatch.setattr("app.services.pdf_viewer.ProcessPoolExecutor", InlineExecutor)
+
+    serial = PDFProcessor(cfg=PDFProcessorConfig(use_ocr_fallback=False, keep_spans=False))
+    parallel = PDFProcessor(cfg=PDFProcessorConfig(
+        use_ocr_fallback=False, keep_spans=False, workers=4, parallel_min_pages=8,
+    ))
+
+    out_serial = serial.extract_pdf_pages(source=b"%PDF-FAKE%", doc_id="doc-par")
+    opened["n"] = 0
+    out_parallel = parallel.extract_pdf_pages(source=b"%PDF-FAKE%", doc_id="doc-par")
+
+    assert out_parallel == out_serial
+    assert [p["pageNumber"] for p in out_parallel["pages"]] == [i for i in range(1, 41) if i % 5]
+    # one open to count pages + one per shard
+    assert opened["n"] == 1 + 4 * 4
+
+
+def test_parallel_pool_is_reused_across_documents_until_closed(monkeypatch):
+    texts = [f"Page {i} text" for i in range(1, 21)]
+    paths = []
+
+    def fake_open(**kwargs):
+        paths.append(kwargs.get("filename"))
+        return FakeDoc(texts)
+
+    monkeypatch.setattr("app.services.pdf_viewer.fitz.open", fake_open)
+    monkeypatch.setattr("app.services.pdf_viewer.ProcessPoolExecutor", InlineExecutor)
+    InlineExecutor.started = 0
+    proc = PDFProcessor(cfg=PDFProcessorConfig(
+        use_ocr_fallback=False, keep_spans=False, workers=2, parallel_min_pages=8,
+    ))
+
+    assert "error" not in proc.extract_pdf_pages(source=b"%PDF-A%", doc_id="A")
+    assert "error" not in proc.extract_pdf_pages(source="/uploads/b.pdf", doc_id="B")
+    assert InlineExecutor.started == 1
+    # shards open a path: a temp copy of the bytes source (removed afterwards), or the file itself
+    shard_paths = [p for p in paths if p is not None]
+    assert shard_paths and all(p == "/uploads/b.pdf" or p.endswith(".pdf") for p in shard_paths)
+    assert not any(os.path.exists(p) for p in shard_paths if p != "/uploads/b.pdf")
+
+    pool = proc._pool
+    proc.close()
+    assert pool.shut_down and proc._pool is None
+
+
+def test_text_and_spans_share_one_textpage(monkeypatch, cfg_default):
+    """
+    Text and spans are read from the same parsed text page, spans via "dict" (not "rawdict").
+    """
+    raw = make_rawdict([make_line("Shared", (0.0, 0.0, 50.0, 10.0))])
+    calls = []
+
+    class TrackingPage(FakePageWithSpans):
+        def get_textpage(self, flags=0):
+            tp = object()
+            calls.append(("textpage", tp))
+            return tp
+
+        def get_text(self, kind="text", textpage=None):
+            calls.append((kind, textpage))
+            return super().get_text(kind=kind, textpage=textpage)
+
+    page = TrackingPage(text="Shared", rawdict=raw, height=100.0)
+    monkeypatch.setattr("app.services.pdf_viewer.fitz.open", lambda **kw: FakeDocWithSpans([page]))
+
+    out = PDFProcessor(cfg=cfg_default, ocr_fn=None).extract_pdf_pages(b"%PDF-FAKE%", "doc-tp")
+
+    assert out["pages"][0]["spans"][0]["text"] == "Shared"
+    tp = calls[0][1]
+    assert calls[1:] == [("text", tp), ("dict", tp)]
+
+
+def test_ocr_pages_skip_span_extraction(monkeypatch, cfg_default):
+    """
+    Pages without a text layer go through OCR and do not pay for a dict extraction.
+    """
+    kinds = []
+
+    class ScannedPage(FakePage):
+        def get_text(self, kind="text", textpage=None):
+            kinds.append(kind)
+            return ""
+
+    monkeypatch.setattr("app.services.pdf_viewer.fitz.open", lambda **kw: FakeDocWithSpans([ScannedPage()]))
+
+    out = PDFProcessor(cfg=cfg_default, ocr_fn=lambda page: "scanned text").extract_pdf_pages(b"%PDF%", "doc-ocr")
+
+    assert out["pages"][0]["textSource"] == "ocr"
+    assert out["pages"][0]["spans"] == []
+    assert kinds == ["text"]
+
+
+def test_deferred_ocr_is_submitted_before_results_are_collected(monkeypatch, cfg_default):
+    """
+    With an executor-style ocr_fn, all scanned pages are queued before any result is awaited,
+    and records come back in page order.
+    """
+    events = []
+
+    class FakeOcr:
+        def __call__(self, page):
+            raise AssertionError("executor-style OCR should use submit/result")
+
+        def submit(self, page):
+            from concurrent.futures import Future
+            events.append(("submit", page.number))
+            fut = Future()
+            fut.set_result(f"ocr {page.number}")
+            return fut
+
+        def result(self, fut):
+            events.append(("result", fut.result()))
+            return fut.result()
+
+    pages = [FakePage(""), FakePage("Embedded"), FakePage("")]
+    for n, p in enumerate(pages):
+        p.number = n
+    monkeypatch.setattr("app.services.pdf_viewer.fitz.open", lambda **kw: FakeDocWithSpans(pages))
+
+    out = PDFProcessor(cfg=cfg_default, ocr_fn=FakeOcr()).extract_pdf_pages(b"%PDF%", "doc-defer")
+
+    assert [p["content"] for p in out["pages"]] == ["ocr 0", "Embedded", "ocr 2"]
+    assert [p["textSource"] for p in out["pages"]] == ["ocr", "text", "ocr"]
+    assert events == [("submit", 0), ("submit", 2), ("result", "ocr 0"), ("result", "ocr 2")]
+
+
+def test_iter_pdf_pages_bounds_pending_ocr(monkeypatch):
+    """
+    Streaming extraction yields records in page order and never holds more than
+    `stream_ocr_lookahead` unresolved pages.
+    """
+    from concurrent.futures import Future
+    pending = []
+    max_pending = []
+
+    class SlowOcr:
+        def submit(self, page):
+            fut = Future()  # never completes on its own; resolved by result()
+            pending.append(fut)
+            max_pending.append(sum(1 for f in pending if not f.done()))
+            return fut
+
+        def result(self, fut):
+            fut.set_result("scanned")
+            return "scanned"
+
+    pages = [FakePage("") for _ in range(10)]
+    monkeypatch.setattr("app.services.pdf_viewer.fitz.open", lambda **kw: FakeDocWithSpans(pages))
+    cfg = PDFProcessorConfig(keep_spans=False, stream_ocr_lookahead=3)
+
+    gen = PDFProcessor(cfg=cfg, ocr_fn=SlowOcr()).iter_pdf_pages(b"%PDF%", "doc-stream")
+    first = next(gen)
+    assert first["pageNumber"] == 1 and len(pending) == 4  # 3-page window + the page that forced a flush
+
+    rest = list(gen)
+    assert [p["pageNumber"] for p in rest] == list(range(2, 11))
+    assert max(max_pending) <= 4
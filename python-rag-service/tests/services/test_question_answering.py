@@ -0,0 +1,223 @@
+import asyncio
+from typing import List
+
+import pytest
+from fastapi import HTTPException
+from langchain_core.documents import Document
+
+import app.services.question_answering as qa
+from app.services.answer_cache import AnswerCache, AnswerCacheConfig
+
+
+class FakeStore:
+    def __init__(self, docs: List[Document]):
+        self.docs = docs
+        self.version = (1, 100)
+        self.searches = 0
+    def index_version(self, document_id, index_dir=None):
+        return self.version
+    def embed_query(self, text):
+        # "kaution" questions share a direction; everything else is orthogonal
+        return [1.0, 0.0] if "kaution" in text.lower() else [0.0, 1.0]
+    async def aembed_query(self, text):
+        self.embeds = getattr(self, "embeds", 0) + 1
+        return self.embed_query(text)
+    def load_line_rects(self, document_id, index_dir=None):
+        return getattr(self, "rects", {})
+    def hybrid_search(self, document_id, query, k=4, **kw):
+        self.searches += 1
+        self.last_k = k
+        return self.docs[:k]
+
+
+def _docs(doc_id="D1"):
+    return [
+        Document(page_content="Die Kaution beträgt 9.800,96€.", metadata={"documentId": doc_id, "pageNumber": 7}),
+        Document(page_content="Zahlung in 2 Raten.", metadata={"documentId": doc_id, "pageNumber": 5}),
+    ]
+
+
+@pytest.fixture
+def patched(monkeypatch):
+    store = FakeStore(_docs())
+    cache = AnswerCache(AnswerCacheConfig(enabled=True, similarity_threshold=0.95))
+    store.calls = {"llm": 0}
+    monkeypatch.setattr(qa, "_vector_store", lambda: store)
+    monkeypatch.setattr(qa, "_answer_cache", lambda: cache)
+
+    async def fake_stream(context, question):
+        for part in ['{"contextAnswer": "9.800,96€ (Page 7)",', ' "additionalInfo": ""}']:
+            yield part
+
+    async def fake_answer(context, question):
+        store.calls["llm"] += 1
+        return {"contextAnswer": "9.800,96€ (Page 7)", "additionalInfo": ""}
+
+    monkeypatch.setattr(qa, "stream_answer_from_openai", fake_stream)
+    monkeypatch.setattr(qa, "get_answer_from_openai", fake_answer)
+    return store
+
+
+def _collect(gen):
+    async def run():
+        return [e async for e in gen]
+    return asyncio.run(run())
+
+
+def test_handle_ask_question_returns_answer_and_sources(patched):
+    res = asyncio.run(qa.handle_ask_question("Wie hoch ist die Kaution", "D1"))
+    assert res["answer"]["contextAnswer"].startswith("9.800,96€")
+    assert [s["pageNumber"] for s in res["sources"]] == [7, 5]
+    assert "Kaution" in res["sources"][0]["highlights"]
+
+def test_sources_carry_line_rects_of_span_chunks(patched):
+    import numpy as np
+    patched.docs[0].metadata["chunkId"] = "D1-7"
+    patched.rects = {"D1-7": np.array([[10, 700, 200, 12], [10, 688, 150, 12]], dtype=np.float32)}
+
+    res = asyncio.run(qa.handle_ask_question("Wie hoch ist die Kaution", "D1"))
+
+    assert res["sources"][0]["lineRects"] == [
+        {"x": 10.0, "y": 700.0, "width": 200.0, "height": 12.0, "page": 7},
+        {"x": 10.0, "y": 688.0, "width": 150.0, "height": 12.0, "page": 7},
+    ]
+    assert res["sources"][1]["lineRects"] == []
+
+def test_handle_ask_question_keeps_404(patched):
+    patched.docs = []
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(qa.handle_ask_question("x", "D1"))
+    assert exc.value.status_code == 404
+
+def test_missing_index_is_404_without_embedding(patched):
+    patched.version = None
+    with pytest.raises(HTTPException) as exc:
+        asyncio.run(qa.handle_ask_question("Wie hoch ist die Kaution?", "D1"))
+    assert exc.value.status_code == 404 and exc.value.detail == qa.NOT_INDEXED_DETAIL
+
+    events = _collect(qa.stream_ask_question("Wie hoch ist die Kaution?", "D1"))
+    assert events == [{"event": "error", "data": {"status": 404, "detail": qa.NOT_INDEXED_DETAIL}}]
+    assert getattr(patched, "embeds", 0) == 0 and patched.searches == 0
+
+def test_stream_sends_sources_before_tokens(patched):
+    events = _collect(qa.stream_ask_question("Wie hoch ist die Kaution?", "D1"))
+    names = [e["event"] for e in events]
+
+    assert names[0] == "sources"
+    assert names[1:3] == ["token", "token"]
+    assert names[-2:] == ["answer", "done"]
+    assert events[0]["data"]["debug"] == {"chunksAnalyzed": 2, "chunksUsed": 2}
+    assert events[-2]["data"]["contextAnswer"] == "9.800,96€ (Page 7)"
+
+def test_stream_reports_errors_as_events(patched):
+    patched.docs = []
+    events = _collect(qa.stream_ask_question("x", "D1"))
+    assert events == [{"event": "error", "data": {"status": 404, "detail": "No relevant content found for this document."}}]
+
+    events = _collect(qa.stream_ask_question("", "D1"))
+    assert events[0]["data"]["status"] == 400
+
+def test_stream_failure_mid_answer_is_logged_and_reported(patched, monkeypatch, caplog):
+    async def failing_stream(context, question):
+        yield '{"contextAnswer": '
+        raise RuntimeError("upstream closed the stream")
+
+    monkeypatch.setattr(qa, "stream_answer_from_openai", failing_stream)
+    with caplog.at_level("ERROR", logger=qa.__name__):
+        events = _collect(qa.stream_ask_question("Wie hoch ist die Kaution?", "D1"))
+
+    assert [e["event"] for e in events] == ["sources", "token", "error"]
+    assert events[-1]["data"] == {"status": 500, "detail": "upstream closed the stream"}
+    assert caplog.records[-1].exc_info is not None
+
+def test_repeated_question_is_served_from_cache(patched):
+    first = asyncio.run(qa.handle_ask_question("Wie hoch ist die Kaution?", "D1"))
+    again = asyncio.run(qa.handle_ask_question("  wie hoch ist die KAUTION ", "D1"))
+    similar = asyncio.run(qa.handle_ask_question("Kaution Höhe?", "D1"))
+
+    assert patched.calls["llm"] == 1 and patched.searches == 1
+    assert again["answer"] == first["answer"] and again["debug"]["cached"] is True
+    assert similar["debug"]["cached"] is True
+    assert "cached" not in first["debug"]
+    # near-duplicate hit: same answer, highlights for the new question
+    assert similar["debug"]["semanticMatch"] is True and "semanticMatch" not in again["debug"]
+    assert similar["sources"][0]["highlights"] == ["Kaution"]
+    assert first["sources"][0]["highlights"] != ["Kaution"]
+    stats = qa._answer_cache().stats()
+    assert (stats["hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+
+def test_semantic_matching_is_opt_in(patched, monkeypatch):
+    monkeypatch.setattr(qa, "_answer_cache", lambda: AnswerCache(AnswerCacheConfig(enabled=True)))
+    assert AnswerCacheConfig(enabled=True).similarity_threshold == 0
+
+    asyncio.run(qa.handle_ask_question("Wie hoch ist die Kaution?", "D1"))
+    similar = asyncio.run(qa.handle_ask_question("Kaution Höhe?", "D1"))
+    assert "cached" not in similar["debug"] and patched.calls["llm"] == 2
+
+def test_new_index_version_bypasses_cache(patched):
+    asyncio.run(qa.handle_ask_question("Wie hoch ist die Kaution?", "D1"))
+    patched.version = (2, 100)
+    asyncio.run(qa.handle_ask_question("Wie hoch ist die Kaution?", "D1"))
+    assert patched.calls["llm"] == 2
+
+def test_stream_serves_cached_answer_without_tokens(patched):
+    asyncio.run(qa.handle_ask_question("Wie hoch ist die Kaution?", "D1"))
+    events = _collect(qa.stream_ask_question("Wie hoch ist die Kaution?", "D1"))
+    assert [e["event"] for e in events] == ["sources", "answer", "done"]
+    assert events[0]["data"]["debug"]["cached"] is True
+
+def test_retrieval_runs_off_the_event_loop_with_stage_limits(patched, monkeypatch):
+    import threading
+    import time
+
+    config = qa.QAConcurrencyConfig
+    monkeypatch.setattr(qa, "QAConcurrencyConfig", lambda: config(embed=4, retrieve=1, llm=4))
+    state = {"active": 0, "peak": 0, "threads": set()}
+    lock = threading.Lock()
+    search = patched.hybrid_search
+
+    def slow_search(*a, **kw):
+        with lock:
+            state["active"] += 1
+            state["peak"] = max(state["peak"], state["active"])
+            state["threads"].add(threading.current_thread() is threading.main_thread())
+        time.sleep(0.05)
+        with lock:
+            state["active"] -= 1
+        return search(*a, **kw)
+
+    patched.hybrid_search = slow_search
+
+    async def run():
+        ticks = 0
+        done = asyncio.Event()
+        async def ticker():
+            nonlocal ticks
+            while not done.is_set():
+                ticks += 1
+                await asyncio.sleep(0.005)
+        tick_task = asyncio.create_task(ticker())
+        await asyncio.gather(*(qa.handle_ask_question(f"Frage {i}", "D1") for i in range(4)))
+        done.set()
+        await tick_task
+        return ticks
+
+    ticks = asyncio.run(run())
+    assert state["threads"] == {False}
+    assert state["peak"] == 1
+    assert ticks >= 10  # the loop kept running while searches blocked their threads
+    assert patched.embeds == 4
+
+def test_retrieval_fetches_ten_and_uses_top_four_by_default(monkeypatch):
+    docs = [
+        Document(page_content=f"Absatz {i}", metadata={"documentId": "D1", "pageNumber": i})
+        for i in range(12)
+    ]
+    store = FakeStore(docs)
+    monkeypatch.setattr(qa, "_vector_store", lambda: store)
+
+    out = qa.retrieve_context("Absatz?", "D1", query_vector=[1.0, 0.0])
+
+    assert store.last_k == 10
+    assert out["debug"] == {"chunksAnalyzed": 10, "chunksUsed": 4}
+    assert len(out["sources"]) == 4
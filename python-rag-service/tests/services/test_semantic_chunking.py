@@ -0,0 +1,108 @@
+import numpy as np
+import pytest
+from langchain_core.embeddings import Embeddings
+from langchain_experimental.text_splitter import SemanticChunker
+
+from app.services.semantic_chunking import (
+    HierarchicalSemanticChunker,
+    adjacent_cosine_distances,
+    breakpoint_threshold,
+    pack_windows,
+    split_sentences,
+)
+
+
+class TopicEmbeddings(Embeddings):
+    """Counts of 'alpha' / 'beta' words: texts on one topic point the same way."""
+
+    def __init__(self):
+        self.texts = 0
+
+    def embed_documents(self, texts):
+        self.texts += len(texts)
+        return [[t.count("alpha") + 0.01, t.count("beta") + 0.01] for t in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+def word_counts(texts):
+    return [len(t.split()) for t in texts]
+
+
+def two_topics(n_alpha=40, n_beta=40):
+    sentences = [f"alpha fact number {i} here." for i in range(n_alpha)]
+    sentences += [f"beta fact number {i} here." for i in range(n_beta)]
+    return " ".join(sentences), n_alpha - 1
+
+
+def test_pack_windows_by_cumulative_tokens():
+    assert pack_windows([3, 3, 3, 3, 3], 6).tolist() == [0, 0, 1, 1, 2]
+    # a sentence over budget gets its own window; ids stay consecutive
+    assert pack_windows([2, 20, 2, 2], 6).tolist() == [0, 0, 1, 2]
+    assert pack_windows([], 6).tolist() == []
+
+
+def test_adjacent_cosine_distances():
+    d = adjacent_cosine_distances(np.array([[1, 0], [2, 0], [0, 3]], dtype=np.float32))
+    assert d.tolist() == pytest.approx([0.0, 1.0])
+
+
+@pytest.mark.parametrize("kind,amount", [("percentile", 90), ("standard_deviation", 1.5), ("interquartile", 1.5), ("gradient", 90)])
+def test_thresholds_match_semantic_chunker(kind, amount):
+    d = list(np.random.default_rng(0).random(50))
+    sc = SemanticChunker(TopicEmbeddings(), breakpoint_threshold_type=kind, breakpoint_threshold_amount=amount)
+    expected, expected_scores = sc._calculate_breakpoint_threshold(d)
+
+    threshold, scores = breakpoint_threshold(np.array(d), kind, amount)
+    assert threshold == pytest.approx(expected)
+    assert scores == pytest.approx(np.asarray(expected_scores))
+    with pytest.raises(ValueError):
+        breakpoint_threshold(np.array(d), "bogus", 1)
+
+
+def test_breaks_at_topic_change_with_fewer_embeddings():
+    text, boundary = two_topics()
+    emb = TopicEmbeddings()
+    chunker = HierarchicalSemanticChunker(emb, word_counts, window_tokens=24)
+
+    breaks = chunker.breakpoints(split_sentences(text))
+
+    assert len(breaks) >= 1
+    assert min(abs(int(b) - boundary) for b in breaks) <= 4
+    assert chunker.embedded == emb.texts < len(split_sentences(text)) / 3
+
+
+def test_refine_moves_break_to_exact_sentence():
+    text, boundary = two_topics(41, 39)  # topic change not on a window edge
+    chunker = HierarchicalSemanticChunker(TopicEmbeddings(), word_counts, window_tokens=24, refine_sentences=3)
+
+    chunks = chunker.split_text(text)
+
+    assert boundary in chunker.breakpoints(split_sentences(text)).tolist()
+    assert " ".join(chunks) == text
+    assert any(c.endswith("alpha fact number 40 here.") for c in chunks)
+
+
+def test_short_texts_are_not_split():
+    chunker = HierarchicalSemanticChunker(TopicEmbeddings(), word_counts)
+    assert chunker.split_text("One sentence only") == ["One sentence only"]
+    assert chunker.embedded == 0
+
+
+def test_text_splitter_hierarchical_strategy():
+    from app.services.chunk_text import SplitConfig, TextSplitter
+
+    text, _ = two_topics(60, 60)
+    emb = TopicEmbeddings()
+    splitter = TextSplitter(
+        semantic_mode=True,
+        embeddings=emb,
+        cfg=SplitConfig(max_tokens_single=50, semantic_strategy="hierarchical", semantic_window_tokens=24),
+    )
+
+    docs = splitter.split_text(text, document_id="D")
+
+    assert len(docs) >= 2
+    assert {d.metadata["chunkType"] for d in docs} == {"semantic"}
+    assert emb.texts < 120 / 3
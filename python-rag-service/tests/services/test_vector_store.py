@@ -1,75 +1,27 @@
 import os
+import zlib
 from typing import List
 from pathlib import Path
 
 import pytest
 from langchain_core.documents import Document
+from langchain_core.embeddings import Embeddings
 
 # ---------- Fakes (no external dependencies) ----------
 
-class FakeEmbeddings:
+class FakeEmbeddings(Embeddings):
     def __init__(self, *a, **k): pass
     def embed_documents(self, texts: List[str]) -> List[List[float]]:
-        # Not actually used by FakeFAISS, kept for interface compatibility
-        return [[len(t)] for t in texts]
+        # 1-dim vectors are enough for a real flat FAISS index
+        return [[float(len(t))] for t in texts]
     def embed_query(self, text: str) -> List[float]:
-        return [len(text)]
+        return [float(len(text))]
 
-class _DocStore:
-    def __init__(self):
-        self._dict = {}
-
-class FakeFAISS:
-    """Minimal imitation of LangChain's FAISS store."""
-    _REGISTRY = {}  # path(str) -> instance
-
-    def __init__(self, docs: List[Document] = None):
-        self.docstore = _DocStore()
-        self._docs: List[Document] = []
-        if docs:
-            self.add_documents(docs)
-
-    @classmethod
-    def from_documents(cls, docs, embeddings, **kwargs):
-        # Build a brand-new "index" from documents
-        return cls(docs)
-
-    @classmethod
-    def load_local(cls, path, embeddings, allow_dangerous_deserialization=True, **kwargs):
-        inst = cls._REGISTRY.get(path)
-        if inst is None:
-            raise FileNotFoundError(f"FakeFAISS: nothing stored at {path}")
-        return inst
-
-    def add_documents(self, docs: List[Document]):
-        for d in docs:
-            self._docs.append(d)
-            key = f"k{len(self.docstore._dict) + 1}"
-            self.docstore._dict[key] = d
-
-    def save_local(self, path: str):
-        # Remember instance and create stub files expected by the loader
-        FakeFAISS._REGISTRY[path] = self
-        os.makedirs(path, exist_ok=True)
-        Path(path, "index.faiss").write_bytes(b"fake-index")
-        Path(path, "index.pkl").write_bytes(b"fake-pkl")
-
-    def as_retriever(self, search_kwargs=None):
-        k = (search_kwargs or {}).get("k", 10)
-        parent = self
-        class _R:
-            def __init__(self, p, k): self.p, self.k = p, k
-            def get_relevant_documents(self, query):
-                # Return first k docs (good enough for testing)
-                return self.p._docs[: self.k]
-        return _R(parent, k)
-
-# ---------- Auto-patch FAISS and Embeddings in the module under test ----------
+# ---------- Auto-patch Embeddings in the module under test ----------
 
 @pytest.fixture(autouse=True)
 def _patch_module(monkeypatch):
     import app.services.vector_store as mod
-    monkeypatch.setattr(mod, "FAISS", FakeFAISS)
     monkeypatch.setattr(mod, "OpenAIEmbeddings", FakeEmbeddings)
     yield
 
@@ -100,7 +52,8 @@ def test_save_creates_index_dir(tmp_path):
     target = tmp_path / "faiss_root" / "test-emb" / "doc_A"
     assert target.is_dir()
     assert (target / "index.faiss").exists()
-    assert (target / "index.pkl").exists()
+    assert (target / "chunks.bin").exists()
+    assert not (target / "index.pkl").exists()
 
 def test_load_as_store_and_as_retriever(tmp_path):
     from app.services.vector_store import VectorStore, VectorStoreConfig
@@ -138,3 +91,479 @@ def test_similarity_search_returns_documents(tmp_path):
     res = vs.similarity_search("C", "query", k=3)
     assert len(res) == 3
     assert all(isinstance(d, Document) for d in res)
+
+def test_load_is_served_from_cache(tmp_path, monkeypatch):
+    from app.services.vector_store import VectorStore, VectorStoreConfig
+    cfg = VectorStoreConfig(index_base=str(tmp_path / "faiss_root"))
+    vs = VectorStore(embedding_model="test-emb", cfg=cfg)
+    vs.save_to_faiss(make_docs(3, "H"))
+
+    import app.services.vector_store as mod
+    calls = {"n": 0}
+    original = mod.ChunkStore.open.__func__
+    def counting_open(cls, *a, **k):
+        calls["n"] += 1
+        return original(cls, *a, **k)
+    monkeypatch.setattr(mod.ChunkStore, "open", classmethod(counting_open))
+
+    before = VectorStore.cache_stats()
+    first = vs.load_faiss_store("H", as_retriever=False)
+    second = vs.load_faiss_store("H", as_retriever=False)
+    after = VectorStore.cache_stats()
+
+    assert first is second
+    assert calls["n"] == 1
+    assert after["misses"] - before["misses"] == 1
+    assert after["hits"] - before["hits"] == 1
+
+def test_save_invalidates_cached_store(tmp_path):
+    from app.services.vector_store import VectorStore, VectorStoreConfig
+    cfg = VectorStoreConfig(index_base=str(tmp_path / "faiss_root"))
+    vs = VectorStore(embedding_model="test-emb", cfg=cfg)
+
+    vs.save_to_faiss(make_docs(2, "I"))
+    assert len(vs.load_faiss_store("I", as_retriever=False).docstore._dict) == 2
+
+    vs.save_to_faiss(make_docs(5, "I"))
+    assert len(vs.load_faiss_store("I", as_retriever=False).docstore._dict) == 5
+
+def test_cache_respects_entry_budget(tmp_path):
+    from app.services.vector_store import StoreCacheConfig, VectorStore, VectorStoreConfig, configure_store_cache
+    vs = VectorStore(embedding_model="test-emb", cfg=VectorStoreConfig(index_base=str(tmp_path / "faiss_root")))
+    configure_store_cache(StoreCacheConfig(max_entries=1))
+    try:
+        vs.save_to_faiss(make_docs(1, "J1"))
+        vs.save_to_faiss(make_docs(1, "J2"))
+
+        before = VectorStore.cache_stats()
+        vs.load_faiss_store("J1", as_retriever=False)
+        vs.load_faiss_store("J2", as_retriever=False)
+        # a new instance does not touch the process-wide budget
+        VectorStore(embedding_model="test-emb", cfg=VectorStoreConfig(index_base=str(tmp_path / "faiss_root")))
+        vs.load_faiss_store("J1", as_retriever=False)
+        after = VectorStore.cache_stats()
+
+        assert after["entries"] == 1
+        assert after["misses"] - before["misses"] == 3
+        assert after["evictions"] - before["evictions"] >= 2
+    finally:
+        # restore the process-wide budget for the remaining tests
+        configure_store_cache()
+
+
+# ---------- Incremental updates (real FAISS) ----------
+
+class CountingEmbeddings(Embeddings):
+    """Deterministic 8-dim embeddings that record every embedded text."""
+    def __init__(self):
+        self.embedded: List[str] = []
+    def _vec(self, text: str) -> List[float]:
+        h = zlib.crc32(text.encode("utf-8"))
+        return [float((h >> (i * 4)) & 0xF) for i in range(8)]
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.embedded.extend(texts)
+        return [self._vec(t) for t in texts]
+    def embed_query(self, text: str) -> List[float]:
+        return self._vec(text)
+
+@pytest.fixture
+def real_store(tmp_path, monkeypatch):
+    import app.services.vector_store as mod
+    from langchain_community.vectorstores import FAISS
+    monkeypatch.setattr(mod, "FAISS", FAISS)
+    emb = CountingEmbeddings()
+    cfg = mod.VectorStoreConfig(index_base=str(tmp_path / "faiss_root"))
+    return mod.VectorStore(embedding_model="test-emb", embeddings=emb, cfg=cfg), emb
+
+def test_incremental_embeds_only_new_chunks(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(4, "K"))
+    assert len(emb.embedded) == 4
+
+    revised = make_docs(3, "K") + [
+        Document(page_content="brand new", metadata={"documentId": "K", "chunkId": "K-9"})
+    ]
+    emb.embedded.clear()
+    res = vs.save_to_faiss(revised)
+
+    assert emb.embedded == ["brand new"]
+    assert res == {"mode": "incremental", "added": 1, "removed": 1, "kept": 3}
+    store = vs.load_faiss_store("K", as_retriever=False)
+    contents = sorted(d.page_content for d in store.docstore._dict.values())
+    assert contents == ["brand new", "text 1", "text 2", "text 3"]
+    assert store.index.ntotal == 4
+
+def test_incremental_replaces_changed_text_with_same_chunk_id(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(2, "L"))
+
+    changed = make_docs(2, "L")
+    changed[1] = Document(page_content="text 2 revised", metadata=changed[1].metadata)
+    res = vs.save_to_faiss(changed)
+
+    assert res["added"] == 1 and res["removed"] == 1
+    store = vs.load_faiss_store("L", as_retriever=False)
+    assert sorted(d.page_content for d in store.docstore._dict.values()) == ["text 1", "text 2 revised"]
+
+def test_unchanged_ingest_does_not_rewrite_index(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(3, "M"))
+    target = vs._doc_dir("M")
+    mtime = (target / "index.faiss").stat().st_mtime_ns
+
+    res = vs.save_to_faiss(make_docs(3, "M"))
+
+    assert res["added"] == 0 and res["removed"] == 0
+    assert (target / "index.faiss").stat().st_mtime_ns == mtime
+
+def test_non_json_metadata_does_not_look_changed(real_store):
+    import numpy as np
+    vs, emb = real_store
+
+    def docs():
+        out = make_docs(2, "T")
+        for i, d in enumerate(out):
+            d.metadata.update(pageNumber=np.int64(i + 1), bbox=(1.0, 2.0, 3.0, 4.0))
+        return out
+
+    vs.save_to_faiss(docs())
+    mtime = (vs._doc_dir("T") / "index.faiss").stat().st_mtime_ns
+    emb.embedded.clear()
+
+    res = vs.save_to_faiss(docs())
+
+    assert res["added"] == 0 and res["removed"] == 0 and emb.embedded == []
+    assert (vs._doc_dir("T") / "index.faiss").stat().st_mtime_ns == mtime
+
+def test_unchanged_save_keeps_cache_and_skips_listeners(real_store):
+    import app.services.vector_store as mod
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(2, "U"))
+    store = vs.load_faiss_store("U", as_retriever=False)
+    seen = []
+    mod.add_invalidation_listener(seen.append)
+    try:
+        vs.save_to_faiss(make_docs(2, "U"))
+    finally:
+        mod.remove_invalidation_listener(seen.append)
+
+    assert seen == []
+    assert vs.load_faiss_store("U", as_retriever=False) is store
+
+def test_atomic_write_leaves_no_temp_folders(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(2, "N"))
+    vs.save_to_faiss(make_docs(3, "N"))
+    vs.save_to_faiss(make_docs(1, "N"), incremental=False)
+
+    names = sorted(p.name for p in vs.model_base_dir.iterdir())
+    assert len(names) == 2 and names[0].startswith(".doc_N.v-") and names[1] == "doc_N"
+    assert (vs.model_base_dir / "doc_N").is_symlink()
+    assert os.readlink(vs.model_base_dir / "doc_N") == names[0]
+
+def test_swap_keeps_previously_loaded_store_readable(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(2, "S"))
+    old = vs.load_faiss_store("S", as_retriever=False)
+    vs.save_to_faiss(make_docs(3, "S"))
+
+    # old version folder is gone, but its mmapped chunks stay readable
+    assert len(old.similarity_search("text", k=2)) == 2
+    assert vs.load_faiss_store("S", as_retriever=False).index.ntotal == 3
+
+def test_legacy_plain_folder_is_moved_behind_link(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(2, "G"))
+    link = vs.model_base_dir / "doc_G"
+    version = vs.model_base_dir / os.readlink(link)
+    link.unlink()
+    os.replace(version, link)  # pre-versioning layout: a plain folder
+
+    res = vs.save_to_faiss(make_docs(3, "G"))
+
+    assert res["added"] == 1 and link.is_symlink()
+    assert sorted(p.name.startswith(".doc_G.v-") for p in vs.model_base_dir.iterdir()) == [False, True]
+
+def test_reader_retries_when_version_vanishes(real_store, monkeypatch):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(2, "V"))
+    real_read = vs._read_store
+    calls = []
+
+    def flaky(dir_str, lazy=True):
+        calls.append(dir_str)
+        if len(calls) == 1:
+            raise FileNotFoundError(dir_str)
+        return real_read(dir_str, lazy)
+
+    monkeypatch.setattr(vs, "_read_store", flaky)
+    assert vs.load_faiss_store("V", as_retriever=False).index.ntotal == 2
+    assert len(calls) == 2
+
+def test_cleanup_removes_only_old_unreferenced_folders(real_store):
+    import time as _time
+    import app.services.vector_store as mod
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(2, "C"))
+    base = vs.model_base_dir
+    stale = [base / ".doc_C.tmp-dead", base / ".doc_C.old-dead", base / ".doc_C.v-orphan"]
+    for p in stale:
+        p.mkdir()
+        os.utime(p, (_time.time() - 7200, _time.time() - 7200))
+    fresh = base / ".doc_C.tmp-inflight"
+    fresh.mkdir()
+
+    assert mod.cleanup_stale_dirs(str(base.parent)) == 3
+    assert not any(p.exists() for p in stale) and fresh.exists()
+    assert vs.load_faiss_store("C", as_retriever=False).index.ntotal == 2
+
+
+# ---------- Hybrid retrieval (real FAISS + BM25) ----------
+
+def test_save_writes_lexical_index(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(3, "H"))
+    assert (vs._doc_dir("H") / "lexical.npz").is_file()
+
+    lexical = vs.load_lexical_index("H")
+    assert len(lexical) == 3
+    assert vs.load_lexical_index("H") is lexical  # cached
+
+def test_hybrid_search_finds_exact_section_and_amount(real_store):
+    vs, emb = real_store
+    docs = [
+        Document(page_content=f"Allgemeine Regelung Nummer {i}", metadata={"documentId": "S", "chunkId": f"S-{i}"})
+        for i in range(20)
+    ]
+    docs[13] = Document(
+        page_content="Gemäß § 5a beträgt die Kaution 9.800,96 EUR.",
+        metadata={"documentId": "S", "chunkId": "S-13", "pageNumber": 4},
+    )
+    vs.save_to_faiss(docs)
+
+    # The test embeddings are hash-based, so only the lexical side knows the
+    # answer; fusion must still keep it within the first k results.
+    for query in ("Was regelt §5a?", "9.800,96"):
+        top = vs.hybrid_search("S", query, k=2)
+        assert "S-13" in [d.metadata["chunkId"] for d in top]
+        assert all("retrievalScore" in d.metadata for d in top)
+
+def test_hybrid_search_without_lexical_index_uses_vectors(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(3, "V"))
+    (vs._doc_dir("V") / "lexical.npz").unlink()
+
+    assert len(vs.hybrid_search("V", "text 1", k=2)) == 2
+
+def test_missing_lexical_index_is_backfilled_on_next_save(real_store):
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(2, "B"))
+    (vs._doc_dir("B") / "lexical.npz").unlink()
+
+    vs.save_to_faiss(make_docs(2, "B"))
+    assert (vs._doc_dir("B") / "lexical.npz").is_file()
+
+def test_save_notifies_invalidation_listeners_and_bumps_version(real_store):
+    import app.services.vector_store as mod
+    vs, emb = real_store
+    assert vs.index_version("W") is None
+
+    seen = []
+    mod.add_invalidation_listener(seen.append)
+    try:
+        vs.save_to_faiss(make_docs(2, "W"))
+        v1 = vs.index_version("W")
+        vs.save_to_faiss(make_docs(3, "W"))
+    finally:
+        mod.remove_invalidation_listener(seen.append)
+
+    assert seen == ["W", "W"]
+    assert v1 is not None and vs.index_version("W") != v1
+
+def test_precomputed_vectors_are_not_re_embedded(real_store):
+    vs, emb = real_store
+    docs = make_docs(3, "P")
+    vectors = [emb._vec(d.page_content) for d in docs]
+
+    res = vs.save_to_faiss(docs, vectors=vectors)
+    assert res["mode"] == "rebuild" and emb.embedded == []
+
+    more = docs + [Document(page_content="extra", metadata={"documentId": "P", "chunkId": "P-9"})]
+    res = vs.save_to_faiss(more, vectors=vectors + [emb._vec("extra")])
+    assert res["added"] == 1 and emb.embedded == []
+    assert vs.load_faiss_store("P", as_retriever=False).index.ntotal == 4
+
+    with pytest.raises(ValueError):
+        vs.save_to_faiss(docs, vectors=vectors[:1])
+
+
+# ---------- ANN index types (real FAISS) ----------
+
+def _ann_store(real_store, **overrides):
+    import app.services.vector_store as mod
+    vs, emb = real_store
+    cfg = mod.VectorStoreConfig(index_base=vs.cfg.index_base, **overrides)
+    return mod.VectorStore(embedding_model="test-emb", embeddings=emb, cfg=cfg), emb
+
+def test_auto_switches_to_hnsw_past_flat_threshold(real_store):
+    from app.services.faiss_index import FLAT, HNSW, index_kind
+    vs, emb = _ann_store(real_store, flat_max_chunks=5, hnsw_ef_search=40)
+
+    vs.save_to_faiss(make_docs(4, "A1"))
+    assert index_kind(vs.load_faiss_store("A1", as_retriever=False).index) == FLAT
+
+    vs.save_to_faiss(make_docs(6, "A1"))
+    store = vs.load_faiss_store("A1", as_retriever=False)
+    assert index_kind(store.index) == HNSW
+    assert store.index.ntotal == 6
+    assert store.index.hnsw.efSearch == 40
+
+    hit = store.similarity_search_by_vector(emb._vec("text 5"), k=1)[0]
+    assert hit.page_content == "text 5"
+
+def test_hnsw_incremental_remove_keeps_ids_aligned(real_store):
+    vs, emb = _ann_store(real_store, index_type="hnsw")
+    vs.save_to_faiss(make_docs(6, "A2"))
+
+    res = vs.save_to_faiss(make_docs(6, "A2")[1:4])
+
+    assert res == {"mode": "incremental", "added": 0, "removed": 3, "kept": 3}
+    store = vs.load_faiss_store("A2", as_retriever=False)
+    assert store.index.ntotal == 3 and len(store.index_to_docstore_id) == 3
+    for text in ("text 2", "text 3", "text 4"):
+        assert store.similarity_search_by_vector(emb._vec(text), k=1)[0].page_content == text
+
+def test_ivf_index_is_trained_and_probed(real_store):
+    from app.services.faiss_index import IVF, index_kind
+    import faiss
+    vs, emb = _ann_store(real_store, index_type="ivf", ivf_nprobe=1000)
+    docs = make_docs(120, "A3")
+
+    vs.save_to_faiss(docs)
+    vs.save_to_faiss(docs[:-10])
+
+    store = vs.load_faiss_store("A3", as_retriever=False)
+    assert index_kind(store.index) == IVF
+    ivf = faiss.extract_index_ivf(store.index)
+    assert ivf.is_trained and ivf.nprobe == ivf.nlist
+    assert store.index.ntotal == 110
+    assert store.similarity_search_by_vector(emb._vec("text 42"), k=1)[0].page_content == "text 42"
+
+
+# ---------- Chunk store (chunks.bin) ----------
+
+def test_loaded_store_reads_chunks_lazily(real_store):
+    from app.services.chunk_store import ChunkDocstore
+    vs, emb = real_store
+    vs.save_to_faiss(make_docs(5, "CS"))
+
+    store = vs.load_faiss_store("CS", as_retriever=False)
+    assert isinstance(store.docstore, ChunkDocstore)
+    hit = store.similarity_search_by_vector(emb._vec("text 3"), k=1)[0]
+    assert hit.page_content == "text 3"
+    assert hit.metadata == {"documentId": "CS", "chunkId": "CS-3"}
+
+def test_legacy_pickle_index_is_read_and_migrated_when_allowed(real_store):
+    import app.services.vector_store as mod
+    from langchain_community.vectorstores import FAISS
+    vs, emb = real_store
+    vs = mod.VectorStore(
+        embedding_model="test-emb",
+        embeddings=emb,
+        cfg=mod.VectorStoreConfig(index_base=vs.cfg.index_base, allow_dangerous_deser=True),
+    )
+    target = vs._doc_dir("LG")
+    FAISS.from_documents(make_docs(3, "LG"), emb).save_local(str(target))
+    assert not (target / "chunks.bin").exists()
+
+    store = vs.load_faiss_store("LG", as_retriever=False)
+    assert len(store.docstore._dict) == 3
+
+    emb.embedded.clear()
+    res = vs.save_to_faiss(make_docs(3, "LG"))
+    assert res["added"] == 0 and emb.embedded == []
+    assert (target / "chunks.bin").is_file() and not (target / "index.pkl").exists()
+    assert vs.similarity_search("LG", "text 2", k=1)[0].metadata["chunkId"] == "LG-2"
+
+def test_legacy_pickle_refused_by_default(real_store):
+    import app.services.vector_store as mod
+    from langchain_community.vectorstores import FAISS
+    vs, emb = real_store
+    assert mod.VectorStoreConfig().allow_dangerous_deser is False
+    FAISS.from_documents(make_docs(2, "LX"), emb).save_local(str(vs._doc_dir("LX")))
+    assert vs.safe_load_faiss_store("LX") is None
+    with pytest.raises(FileNotFoundError, match="--migrate-legacy"):
+        vs.load_faiss_store("LX")
+
+def test_migrate_legacy_converts_pickled_indexes_once(real_store):
+    from langchain_community.vectorstores import FAISS
+    vs, emb = real_store
+    FAISS.from_documents(make_docs(3, "LM"), emb).save_local(str(vs._doc_dir("LM")))
+    vs.save_to_faiss(make_docs(2, "NEW"))
+    emb.embedded.clear()
+
+    assert vs.migrate_legacy() == {"migrated": 1, "failed": 0}
+
+    target = vs._doc_dir("LM")
+    assert target.is_symlink() and (target / "chunks.bin").is_file()
+    assert not (target / "index.pkl").exists()
+    assert emb.embedded == []
+    assert vs.similarity_search("LM", "text 2", k=1)[0].metadata["chunkId"] == "LM-2"
+    assert vs.migrate_legacy() == {"migrated": 0, "failed": 0}
+
+def test_mmap_read_path_serves_searches_and_updates(real_store):
+    from app.services.faiss_index import MmapFlatIndex
+    vs, emb = _ann_store(real_store, mmap_indexes=True)
+    vs.save_to_faiss(make_docs(5, "MM"))
+
+    store = vs.load_faiss_store("MM", as_retriever=False)
+    assert isinstance(store.index, MmapFlatIndex)
+    assert [d.page_content for d in vs.hybrid_search("MM", "text 4", k=1)] == ["text 4"]
+
+    res = vs.save_to_faiss(make_docs(6, "MM"))
+    assert res["added"] == 1
+    assert vs.load_faiss_store("MM", as_retriever=False).index.ntotal == 6
+
+
+def test_line_rects_live_in_side_file_and_survive_incremental_save(real_store):
+    from app.services.chunk_store import CHUNKS_FILE, LINE_RECTS_KEY, RECTS_FILE, ChunkStore, pack_rects
+    vs, emb = real_store
+    docs = make_docs(3, "R")
+    docs[0].metadata[LINE_RECTS_KEY] = pack_rects([[1, 2, 3, 4]])
+    docs[2].metadata[LINE_RECTS_KEY] = pack_rects([[5, 6, 7, 8], [9, 10, 11, 12]])
+    vs.save_to_faiss(docs)
+
+    target = vs._doc_dir("R")
+    assert (target / RECTS_FILE).is_file()
+    chunks = ChunkStore.open(target / CHUNKS_FILE)
+    assert all(LINE_RECTS_KEY not in chunks.metadata(i) for i in range(len(chunks)))
+    rects = vs.load_line_rects("R")
+    assert {k: v.tolist() for k, v in rects.items()} == {
+        "R-1": [[1, 2, 3, 4]], "R-3": [[5, 6, 7, 8], [9, 10, 11, 12]],
+    }
+
+    # same chunks and rects again: nothing is re-embedded or replaced
+    emb.embedded.clear()
+    res = vs.save_to_faiss(docs + [Document(page_content="extra", metadata={"documentId": "R", "chunkId": "R-4"})])
+    assert emb.embedded == ["extra"] and res["removed"] == 0
+    assert set(vs.load_line_rects("R")) == {"R-1", "R-3"}
+    assert vs.load_line_rects("R") is vs.load_line_rects("R")  # cached per index version
+    assert vs.load_line_rects("missing") == {}
+
+
+def test_empty_line_rects_do_not_count_as_changed(real_store):
+    from app.services.chunk_store import LINE_RECTS_KEY, RECTS_FILE, pack_rects
+    vs, emb = real_store
+    docs = make_docs(3, "RE")
+    docs[0].metadata[LINE_RECTS_KEY] = pack_rects([[1, 2, 3, 4]])
+    docs[1].metadata[LINE_RECTS_KEY] = b""
+    vs.save_to_faiss(docs)
+    target = vs._doc_dir("RE")
+    assert (target / RECTS_FILE).is_file()
+    version = os.readlink(target)
+
+    emb.embedded.clear()
+    res = vs.save_to_faiss(docs)
+
+    assert res == {"mode": "incremental", "added": 0, "removed": 0, "kept": 3}
+    assert emb.embedded == [] and os.readlink(target) == version
@@ -1,6 +1,6 @@
-import io
 import sys
 import types
+import fitz
 from PIL import Image
 import pytest
 
@@ -16,21 +16,32 @@ import app.services.utils.ocr_fallback as ocr_mod
 # ---------- Fake PDF Page and Pixmap ----------
 
 class FakePixmap:
-    def __init__(self, w=400, h=300, color=(255, 255, 255)):
-        img = Image.new("RGB", (w, h), color)
-        bio = io.BytesIO()
-        img.save(bio, format="PNG")
-        self._bytes = bio.getvalue()
+    """Grayscale pixmap exposing raw samples like fitz.Pixmap (colorspace=csGRAY, alpha=False)."""
+    def __init__(self, w=400, h=300, color=255):
+        self.width, self.height, self.n = w, h, 1
+        self.stride = w
+        self.samples = Image.new("L", (w, h), color).tobytes()
 
-    def tobytes(self, fmt="png"):
-        return self._bytes
+    @property
+    def samples_mv(self):
+        return memoryview(self.samples)
+
+
+class FakeRect:
+    def __init__(self, width, height):
+        self.width, self.height = width, height
 
 
 class FakePage:
-    def __init__(self, w=400, h=300):
+    """Page whose size in points corresponds to the fake pixmap rendered at 300 dpi."""
+    def __init__(self, w=400, h=300, rotation=0):
         self._pm = FakePixmap(w, h)
+        self.rotation = rotation
+        self.rect = FakeRect(w * 72 / 300, h * 72 / 300)
+        self.pixmap_kwargs = None
 
-    def get_pixmap(self, dpi=300):
+    def get_pixmap(self, **kwargs):
+        self.pixmap_kwargs = kwargs
         return self._pm
 
 # ---------- Tests ----------
@@ -102,3 +113,179 @@ def test_resize_when_too_large(monkeypatch):
     txt = ocr_mod.extract_text_with_ocr(page, max_side=3000)
     assert txt == "ok"
     assert max(seen_sizes["size"]) == 3000
+
+
+# ---------- OcrExecutor ----------
+
+class ThreadPool:
+    """Thread-backed stand-in for ProcessPoolExecutor (keeps monkeypatches visible)."""
+    def __init__(self, max_workers=None, mp_context=None):
+        from concurrent.futures import ThreadPoolExecutor
+        self._pool = ThreadPoolExecutor(max_workers=max_workers)
+
+    def submit(self, fn, *args, **kwargs):
+        return self._pool.submit(fn, *args, **kwargs)
+
+    def shutdown(self, wait=True, cancel_futures=False):
+        self._pool.shutdown(wait=wait, cancel_futures=cancel_futures)
+
+
+def test_executor_inline_matches_function(monkeypatch):
+    monkeypatch.setattr(ocr_mod, "HAS_CV2", False, raising=False)
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_osd", lambda img: "Rotate: 0\n")
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_string", lambda img, lang=None, config=None, timeout=0: "inline")
+
+    ocr = ocr_mod.OcrExecutor(ocr_mod.OcrConfig(workers=1))
+    assert ocr(FakePage()) == "inline"
+
+
+def test_executor_pool_times_out_single_page(monkeypatch):
+    monkeypatch.setattr(ocr_mod, "HAS_CV2", False, raising=False)
+    monkeypatch.setattr(ocr_mod, "ProcessPoolExecutor", ThreadPool)
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_osd", lambda img: "Rotate: 0\n")
+
+    calls = []
+
+    def fake_tesseract(img, lang=None, config=None, timeout=0):
+        calls.append((img.size, config, timeout))
+        if img.size == (500, 300):
+            raise RuntimeError("Tesseract process timeout")
+        return f"w={img.size[0]}"
+
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_string", fake_tesseract)
+
+    ocr = ocr_mod.OcrExecutor(ocr_mod.OcrConfig(workers=2, page_timeout_s=5))
+    try:
+        futs = [ocr.submit(FakePage(w=w)) for w in (400, 500, 600)]
+        texts = [ocr.result(f) for f in futs]
+    finally:
+        ocr.shutdown()
+
+    assert texts == ["w=400", "", "w=600"]
+    # timed-out page is not retried with the psm 11 fallback
+    assert sum(1 for size, _, _ in calls if size == (500, 300)) == 1
+    assert all(t == 5 for _, _, t in calls)
+
+
+def test_executor_pickles_to_inline_copy():
+    import pickle
+
+    ocr = ocr_mod.OcrExecutor(ocr_mod.OcrConfig(workers=4))
+    clone = pickle.loads(pickle.dumps(ocr))
+
+    assert clone._inline is True
+    assert clone._pool is None
+    assert clone.cfg == ocr.cfg
+
+
+# ---------- Orientation strategy ----------
+
+def _osd_spy(monkeypatch, answer):
+    sizes = []
+    def fake_osd(img):
+        sizes.append(img.size)
+        return answer(img) if callable(answer) else answer
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_osd", fake_osd)
+    return sizes
+
+
+def test_upright_page_uses_thumbnail_osd_only(monkeypatch):
+    monkeypatch.setattr(ocr_mod, "HAS_CV2", False, raising=False)
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_string", lambda img, lang=None, config=None: "ok")
+    sizes = _osd_spy(monkeypatch, "Rotate: 0\n")
+
+    assert ocr_mod.extract_text_with_ocr(FakePage(w=2400, h=1800)) == "ok"
+    assert sizes == [(1000, 750)]
+
+
+def test_thumbnail_disagreement_triggers_full_osd(monkeypatch):
+    monkeypatch.setattr(ocr_mod, "HAS_CV2", False, raising=False)
+    seen = {}
+    def spy(img, lang=None, config=None):
+        seen["size"] = img.size
+        return "ok"
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_string", spy)
+    sizes = _osd_spy(monkeypatch, "Rotate: 90\n")
+
+    assert ocr_mod.extract_text_with_ocr(FakePage(w=2400, h=1800)) == "ok"
+    assert sizes == [(1000, 750), (2400, 1800)]
+    assert seen["size"] == (1800, 2400)
+
+
+def test_pdf_rotation_metadata_skips_osd(monkeypatch):
+    monkeypatch.setattr(ocr_mod, "HAS_CV2", False, raising=False)
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_string", lambda img, lang=None, config=None: "ok")
+    sizes = _osd_spy(monkeypatch, "Rotate: 0\n")
+
+    assert ocr_mod.extract_text_with_ocr(FakePage(rotation=90)) == "ok"
+    assert sizes == []
+
+
+def test_document_session_reuses_orientation_of_first_pages(monkeypatch):
+    monkeypatch.setattr(ocr_mod, "HAS_CV2", False, raising=False)
+    monkeypatch.setattr(ocr_mod.pytesseract, "image_to_string", lambda img, lang=None, config=None, timeout=0: "ok")
+    sizes = _osd_spy(monkeypatch, "Rotate: 0\n")
+
+    ocr = ocr_mod.OcrExecutor(ocr_mod.OcrConfig(workers=1, orientation_probe_pages=2))
+    session = ocr.document()
+    texts = [session(FakePage()) for _ in range(5)]
+
+    assert texts == ["ok"] * 5
+    assert len(sizes) == 2
+    assert session.orientation.known_angle() == 0
+    # a new document starts probing again
+    ocr.document()(FakePage())
+    assert len(sizes) == 3
+
+
+def test_orientation_detector_needs_agreement():
+    det = ocr_mod.OrientationDetector(probe_pages=3)
+    for angle in (0, 90, 90):
+        det.observe(angle)
+    assert det.known_angle() is None
+    assert det.expected_angle() == 90
+
+
+# ---------- Rendering ----------
+
+def test_render_dpi_is_capped_by_max_side():
+    page = FakePage(w=2480, h=3508)  # A4 at 300 dpi
+
+    img = ocr_mod._render_page(page, dpi=300, max_side=3000)
+
+    zoom = page.pixmap_kwargs["matrix"].a
+    assert abs(zoom * page.rect.height - 3000) < 1e-6
+    assert page.pixmap_kwargs["alpha"] is False
+    assert img.mode == "L"
+
+
+def test_render_keeps_requested_dpi_when_page_fits():
+    page = FakePage(w=400, h=300)
+
+    ocr_mod._render_page(page, dpi=150, max_side=3000)
+
+    assert abs(page.pixmap_kwargs["matrix"].a - 150 / 72) < 1e-9
+
+
+def test_render_wraps_samples_without_png_roundtrip():
+    page = FakePage(w=40, h=30)
+    page._pm.samples = bytes(range(40)) * 30
+
+    img = ocr_mod._render_page(page, dpi=300)
+
+    assert img.size == (40, 30)
+    assert img.getpixel((5, 0)) == 5
+    assert img.readonly  # mapped onto the samples, not copied
+    assert img._pixmap is page._pm
+
+
+def test_render_maps_real_pixmap_memory():
+    doc = fitz.open()
+    page = doc.new_page(width=100, height=50)
+    page.draw_rect(fitz.Rect(0, 0, 10, 10), color=(0, 0, 0), fill=(0, 0, 0))
+
+    img = ocr_mod._render_page(page, dpi=72)
+    del page, doc
+
+    assert img.readonly and img.size == (100, 50)
+    assert img.getpixel((2, 2)) == 0 and img.getpixel((50, 25)) == 255
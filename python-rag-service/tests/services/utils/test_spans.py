@@ -0,0 +1,52 @@
+import math
+
+import numpy as np
+
+from app.services.utils.spans import SpanArrays, bbox_dict
+
+DICTS = [
+    {"text": "First line", "bbox": {"x": 10, "y": 10, "width": 50, "height": 10}},
+    {"text": "  ", "bbox": {"x": 0, "y": 0, "width": 1, "height": 1}},
+    "not a span",
+    {"text": "Second line ", "bbox": {"x": 5, "y": 25, "width": 60, "height": 10}},
+    {"text": "No box"},
+]
+
+
+def test_from_dicts_drops_blank_lines_and_keeps_dict_view():
+    spans = SpanArrays.from_dicts(DICTS)
+
+    assert len(spans) == 3
+    assert spans.lines() == ["First line", "Second line", "No box"]
+    assert spans[1] == {"text": "Second line", "bbox": {"x": 5.0, "y": 25.0, "width": 60.0, "height": 10.0}}
+    assert spans[-1] == {"text": "No box"}
+    assert spans == [s for s in spans]
+    assert SpanArrays.coerce(spans) is spans
+    assert SpanArrays.empty() == [] and not SpanArrays.empty()
+
+
+def test_from_lines_builds_text_offsets():
+    spans = SpanArrays.from_lines(["ab", "", "cde"], [0, 1, 2], [0, 0, 0], [1, 1, 1], [1, 1, 1])
+    assert spans.offsets.tolist() == [0, 2, 2, 5]
+    assert spans.char_lengths().tolist() == [2, 0, 3]
+    assert spans.line(2) == "cde"
+
+
+def test_union_bboxes_per_run_ignores_missing_boxes():
+    spans = SpanArrays.from_dicts(DICTS + [{"text": "orphan"}])
+
+    rows = spans.union_bboxes([0, 2])
+
+    assert rows[0].tolist() == [5.0, 10.0, 60.0, 25.0]
+    assert math.isnan(rows[1][0])
+    assert bbox_dict(rows[0], page=3) == {"x": 5.0, "y": 10.0, "width": 60.0, "height": 25.0, "page": 3}
+    assert bbox_dict(rows[1]) is None
+    assert SpanArrays.empty().union_bboxes([0]).shape == (0, 4)
+
+
+def test_pickles_as_arrays():
+    import pickle
+
+    spans = SpanArrays.from_dicts(DICTS)
+    assert pickle.loads(pickle.dumps(spans)) == spans
+    assert spans.x.dtype == np.float32
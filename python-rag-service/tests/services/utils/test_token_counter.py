@@ -0,0 +1,46 @@
+import tiktoken
+
+from app.services.utils.token_counter import TokenCounter, count_tokens, get_token_counter
+
+ENC = tiktoken.get_encoding("cl100k_base")
+
+
+def test_count_matches_tiktoken_and_is_memoized():
+    tc = TokenCounter()
+    text = "Die Kaution beträgt 9.800,96€ (Seite 7)."
+    assert tc.count(text) == len(ENC.encode(text))
+    assert tc.count(text) == len(ENC.encode(text))
+    assert tc.stats()["hits"] == 1 and tc.stats()["misses"] == 1
+
+def test_count_many_uses_cache_and_dedupes_misses():
+    tc = TokenCounter()
+    tc.count("alpha beta")
+    texts = ["alpha beta", "gamma", "gamma", "", "delta epsilon zeta"]
+    assert tc.count_many(texts) == [len(ENC.encode(t)) for t in texts]
+    assert tc.stats()["misses"] == 1 + 3  # "gamma", "" and "delta ..." encoded once each
+
+def test_batch_path_matches_loop():
+    texts = [f"Abschnitt {i}: " + "Mietvertrag " * (i % 7 + 1) for i in range(50)]
+    batched = TokenCounter(batch_min_chars=0).count_many(texts)
+    assert batched == TokenCounter(batch_min_chars=10**9).count_many(texts)
+
+def test_count_joined_estimates_concatenation():
+    tc = TokenCounter()
+    parts = ["Erste Zeile des Vertrags", "Zweite Zeile", "Dritte Zeile mit 1.250,00 EUR"]
+    estimate = tc.count_joined(tc.count_many(parts))
+    exact = tc.count("\n".join(parts))
+    assert abs(estimate - exact) <= len(parts) - 1
+    assert tc.count_joined([]) == 0
+
+def test_special_token_text_is_counted_as_ordinary():
+    assert TokenCounter().count("<|endoftext|>") == len(ENC.encode_ordinary("<|endoftext|>"))
+
+def test_lru_bound():
+    tc = TokenCounter(cache_size=2)
+    for t in ["a", "b", "c"]:
+        tc.count(t)
+    assert tc.stats()["entries"] == 2
+
+def test_module_helpers_share_one_counter():
+    assert get_token_counter() is get_token_counter("cl100k_base")
+    assert count_tokens("hello world") == len(ENC.encode("hello world"))
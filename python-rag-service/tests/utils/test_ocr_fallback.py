@@ -1,4 +1,3 @@
-import io
 import types
 import builtins
 from PIL import Image
@@ -7,18 +6,25 @@ import pytest
 import app.services.utils.ocr_fallback as ocr_mod
 
 class FakePixmap:
-    def __init__(self, w=400, h=300, color=(255, 255, 255)):
-        img = Image.new("RGB", (w, h), color)
-        bio = io.BytesIO()
-        img.save(bio, format="PNG")
-        self._bytes = bio.getvalue()
-    def tobytes(self, fmt="png"):
-        return self._bytes
+    def __init__(self, w=400, h=300, color=255):
+        self.width, self.height, self.n = w, h, 1
+        self.stride = w
+        self.samples = Image.new("L", (w, h), color).tobytes()
+
+    @property
+    def samples_mv(self):
+        return memoryview(self.samples)
+
+class FakeRect:
+    def __init__(self, width, height):
+        self.width, self.height = width, height
 
 class FakePage:
-    def __init__(self, w=400, h=300):
+    def __init__(self, w=400, h=300, rotation=0):
         self._pm = FakePixmap(w, h)
-    def get_pixmap(self, dpi=300):
+        self.rotation = rotation
+        self.rect = FakeRect(w * 72 / 300, h * 72 / 300)
+    def get_pixmap(self, **kwargs):
         return self._pm
 
 def test_basic_success(monkeypatch):
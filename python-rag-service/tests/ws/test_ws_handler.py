@@ -0,0 +1,70 @@
+import asyncio
+
+from fastapi import WebSocketDisconnect
+
+import app.ws.ws_handler as ws
+
+
+class FakeWebSocket:
+    """Replays queued client messages, then disconnects."""
+    def __init__(self, incoming):
+        self.incoming = list(incoming)
+        self.sent = []
+        self.accepted = False
+    async def accept(self):
+        self.accepted = True
+    async def receive_json(self):
+        if not self.incoming:
+            raise WebSocketDisconnect(code=1000)
+        item = self.incoming.pop(0)
+        if isinstance(item, Exception):
+            raise item
+        return item
+    async def send_json(self, data):
+        self.sent.append(data)
+    async def close(self, code=1000):
+        self.closed = code
+
+
+def test_ws_streams_events_for_each_question(monkeypatch):
+    async def fake_stream(question, document_id):
+        yield {"event": "sources", "data": {"sources": [], "debug": {}}}
+        yield {"event": "token", "data": question}
+        yield {"event": "done", "data": {}}
+
+    monkeypatch.setattr(ws, "stream_ask_question", fake_stream)
+    sock = FakeWebSocket([
+        {"question": "Erste?", "documentId": "D1"},
+        {"question": "Zweite?", "documentId": "D1"},
+    ])
+
+    asyncio.run(ws.ask_question_ws(sock))
+
+    assert sock.accepted
+    assert [e["event"] for e in sock.sent] == ["sources", "token", "done"] * 2
+    assert [e["data"] for e in sock.sent if e["event"] == "token"] == ["Erste?", "Zweite?"]
+
+def test_ws_rejects_non_object_payload():
+    sock = FakeWebSocket([["not", "an", "object"]])
+    asyncio.run(ws.ask_question_ws(sock))
+    assert sock.sent == [{"event": "error", "data": {"status": 400, "detail": "Expected a JSON object."}}]
+
+def test_ws_reports_invalid_json_and_keeps_going(monkeypatch):
+    async def fake_stream(question, document_id):
+        yield {"event": "done", "data": {}}
+
+    monkeypatch.setattr(ws, "stream_ask_question", fake_stream)
+    sock = FakeWebSocket([ValueError("Expecting value"), {"question": "Q?", "documentId": "D1"}])
+    asyncio.run(ws.ask_question_ws(sock))
+    assert [e["event"] for e in sock.sent] == ["error", "done"]
+
+def test_ws_unexpected_failure_sends_error_and_closes(monkeypatch):
+    async def broken_stream(question, document_id):
+        raise RuntimeError("boom")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(ws, "stream_ask_question", broken_stream)
+    sock = FakeWebSocket([{"question": "Q?", "documentId": "D1"}])
+    asyncio.run(ws.ask_question_ws(sock))
+    assert sock.sent == [{"event": "error", "data": {"status": 500, "detail": "boom"}}]
+    assert sock.closed == 1011